@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+混合内核微基准测试
+
+对比原来的合成方式（RGB图片整体转换为RGBA后调用Image.alpha_composite）与
+NumPy混合内核（只在水印区域内原地混合），覆盖不同的图片和水印尺寸。
+
+用法:
+    python benchmarks/bench_blend.py [--repeat 5]
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# 获取当前文件的绝对路径
+current_file = os.path.abspath(__file__)
+# 获取src目录的绝对路径
+src_dir = os.path.join(os.path.dirname(os.path.dirname(current_file)), "src")
+# 将src目录添加到Python路径
+sys.path.append(src_dir)
+
+from PIL import Image
+
+from core.blend import blend_image, prepare_sprite, is_numpy_available
+
+
+IMAGE_SIZES = [(1000, 1000), (4000, 3000), (8000, 6000)]
+SPRITE_SIZES = [(200, 50), (1000, 250), (3000, 800)]
+
+
+def alpha_composite_path(img, sprite, position):
+    """原来的合成方式：非RGBA图片先整体转换为RGBA，再用Image.alpha_composite合成"""
+    if img.mode != "RGBA":
+        img = img.convert("RGBA")
+    img.alpha_composite(sprite, position)
+    return img
+
+
+def region_path(img, sprite, position):
+    """不使用NumPy时的回退方式：只把水印区域转换为RGBA后合成"""
+    box = (position[0], position[1], position[0] + sprite.width, position[1] + sprite.height)
+    region = img.crop(box).convert("RGBA")
+    region.alpha_composite(sprite)
+    img.paste(region.convert(img.mode), box)
+    return img
+
+
+def kernel_path(img, sprite, position):
+    """NumPy混合内核：只在水印区域内原地混合"""
+    return blend_image(img, sprite, position)
+
+
+def measure(func, repeat):
+    """返回多次运行中的最短耗时（毫秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(argv=None):
+    """运行基准测试并打印结果表格"""
+    parser = argparse.ArgumentParser(description="混合内核微基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="每个组合重复的次数，取最短耗时")
+    parser.add_argument("--mode", choices=["RGB", "RGBA"], default="RGB",
+                        help="目标图像模式，RGBA目标的内核会直接使用alpha_composite")
+    args = parser.parse_args(argv)
+
+    if not is_numpy_available():
+        print("未安装NumPy，混合内核会回退到区域内的alpha_composite")
+
+    print(f"{'图片':>11} {'水印':>10} {'alpha_composite(ms)':>20} {'区域合成(ms)':>12} {'内核(ms)':>10} {'加速比':>8}")
+    for image_size in IMAGE_SIZES:
+        img = Image.new(args.mode, image_size, (90, 120, 150, 255)[:len(args.mode)])
+        for sprite_size in SPRITE_SIZES:
+            if sprite_size[0] > image_size[0] or sprite_size[1] > image_size[1]:
+                continue
+            sprite = Image.new("RGBA", sprite_size, (255, 255, 255, 128))
+            position = ((image_size[0] - sprite_size[0]) // 2, (image_size[1] - sprite_size[1]) // 2)
+            # 预乘图块可以在多张图片之间复用，不计入单张耗时
+            prepared = prepare_sprite(sprite)
+
+            baseline = measure(lambda: alpha_composite_path(img, sprite, position), args.repeat)
+            region = measure(lambda: region_path(img, sprite, position), args.repeat)
+            kernel = measure(lambda: kernel_path(img, prepared, position), args.repeat)
+            print(f"{image_size[0]:>5}x{image_size[1]:<5} {sprite_size[0]:>4}x{sprite_size[1]:<5} "
+                  f"{baseline:>20.2f} {region:>12.2f} {kernel:>10.2f} {baseline / kernel:>7.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+水印引擎基准测试
+
+测量add_watermark在不同图片尺寸、格式、旋转、位置和字体下的耗时与峰值内存，
+结果可以保存为JSON基线，之后的运行与基线比较，超出容差时以非零状态退出。
+
+每个用例在独立的子进程中运行，峰值内存互不影响。
+
+用法:
+    python benchmarks/bench_watermark.py --suite quick --output baseline.json
+    python benchmarks/bench_watermark.py --suite quick --compare baseline.json --time-tolerance 0.2
+"""
+
+import sys
+import os
+import json
+import time
+import platform
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# 获取当前文件的绝对路径
+current_file = os.path.abspath(__file__)
+# 获取src目录的绝对路径
+src_dir = os.path.join(os.path.dirname(os.path.dirname(current_file)), "src")
+# 将src目录添加到Python路径
+sys.path.append(src_dir)
+
+import PIL
+from PIL import Image
+
+from core.memory_tracker import reset_peak_rss, get_current_rss_mb, get_peak_rss_mb
+
+
+BASELINE_VERSION = 1
+
+# 图片尺寸（百万像素）对应的宽高，均为4:3
+IMAGE_SIZES = {
+    1: (1152, 864),
+    12: (4000, 3000),
+    24: (5664, 4248),
+    50: (8160, 6120),
+    100: (11552, 8664)
+}
+
+SUITES = {
+    "quick": [1, 12],
+    "full": [1, 12, 24, 50, 100]
+}
+
+FORMATS = {
+    "JPEG": ".jpg",
+    "PNG": ".png",
+    "TIFF": ".tif"
+}
+
+DEFAULT_SETTINGS = {
+    "rotation": 0,
+    "position": "bottom_right",
+    "font_name": "SimHei",
+    "font_size": 24
+}
+
+# 在固定尺寸上单独改变的设置
+VARIATIONS = {
+    "rotation": [45],
+    "position": ["center", "top_left", [100, 100]],
+    "font_size": [96],
+    "font_name": ["DejaVuSans.ttf"]
+}
+
+# 设置变化只在这一尺寸上测试，避免用例数量随尺寸成倍增加
+VARIATION_MEGAPIXELS = 12
+
+
+def build_cases(suite):
+    """生成基准测试用例
+
+    每个尺寸和格式使用默认设置测一次，旋转、位置和字体的变化只在
+    VARIATION_MEGAPIXELS尺寸的JPEG上测试。
+
+    Args:
+        suite: 测试集名称
+
+    Returns:
+        list: 用例字典列表，包含id、megapixels、format和settings
+    """
+    cases = []
+    for megapixels in SUITES[suite]:
+        for image_format in FORMATS:
+            cases.append(_make_case(megapixels, image_format, {}))
+
+    if VARIATION_MEGAPIXELS in SUITES[suite]:
+        for key, values in VARIATIONS.items():
+            for value in values:
+                cases.append(_make_case(VARIATION_MEGAPIXELS, "JPEG", {key: value}))
+    return cases
+
+
+def _make_case(megapixels, image_format, overrides):
+    """生成单个用例"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(overrides)
+    parts = [f"{megapixels}mp", image_format.lower()]
+    for key, value in sorted(overrides.items()):
+        if isinstance(value, list):
+            value = "x".join(str(v) for v in value)
+        parts.append(f"{key}={value}")
+    return {
+        "id": "/".join(parts),
+        "megapixels": megapixels,
+        "format": image_format,
+        "settings": settings
+    }
+
+
+def create_input_image(megapixels, image_format, folder):
+    """生成测试输入图片，同一尺寸和格式只生成一次
+
+    使用渐变而不是噪声，使压缩格式的文件大小接近真实照片。
+
+    Returns:
+        str: 图片路径
+    """
+    path = os.path.join(folder, f"input_{megapixels}mp{FORMATS[image_format]}")
+    if not os.path.exists(path):
+        size = IMAGE_SIZES[megapixels]
+        linear = Image.linear_gradient("L").resize(size)
+        radial = Image.radial_gradient("L").resize(size)
+        image = Image.merge("RGB", (linear, radial, linear.transpose(getattr(Image, "Transpose", Image).FLIP_LEFT_RIGHT)))
+        image.save(path, image_format)
+    return path
+
+
+def run_case(case, input_path, output_folder, repeat):
+    """在子进程中运行单个用例
+
+    Returns:
+        dict: time_ms（多次运行中的最短耗时）、peak_mb（相对于用例开始时的峰值内存增量）
+    """
+    sys.path.append(src_dir)
+    from core.watermark import Watermark
+
+    settings = case["settings"]
+    watermark = Watermark()
+    watermark.set_text("Photo-Watermark 水印")
+    watermark.set_font(settings["font_name"], settings["font_size"])
+    watermark.set_rotation(settings["rotation"])
+    position = settings["position"]
+    watermark.set_position(tuple(position) if isinstance(position, list) else position)
+
+    output_path = os.path.join(output_folder, "output" + FORMATS[case["format"]])
+    # 以用例开始时的内存为起点；无法重置峰值记录时以启动后的峰值为起点
+    start_peak = get_current_rss_mb() if reset_peak_rss() else get_peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        watermark.add_watermark(input_path, output_path)
+        times.append((time.perf_counter() - start) * 1000)
+    end_peak = get_peak_rss_mb()
+
+    return {
+        "time_ms": round(min(times), 2),
+        "peak_mb": round(max(0.0, end_peak - start_peak), 1) if start_peak is not None else None
+    }
+
+
+def run_suite(cases, repeat=3, work_folder=None):
+    """运行所有用例
+
+    Args:
+        cases: 用例列表
+        repeat: 每个用例重复次数
+        work_folder: 存放测试图片的文件夹，None表示使用临时文件夹
+
+    Returns:
+        dict: 用例id到结果的映射
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_folder:
+        work_folder = work_folder or temp_folder
+        os.makedirs(work_folder, exist_ok=True)
+        for case in cases:
+            input_path = create_input_image(case["megapixels"], case["format"], work_folder)
+            # 每个用例使用新的子进程，峰值内存不受之前用例影响
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, case, input_path, temp_folder, repeat).result()
+            results[case["id"]] = result
+            peak = "-" if result["peak_mb"] is None else f"{result['peak_mb']:.1f}"
+            print(f"{case['id']:<40} {result['time_ms']:>10.1f} ms {peak:>10} MB", flush=True)
+    return results
+
+
+def build_report(results, suite, repeat):
+    """生成可保存为基线的结果报告"""
+    return {
+        "version": BASELINE_VERSION,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "suite": suite,
+        "repeat": repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "cases": results
+    }
+
+
+def compare_results(baseline, results, time_tolerance, memory_tolerance, min_time_ms=5.0, min_memory_mb=5.0):
+    """与基线比较
+
+    超出 基线 × (1 + 容差) 且绝对差值超过下限时视为退化，下限用于忽略很小用例上的抖动。
+
+    Args:
+        baseline: 基线报告
+        results: 本次结果
+        time_tolerance: 耗时容差（比例）
+        memory_tolerance: 峰值内存容差（比例）
+        min_time_ms: 耗时差值下限
+        min_memory_mb: 内存差值下限
+
+    Returns:
+        list: 退化描述列表
+    """
+    regressions = []
+    for case_id, current in results.items():
+        previous = baseline.get("cases", {}).get(case_id)
+        if previous is None:
+            print(f"{case_id:<40} 基线中没有该用例，跳过比较")
+            continue
+        checks = [
+            ("time_ms", "耗时", time_tolerance, min_time_ms, "ms"),
+            ("peak_mb", "峰值内存", memory_tolerance, min_memory_mb, "MB")
+        ]
+        for key, label, tolerance, minimum, unit in checks:
+            old, new = previous.get(key), current.get(key)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + tolerance) and new - old > minimum:
+                regressions.append(
+                    f"{case_id}: {label} {old:.1f}{unit} -> {new:.1f}{unit} (+{(new / old - 1) * 100 if old else 0:.0f}%)"
+                )
+    return regressions
+
+
+def create_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="水印引擎基准测试")
+    parser.add_argument("--suite", choices=list(SUITES), default="quick", help="测试集，full包含1MP到100MP")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复的次数，取最短耗时")
+    parser.add_argument("--filter", help="只运行id包含该字符串的用例")
+    parser.add_argument("--work-dir", help="缓存测试图片的文件夹，重复运行时不必重新生成")
+    parser.add_argument("--output", help="把结果写入JSON文件，可作为之后比较的基线")
+    parser.add_argument("--compare", help="与指定的基线JSON比较")
+    parser.add_argument("--time-tolerance", type=float, default=0.15, help="允许的耗时增长比例")
+    parser.add_argument("--memory-tolerance", type=float, default=0.10, help="允许的峰值内存增长比例")
+    parser.add_argument("--min-time-ms", type=float, default=5.0, help="小于该值的耗时差异不视为退化")
+    parser.add_argument("--min-memory-mb", type=float, default=5.0, help="小于该值的内存差异不视为退化")
+    return parser
+
+
+def main(argv=None):
+    """运行基准测试
+
+    Returns:
+        int: 退出码，与基线比较出现退化时为1
+    """
+    args = create_parser().parse_args(argv)
+
+    cases = build_cases(args.suite)
+    if args.filter:
+        cases = [case for case in cases if args.filter in case["id"]]
+    if not cases:
+        print("没有匹配的用例")
+        return 1
+
+    results = run_suite(cases, args.repeat, args.work_dir)
+    report = build_report(results, args.suite, args.repeat)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"结果已保存到 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("environment", {}).get("platform") != report["environment"]["platform"]:
+            print("警告: 基线来自不同的平台，比较结果仅供参考")
+        regressions = compare_results(
+            baseline, results, args.time_tolerance, args.memory_tolerance,
+            args.min_time_ms, args.min_memory_mb
+        )
+        if regressions:
+            print(f"发现 {len(regressions)} 项退化:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print("没有超出容差的退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -30,6 +30,7 @@ package_data = {
 entry_points = {
     "console_scripts": [
         "photo-watermark=src.main.main:main",
+        "photo-watermark-cli=src.main.cli:main",
     ],
     "gui_scripts": [
         "PhotoWatermark=src.main.main:main",
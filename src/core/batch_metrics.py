@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+批量处理指标模块
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+
+from core.memory_tracker import get_peak_rss_mb
+from core.stage_timer import percentile
+
+
+METRIC_PREFIX = "photo_watermark"
+
+# 计算延迟百分位数时保留的最近样本数，长时间运行时内存不会持续增长
+LATENCY_WINDOW = 10000
+
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class BatchMetrics:
+    """批量处理指标，供监控系统采集
+
+    每处理完一张图片调用一次record()。可选地把每张图片的结果追加到JSON Lines日志，
+    并定期把汇总指标以Prometheus文本格式写入文件（可由node_exporter的textfile
+    收集器采集）。多个工作线程可以共用同一个对象。
+    """
+
+    def __init__(self, jsonl_path=None, prometheus_path=None, write_interval=10.0, workers=1,
+                 stage_timer=None):
+        """初始化批量处理指标
+
+        Args:
+            jsonl_path: 每张图片一行的JSON Lines日志路径，None表示不写
+            prometheus_path: Prometheus文本格式指标文件路径，None表示不写
+            write_interval: 指标文件的最短更新间隔(秒)
+            workers: 工作线程数，用于计算利用率
+            stage_timer: StageTimer对象，提供时把各阶段耗时也写入指标文件
+        """
+        self.jsonl_path = jsonl_path
+        self.prometheus_path = prometheus_path
+        self.write_interval = write_interval
+        self.workers = max(1, workers)
+        self.stage_timer = stage_timer
+        self.planned = None
+
+        self.succeeded = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.busy_seconds = 0.0
+        self.latency_sum = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.start_time = time.time()
+        self._last_write = 0.0
+        self._log_file = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+        if jsonl_path:
+            folder = os.path.dirname(os.path.abspath(jsonl_path))
+            os.makedirs(folder, exist_ok=True)
+            self._log_file = open(jsonl_path, "a", encoding="utf-8")
+
+    def set_planned(self, count):
+        """设置本次计划处理的图片数，用于计算进度
+
+        Args:
+            count: 图片数量
+        """
+        self.planned = count
+
+    def record(self, result):
+        """记录一张图片的处理结果
+
+        Args:
+            result: 结果字典，包含input、output、success、error、elapsed(秒)
+                    和可选的peak_rss_mb、duplicate_of，与BatchProcessor的结果一致
+        """
+        bytes_in = _file_size(result.get("input"))
+        bytes_out = _file_size(result.get("output")) if result.get("success") else 0
+        elapsed = result.get("elapsed", 0.0)
+
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "input": result.get("input"),
+            "output": result.get("output"),
+            "success": bool(result.get("success")),
+            "error": result.get("error"),
+            "elapsed_ms": round(elapsed * 1000, 2),
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "worker": threading.current_thread().name
+        }
+        if result.get("peak_rss_mb") is not None:
+            entry["peak_rss_mb"] = round(result["peak_rss_mb"], 1)
+        if result.get("duplicate_of"):
+            entry["duplicate_of"] = result["duplicate_of"]
+
+        with self._lock:
+            if result.get("success"):
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.busy_seconds += elapsed
+            self.latency_sum += elapsed
+            self.latencies.append(elapsed)
+            if self._log_file is not None:
+                self._log_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                self._log_file.flush()
+
+        if self.prometheus_path and time.time() - self._last_write >= self.write_interval:
+            self.write_prometheus()
+
+    def snapshot(self):
+        """获取当前的汇总指标
+
+        Returns:
+            dict: 包含processed、succeeded、failed、bytes_in、bytes_out、elapsed、
+                  images_per_second、latency(百分位数，秒)、worker_utilization和progress
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            processed = self.succeeded + self.failed
+            elapsed = max(time.time() - self.start_time, 1e-9)
+            return {
+                "processed": processed,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "elapsed": elapsed,
+                "images_per_second": processed / elapsed,
+                "latency": {q: percentile(latencies, q * 100) for q in LATENCY_QUANTILES},
+                "latency_sum": self.latency_sum,
+                "worker_utilization": min(1.0, self.busy_seconds / (elapsed * self.workers)),
+                "progress": processed / self.planned if self.planned else None
+            }
+
+    def format_prometheus(self):
+        """生成Prometheus文本格式的指标
+
+        Returns:
+            str: 指标文本
+        """
+        stats = self.snapshot()
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            full_name = f"{METRIC_PREFIX}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels)
+                label_text = f"{{{label_text}}}" if label_text else ""
+                lines.append(f"{full_name}{suffix}{label_text} {value:.6g}")
+
+        metric("images_total", "counter", "Images processed, by result.", [
+            ("", [("status", "success")], stats["succeeded"]),
+            ("", [("status", "failed")], stats["failed"])
+        ])
+        metric("input_bytes_total", "counter", "Bytes read from input images.",
+               [("", [], stats["bytes_in"])])
+        metric("output_bytes_total", "counter", "Bytes written to output images.",
+               [("", [], stats["bytes_out"])])
+        metric("images_per_second", "gauge", "Average throughput since the batch started.",
+               [("", [], stats["images_per_second"])])
+        metric("image_latency_seconds", "summary", "Per-image processing latency.",
+               [("", [("quantile", q)], value) for q, value in stats["latency"].items()]
+               + [("_sum", [], stats["latency_sum"]), ("_count", [], stats["processed"])])
+        metric("worker_utilization", "gauge", "Fraction of worker time spent processing images.",
+               [("", [], stats["worker_utilization"])])
+        metric("workers", "gauge", "Number of worker threads.", [("", [], self.workers)])
+        peak_rss = get_peak_rss_mb()
+        if peak_rss is not None:
+            metric("process_peak_resident_memory_bytes", "gauge", "Peak resident memory of the process.",
+                   [("", [], peak_rss * 1024 * 1024)])
+        metric("batch_elapsed_seconds", "gauge", "Seconds since the batch started.",
+               [("", [], stats["elapsed"])])
+        if stats["progress"] is not None:
+            metric("batch_images_planned", "gauge", "Images planned for this batch.",
+                   [("", [], self.planned)])
+            metric("batch_progress_ratio", "gauge", "Fraction of planned images processed.",
+                   [("", [], stats["progress"])])
+
+        if self.stage_timer is not None and self.stage_timer.enabled:
+            # 百分位数来自当前批次；_sum和_count使用累计值，计时器按批次重置时也不会减少
+            samples = []
+            summary = self.stage_timer.summary()
+            for stage, (count, total) in self.stage_timer.totals().items():
+                if stage in summary:
+                    samples.append(("", [("stage", stage), ("quantile", 0.5)], summary[stage]["p50_ms"] / 1000))
+                    samples.append(("", [("stage", stage), ("quantile", 0.95)], summary[stage]["p95_ms"] / 1000))
+                samples.append(("_sum", [("stage", stage)], total))
+                samples.append(("_count", [("stage", stage)], count))
+            if samples:
+                metric("stage_seconds", "summary", "Render and export stage durations.", samples)
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self):
+        """把指标写入Prometheus文本文件
+
+        先写入临时文件再替换，采集方不会读到写了一半的文件。
+        """
+        if not self.prometheus_path:
+            return
+        with self._write_lock:
+            self._last_write = time.time()
+            temp_path = f"{self.prometheus_path}.tmp"
+            try:
+                folder = os.path.dirname(os.path.abspath(self.prometheus_path))
+                os.makedirs(folder, exist_ok=True)
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.write(self.format_prometheus())
+                os.replace(temp_path, self.prometheus_path)
+            except OSError as e:
+                print(f"写入指标文件失败: {str(e)}")
+
+    def close(self):
+        """写入最终指标并关闭日志文件"""
+        self.write_prometheus()
+        with self._lock:
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+
+
+def _file_size(path):
+    """获取文件大小，文件不存在时返回0"""
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
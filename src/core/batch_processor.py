@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+批量处理模块
+"""
+
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from core.duplicate_inputs import group_duplicate_jobs, write_duplicate_output
+
+
+class BatchProcessor:
+    """批量处理器类，使用常驻线程池批量添加水印
+
+    Pillow在解码、合成和编码时会释放GIL，因此线程池即可充分利用多核，
+    同时避免进程池在每个批次重复序列化水印设置的开销。
+    """
+
+    def __init__(self, watermark, max_workers=None, metrics=None, memory_tracker=None, dedupe=None):
+        """初始化批量处理器
+
+        Args:
+            watermark: 已配置好的Watermark对象
+            max_workers: 工作线程数，None表示使用CPU核心数
+            metrics: BatchMetrics对象，每处理完一个文件记录一次结果
+            memory_tracker: MemoryTracker对象，记录每个文件的峰值内存
+            dedupe: 输入内容相同的图片只处理一次，其余输出的写入方式："link"硬链接，
+                    "copy"复制；None表示每张图片都单独处理
+        """
+        self.watermark = watermark
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.metrics = metrics
+        self.memory_tracker = memory_tracker
+        self.dedupe = dedupe
+        self.executor = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """启动线程池并预热所有工作线程"""
+        with self._lock:
+            if self.executor is not None:
+                return
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="watermark-worker"
+            )
+            # ThreadPoolExecutor按需创建线程，这里提前提交空任务让线程全部就绪，
+            # 避免第一批文件承担创建线程的延迟
+            barrier = threading.Barrier(self.max_workers)
+            warmups = [
+                self.executor.submit(self._warm_up, barrier)
+                for _ in range(self.max_workers)
+            ]
+            for future in warmups:
+                future.result()
+
+    def _warm_up(self, barrier):
+        """预热任务，等待所有工作线程都已启动"""
+        try:
+            barrier.wait(timeout=5)
+        except threading.BrokenBarrierError:
+            pass
+
+    def process_file(self, input_path, output_path):
+        """处理单个文件
+
+        Args:
+            input_path: 输入图片路径
+            output_path: 输出图片路径
+
+        Returns:
+            dict: 处理结果，包含input、output、success、error和elapsed，
+                  启用内存跟踪时还包含peak_rss_mb
+        """
+        start_time = time.perf_counter()
+        result = {
+            "input": input_path,
+            "output": output_path,
+            "success": False,
+            "error": None,
+            "elapsed": 0.0
+        }
+        memory_scope = None
+        if self.memory_tracker is not None:
+            memory_scope = self.memory_tracker.begin("image", input_path)
+        try:
+            output_folder = os.path.dirname(output_path)
+            if output_folder and not os.path.exists(output_folder):
+                os.makedirs(output_folder, exist_ok=True)
+            self.watermark.add_watermark(input_path, output_path)
+            result["success"] = True
+        except Exception as e:
+            result["error"] = str(e)
+        if memory_scope is not None:
+            result["peak_rss_mb"] = self.memory_tracker.end(memory_scope)["peak_mb"]
+        result["elapsed"] = time.perf_counter() - start_time
+        if self.metrics is not None:
+            self.metrics.record(result)
+        return result
+
+    def submit_batch(self, jobs):
+        """提交一批任务
+
+        Args:
+            jobs: (输入路径, 输出路径)元组列表
+
+        Returns:
+            list: Future对象列表，顺序与jobs一致。启用dedupe时重复任务的结果中
+                  duplicate_of为实际处理的输入路径，method为输出的写入方式
+        """
+        self.start()
+        if not self.dedupe:
+            return [
+                self.executor.submit(self.process_file, input_path, output_path)
+                for input_path, output_path in jobs
+            ]
+
+        jobs = [tuple(job) for job in jobs]
+        futures = {}
+        for job, duplicates in group_duplicate_jobs(jobs, self.max_workers):
+            future = self.executor.submit(self.process_file, *job)
+            futures.setdefault(job, []).append(future)
+            for duplicate in duplicates:
+                duplicate_future = Future()
+                future.add_done_callback(
+                    lambda done, duplicate=duplicate, target=duplicate_future:
+                    self._finish_duplicate(done, duplicate, target)
+                )
+                futures.setdefault(duplicate, []).append(duplicate_future)
+        # 同一个任务可能在jobs中出现多次，按出现顺序依次取出
+        return [futures[job].pop(0) for job in jobs]
+
+    def _finish_duplicate(self, primary_future, job, future):
+        """第一个任务完成后，把它的输出写到重复任务的输出路径
+
+        Args:
+            primary_future: 第一个任务的Future
+            job: 重复任务的(输入路径, 输出路径)
+            future: 重复任务的Future，写入完成后设置结果
+        """
+        start_time = time.perf_counter()
+        input_path, output_path = job
+        primary = None if primary_future.cancelled() else primary_future.result()
+        result = {
+            "input": input_path,
+            "output": output_path,
+            "success": False,
+            "error": primary["error"] if primary else "任务已取消",
+            "elapsed": 0.0,
+            "duplicate_of": primary["input"] if primary else None
+        }
+        if primary and primary["success"]:
+            try:
+                result["method"] = write_duplicate_output(primary["output"], output_path, self.dedupe)
+                result["success"] = True
+            except Exception as e:
+                result["error"] = str(e)
+        result["elapsed"] = time.perf_counter() - start_time
+        if self.metrics is not None:
+            self.metrics.record(result)
+        future.set_result(result)
+
+    def run_batch(self, jobs):
+        """同步处理一批任务
+
+        Args:
+            jobs: (输入路径, 输出路径)元组列表
+
+        Returns:
+            list: 处理结果字典列表，顺序与jobs一致
+        """
+        return [future.result() for future in self.submit_batch(jobs)]
+
+    def shutdown(self, wait=True):
+        """关闭线程池
+
+        Args:
+            wait: 是否等待正在执行的任务完成
+        """
+        with self._lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=wait)
+                self.executor = None
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+水印混合模块
+"""
+
+from PIL import Image
+
+
+# NumPy是可选依赖，首次混合时才导入；None表示尚未尝试，False表示不可用
+_numpy = None
+
+
+def _get_numpy():
+    """延迟导入NumPy
+
+    Returns:
+        module: numpy模块，未安装时返回None
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def is_numpy_available():
+    """是否可以使用NumPy混合内核"""
+    return _get_numpy() is not None
+
+
+class PremultipliedSprite:
+    """预乘透明度的水印图块
+
+    颜色以 颜色 × alpha 的整数形式保存（放大255倍，不做舍入），混合时全部使用
+    整数定点运算。同一个图块可以反复混合到多张图片上。
+    """
+
+    def __init__(self, sprite):
+        """初始化预乘图块
+
+        Args:
+            sprite: RGBA水印图块
+        """
+        np = _get_numpy()
+        if sprite.mode != "RGBA":
+            sprite = sprite.convert("RGBA")
+        pixels = np.asarray(sprite)
+        self.image = sprite
+        self.size = sprite.size
+        self.width, self.height = sprite.size
+        # 颜色 × alpha 最大为65025，uint16即可容纳，减少混合时的内存带宽
+        self.alpha = pixels[..., 3:4].astype(np.uint16)
+        self.inverse_alpha = 255 - self.alpha
+        self.color = pixels[..., :3].astype(np.uint16) * self.alpha
+
+
+def prepare_sprite(sprite):
+    """把水印图块转换为混合内核使用的形式
+
+    Args:
+        sprite: RGBA水印图块或PremultipliedSprite
+
+    Returns:
+        PremultipliedSprite或Image: NumPy不可用时原样返回
+    """
+    if isinstance(sprite, PremultipliedSprite) or not is_numpy_available():
+        return sprite
+    return PremultipliedSprite(sprite)
+
+
+def _clip(image_size, sprite_size, position):
+    """计算水印与图片相交的区域
+
+    Returns:
+        tuple: ((left, top, right, bottom)图片中的区域, (x, y)图块中的起点)，不相交时返回None
+    """
+    x, y = position
+    left, top = max(0, x), max(0, y)
+    right = min(image_size[0], x + sprite_size[0])
+    bottom = min(image_size[1], y + sprite_size[1])
+    if right <= left or bottom <= top:
+        return None
+    return (left, top, right, bottom), (left - x, top - y)
+
+
+def blend_array(dest, sprite, position):
+    """把预乘图块原地混合到目标数组中
+
+    只在水印与目标相交的视图上计算，不分配与目标同样大小的缓冲区。
+
+    Args:
+        dest: 可写的uint8数组，形状为(高, 宽, 3)或(高, 宽, 4)，RGBA为非预乘
+        sprite: PremultipliedSprite
+        position: 水印左上角在目标中的坐标
+
+    Returns:
+        bool: 是否有像素被修改
+    """
+    np = _get_numpy()
+    clipped = _clip((dest.shape[1], dest.shape[0]), sprite.size, position)
+    if clipped is None:
+        return False
+    (left, top, right, bottom), (sx, sy) = clipped
+    window = (slice(sy, sy + bottom - top), slice(sx, sx + right - left))
+    color = sprite.color[window]
+    alpha = sprite.alpha[window]
+    inverse_alpha = sprite.inverse_alpha[window]
+    region = dest[top:bottom, left:right]
+
+    if region.shape[2] == 3 or region[..., 3].min() == 255:
+        # 目标不透明：out = (S·a + D·(255-a)) / 255，用移位实现带舍入的除以255，
+        # 中间结果不超过65407，全程使用uint16
+        value = region[..., :3] * inverse_alpha
+        value += color
+        value += 128
+        value += value >> 8
+        region[..., :3] = value >> 8
+        return True
+
+    # 目标带透明度：out_a = a + Da·(1-a)，out_c = (S·a + D·Da·(1-a)) / out_a
+    dest_weight = region[..., 3:4].astype(np.uint32) * inverse_alpha
+    out_alpha = alpha * np.uint32(255) + dest_weight
+    numerator = color * np.uint32(255) + region[..., :3] * dest_weight + (out_alpha >> 1)
+    region[..., :3] = numerator // np.maximum(out_alpha, 1)
+    out_alpha += 128
+    region[..., 3:4] = (out_alpha + (out_alpha >> 8)) >> 8
+    return True
+
+
+def blend_image(img, sprite, position):
+    """把水印图块混合到RGB或RGBA图像上
+
+    只取出水印覆盖的区域进行混合再贴回，原图不需要整体转换为RGBA。
+    NumPy不可用时RGB图片在同一区域内转换为RGBA后使用Image.alpha_composite。
+
+    Args:
+        img: RGB或RGBA图像，会被原地修改
+        sprite: RGBA水印图块或PremultipliedSprite
+        position: 水印左上角坐标
+
+    Returns:
+        Image: 混合后的图像（即img）
+    """
+    clipped = _clip(img.size, sprite.size, position)
+    if clipped is None:
+        return img
+    box, (sx, sy) = clipped
+
+    # RGBA目标直接使用Pillow的原地alpha_composite，它同样只处理水印区域，
+    # 且比NumPy的整数除法更快；RGB目标使用NumPy内核，省去RGBA转换
+    if img.mode == "RGB":
+        sprite = prepare_sprite(sprite)
+    if isinstance(sprite, PremultipliedSprite) and img.mode == "RGB":
+        np = _get_numpy()
+        region = np.array(img.crop(box))
+        blend_array(region, sprite, (-sx, -sy))
+        img.paste(Image.fromarray(region), box)
+        return img
+
+    if isinstance(sprite, PremultipliedSprite):
+        sprite = sprite.image
+    sprite = sprite.crop((sx, sy, sx + box[2] - box[0], sy + box[3] - box[1]))
+    if img.mode == "RGBA":
+        img.alpha_composite(sprite, box[:2])
+    else:
+        region = img.crop(box).convert("RGBA")
+        region.alpha_composite(sprite)
+        img.paste(region.convert(img.mode), box)
+    return img
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+编译模板模块
+"""
+
+import copy
+import numbers
+
+from core.layout import ANCHORS, SIZE_REFERENCES
+from core.text_sprite import RESAMPLE_MODES, DEFAULT_RESAMPLE
+from core.watermark import Watermark
+
+
+WATERMARK_TYPES = ("text", "image")
+
+
+def validate_template(template_data):
+    """检查模板数据并补全默认值
+
+    Args:
+        template_data: 模板数据字典
+
+    Returns:
+        dict: 校验后的模板数据副本
+
+    Raises:
+        ValueError: 模板数据无效
+    """
+    if not isinstance(template_data, dict):
+        raise ValueError("模板数据必须是字典")
+    data = copy.deepcopy(template_data)
+
+    watermark_type = data.setdefault("watermark_type", "text")
+    if watermark_type not in WATERMARK_TYPES:
+        raise ValueError(f"未知的水印类型: {watermark_type}")
+    if watermark_type == "image":
+        if not data.get("image_path"):
+            raise ValueError("图片水印模板缺少image_path")
+    elif not isinstance(data.get("text"), str) or not data["text"]:
+        raise ValueError("文本水印模板缺少text")
+
+    font_size = data.setdefault("font_size", 24)
+    if not isinstance(font_size, int) or font_size <= 0:
+        raise ValueError(f"无效的字号: {font_size}")
+
+    color = data.setdefault("color", [255, 255, 255])
+    if (not isinstance(color, (list, tuple)) or len(color) not in (3, 4)
+            or not all(isinstance(value, int) and 0 <= value <= 255 for value in color)):
+        raise ValueError(f"无效的颜色: {color}")
+
+    opacity = data.setdefault("opacity", 50)
+    if not isinstance(opacity, numbers.Number) or not 0 <= opacity <= 100:
+        raise ValueError(f"无效的透明度: {opacity}")
+
+    position = data.setdefault("position", "center")
+    if isinstance(position, str):
+        if position not in ANCHORS:
+            raise ValueError(f"未知的位置: {position}")
+    elif (not isinstance(position, (list, tuple)) or len(position) != 2
+            or not all(isinstance(value, numbers.Number) for value in position)):
+        raise ValueError(f"无效的位置: {position}")
+
+    size_reference = data.setdefault("size_reference", None)
+    if size_reference is not None and size_reference not in SIZE_REFERENCES:
+        raise ValueError(f"未知的尺寸参照: {size_reference}")
+    if not isinstance(data.setdefault("rotation", 0), numbers.Number):
+        raise ValueError(f"无效的旋转角度: {data['rotation']}")
+    if data.setdefault("resample", DEFAULT_RESAMPLE) not in RESAMPLE_MODES:
+        raise ValueError(f"未知的重采样方式: {data['resample']}")
+    return data
+
+
+class CompiledTemplate:
+    """编译后的模板
+
+    包含校验后的模板数据、按模板配置好的水印对象、解析好的字体和预先渲染的水印图块。
+    应用到界面或交给批量任务时不必再解析字体和渲染，图块直接放入目标水印的缓存。
+    按比例设置尺寸的模板的图块取决于图片尺寸，只解析字体，图块在第一张图片上渲染。
+    """
+
+    def __init__(self, name, template_data):
+        """编译模板
+
+        Args:
+            name: 模板名称
+            template_data: 模板数据字典
+
+        Raises:
+            ValueError: 模板数据无效
+        """
+        self.name = name
+        self.data = validate_template(template_data)
+        self.watermark = Watermark()
+        self.watermark.apply_settings(self.data)
+        self.font = None
+        self.spec = None
+        self.sprite = None
+        if self.watermark.watermark_type == "text":
+            self.font = self.watermark._load_font()
+        if self.watermark.size_reference is None:
+            self.spec = self.watermark.get_spec()
+            self.sprite = self.watermark.get_sprite()
+
+    def is_stale(self):
+        """图片水印的源文件是否在编译后被修改过"""
+        source = self.watermark.logo_source
+        return source is not None and source.is_stale()
+
+    def apply_to(self, watermark):
+        """把模板设置和预先渲染的图块应用到另一个水印对象
+
+        Args:
+            watermark: 目标Watermark对象，如界面使用的水印
+        """
+        if self.watermark.logo_source is not None:
+            # 共用已加载的源图和金字塔，set_image看到相同的路径时不会重新加载
+            watermark.logo_source = self.watermark.logo_source
+            watermark.image_path = self.watermark.image_path
+        watermark.apply_settings(self.data)
+        if self.spec is not None:
+            watermark.sprite_cache.put(self.spec, self.sprite)
+
+
+def compile_template(template_data, name=None):
+    """编译模板
+
+    Args:
+        template_data: 模板数据字典
+        name: 模板名称
+
+    Returns:
+        CompiledTemplate: 编译后的模板
+
+    Raises:
+        ValueError: 模板数据无效
+    """
+    return CompiledTemplate(name or template_data.get("name"), template_data)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+重复输入检测模块
+"""
+
+import os
+import shutil
+
+from utils.common_utils import fingerprint_files
+
+
+# 重复输入的输出文件写入方式：link为硬链接(失败时复制)，copy为复制
+DUPLICATE_MODES = ("link", "copy")
+
+
+def group_duplicate_jobs(jobs, max_workers=None):
+    """把一批任务中输入内容相同的任务分为一组
+
+    先按设备号和inode合并同一个文件(同一路径或硬链接)，再对大小相同的文件计算采样指纹，
+    采样指纹也相同时计算完整指纹确认。只有输入内容完全相同、输出扩展名也相同的任务
+    才会分为一组，因为它们的输出必然相同。大小唯一的文件不会被读取。
+
+    Args:
+        jobs: (输入路径, 输出路径)元组列表
+        max_workers: 计算指纹的线程数，None表示使用默认值
+
+    Returns:
+        list: (任务, 重复任务列表)元组列表，按每组第一个任务在jobs中的顺序排列
+    """
+    groups = []
+    by_inode = {}
+    by_size = {}
+    for job in jobs:
+        input_path, output_path = job
+        extension = os.path.splitext(output_path)[1].lower()
+        try:
+            stat = os.stat(input_path)
+        except OSError:
+            # 无法读取的文件单独处理，由处理时报告错误
+            groups.append((job, []))
+            continue
+
+        # 部分文件系统不提供inode(值为0)，只能按内容比较
+        inode_key = (stat.st_dev, stat.st_ino, extension)
+        if stat.st_ino and inode_key in by_inode:
+            groups[by_inode[inode_key]][1].append(job)
+            continue
+        by_inode[inode_key] = len(groups)
+        by_size.setdefault((stat.st_size, extension), []).append(len(groups))
+        groups.append((job, []))
+
+    candidates = [index for indexes in by_size.values() if len(indexes) > 1 for index in indexes]
+    if candidates:
+        # 采样指纹只用于筛选，完整指纹相同才认为内容相同
+        for mode in ("sampled", "full"):
+            paths = [groups[index][0][0] for index in candidates]
+            fingerprints = fingerprint_files(paths, mode, max_workers)
+            buckets = {}
+            for index in candidates:
+                fingerprint = fingerprints[groups[index][0][0]]
+                if fingerprint is not None:
+                    extension = os.path.splitext(groups[index][0][1])[1].lower()
+                    buckets.setdefault((fingerprint, extension), []).append(index)
+            buckets = [indexes for indexes in buckets.values() if len(indexes) > 1]
+            candidates = [index for indexes in buckets for index in indexes]
+            if not candidates:
+                break
+
+        merged = set()
+        for indexes in buckets:
+            primary = groups[indexes[0]]
+            for index in indexes[1:]:
+                job, duplicates = groups[index]
+                primary[1].append(job)
+                primary[1].extend(duplicates)
+                merged.add(index)
+        groups = [group for index, group in enumerate(groups) if index not in merged]
+    return groups
+
+
+def write_duplicate_output(source_path, target_path, mode="link"):
+    """把已生成的输出文件写到重复任务的输出路径
+
+    Args:
+        source_path: 已生成的输出文件路径
+        target_path: 重复任务的输出文件路径，已存在时覆盖
+        mode: "link"创建硬链接，跨设备或文件系统不支持时改为复制；"copy"复制
+
+    Returns:
+        str: 实际使用的方式，"link"、"copy"，目标与源相同时为None
+    """
+    if mode not in DUPLICATE_MODES:
+        raise ValueError(f"未知的重复输出方式: {mode}")
+    if os.path.normcase(os.path.abspath(source_path)) == os.path.normcase(os.path.abspath(target_path)):
+        return None
+
+    output_folder = os.path.dirname(target_path)
+    if output_folder and not os.path.exists(output_folder):
+        os.makedirs(output_folder, exist_ok=True)
+
+    if mode == "link":
+        # 先链接到临时文件再替换，目标已存在时也能一步完成
+        temp_path = f"{target_path}.link"
+        try:
+            os.link(source_path, temp_path)
+            os.replace(temp_path, target_path)
+            return "link"
+        except OSError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+    shutil.copy2(source_path, target_path)
+    return "copy"
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+编码配置模块
+"""
+
+import io
+import os
+import time
+import zlib
+
+
+# 输出格式与扩展名的对应关系
+FORMAT_EXTENSIONS = {
+    "PNG": ".png",
+    "JPEG": ".jpg",
+    "WEBP": ".webp",
+    "TIFF": ".tif",
+    "BMP": ".bmp"
+}
+
+# 扩展名到输出格式，未列出的扩展名按PNG保存
+EXTENSION_FORMATS = {
+    ".png": "PNG",
+    ".jpg": "JPEG",
+    ".jpeg": "JPEG",
+    ".webp": "WEBP",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+    ".bmp": "BMP"
+}
+
+DEFAULT_PRESET = "balanced"
+
+# 预设编码参数
+# - fast: 编码最快，适合预览和大批量临时输出
+# - balanced: 与之前的固定参数一致（JPEG质量95，PNG默认压缩级别）
+# - smallest: 文件最小，编码耗时最长
+ENCODER_PRESETS = {
+    "fast": {
+        "JPEG": {"quality": 90, "optimize": False, "progressive": False, "subsampling": "4:2:0"},
+        "PNG": {"compress_level": 1, "compress_type": zlib.Z_RLE},
+        "WEBP": {"quality": 85, "method": 0},
+        "TIFF": {"compression": "raw"}
+    },
+    "balanced": {
+        "JPEG": {"quality": 95, "optimize": False, "progressive": False, "subsampling": "4:2:0"},
+        "PNG": {"compress_level": 6, "compress_type": zlib.Z_DEFAULT_STRATEGY},
+        "WEBP": {"quality": 90, "method": 4},
+        "TIFF": {"compression": "raw"}
+    },
+    "smallest": {
+        "JPEG": {"quality": 85, "optimize": True, "progressive": True, "subsampling": "4:2:0"},
+        "PNG": {"compress_level": 9, "compress_type": zlib.Z_FILTERED, "optimize": True},
+        "WEBP": {"quality": 80, "method": 6},
+        "TIFF": {"compression": "tiff_adobe_deflate"}
+    }
+}
+
+# 预设显示名称，用于界面
+PRESET_LABELS = {
+    "fast": "快速",
+    "balanced": "均衡",
+    "smallest": "最小体积"
+}
+
+
+def get_format_from_path(file_path):
+    """根据文件扩展名确定输出格式
+
+    Args:
+        file_path: 文件路径
+
+    Returns:
+        str: 输出格式（PNG、JPEG、WEBP、TIFF或BMP）
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    return EXTENSION_FORMATS.get(ext, "PNG")
+
+
+class EncoderProfile:
+    """编码配置类，保存各输出格式的编码参数"""
+
+    def __init__(self, name, options):
+        """初始化编码配置
+
+        Args:
+            name: 配置名称
+            options: 格式到编码参数字典的映射
+        """
+        self.name = name
+        self.options = {fmt.upper(): dict(values) for fmt, values in options.items()}
+
+    def get_save_options(self, image_format, quality=None):
+        """获取指定格式的保存参数
+
+        Args:
+            image_format: 输出格式
+            quality: 覆盖JPEG/WebP质量，None表示使用配置中的值
+
+        Returns:
+            dict: 传给Image.save的关键字参数
+        """
+        options = dict(self.options.get(image_format.upper(), {}))
+        if quality is not None and image_format.upper() in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        return options
+
+    def prepare_image(self, img, image_format):
+        """把图像转换为输出格式支持的模式
+
+        Args:
+            img: 图像对象
+            image_format: 输出格式
+
+        Returns:
+            Image: 转换后的图像对象
+        """
+        if image_format == "JPEG":
+            # JPEG不支持透明通道，转换为RGB
+            if img.mode not in ("RGB", "L", "CMYK"):
+                img = img.convert("RGB")
+        elif image_format == "BMP":
+            # BMP的透明通道在大多数软件中不受支持
+            if img.mode not in ("RGB", "L", "P", "1"):
+                img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            img = img.convert("RGBA")
+        return img
+
+    def save(self, img, output, image_format=None, quality=None, **extra_options):
+        """按配置保存图像
+
+        Args:
+            img: 图像对象
+            output: 输出文件路径或文件对象
+            image_format: 输出格式，None表示根据文件扩展名确定
+            quality: 覆盖JPEG/WebP质量
+            extra_options: 额外的保存参数
+
+        Returns:
+            str: 实际使用的输出格式
+        """
+        if image_format is None:
+            image_format = get_format_from_path(output) if isinstance(output, str) else "PNG"
+        image_format = image_format.upper()
+
+        options = self.get_save_options(image_format, quality)
+        options.update(extra_options)
+        self.prepare_image(img, image_format).save(output, image_format, **options)
+        return image_format
+
+
+def get_encoder_profile(name=None):
+    """获取预设编码配置
+
+    Args:
+        name: 预设名称，None表示默认预设
+
+    Returns:
+        EncoderProfile: 编码配置对象
+
+    Raises:
+        ValueError: 预设不存在
+    """
+    name = name or DEFAULT_PRESET
+    if name not in ENCODER_PRESETS:
+        raise ValueError(f"未知的编码预设: {name}")
+    return EncoderProfile(name, ENCODER_PRESETS[name])
+
+
+def get_preset_names():
+    """获取所有预设名称
+
+    Returns:
+        list: 预设名称列表
+    """
+    return list(ENCODER_PRESETS.keys())
+
+
+def benchmark_presets(image_paths, formats=None, presets=None, repeat=1):
+    """测量各预设在样本图片上的编码耗时和文件大小
+
+    每张图片只解码一次，随后在内存中按各个预设和格式编码。
+
+    Args:
+        image_paths: 样本图片路径列表
+        formats: 输出格式列表，None表示全部格式
+        presets: 预设名称列表，None表示全部预设
+        repeat: 每个组合重复编码的次数，取最短耗时
+
+    Returns:
+        list: 结果字典列表，包含preset、format、images、encode_time和bytes
+    """
+    formats = [fmt.upper() for fmt in (formats or FORMAT_EXTENSIONS.keys())]
+    presets = presets or get_preset_names()
+    profiles = [get_encoder_profile(name) for name in presets]
+    totals = {(profile.name, fmt): [0, 0.0, 0] for profile in profiles for fmt in formats}
+
+    from PIL import Image
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as img:
+                img.load()
+                source = img.copy()
+        except Exception as e:
+            print(f"跳过无法读取的图片 {image_path}: {str(e)}")
+            continue
+
+        for profile in profiles:
+            for fmt in formats:
+                # 模式转换不计入编码时间
+                prepared = profile.prepare_image(source, fmt)
+                options = profile.get_save_options(fmt)
+                best_time = None
+                size = 0
+                for _ in range(max(1, repeat)):
+                    buffer = io.BytesIO()
+                    start_time = time.perf_counter()
+                    prepared.save(buffer, fmt, **options)
+                    elapsed = time.perf_counter() - start_time
+                    best_time = elapsed if best_time is None else min(best_time, elapsed)
+                    size = buffer.tell()
+                total = totals[(profile.name, fmt)]
+                total[0] += 1
+                total[1] += best_time
+                total[2] += size
+
+    return [
+        {
+            "preset": profile.name,
+            "format": fmt,
+            "images": totals[(profile.name, fmt)][0],
+            "encode_time": totals[(profile.name, fmt)][1],
+            "bytes": totals[(profile.name, fmt)][2]
+        }
+        for profile in profiles for fmt in formats
+    ]
@@ -7,7 +7,7 @@ Photo-Watermark-2 - 图片水印工具
 """
 
 import os
-import glob
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
 
@@ -22,6 +22,7 @@ class FileHandler:
         """
         self.parent = parent
         self.supported_formats = "Images (*.jpg *.jpeg *.png *.bmp)"
+        self.image_extensions = frozenset(['.jpg', '.jpeg', '.png', '.bmp'])
         
     def select_image(self):
         """选择单个图片文件
@@ -188,36 +189,142 @@ class FileHandler:
         
         return True
         
-    def get_files_in_folder(self, folder_path, recursive=False):
+    def is_image_path(self, file_path):
+        """按扩展名判断路径是否为支持的图片，扫描文件夹和监视文件夹共用同一规则
+        
+        Args:
+            file_path: 文件路径或文件名
+            
+        Returns:
+            bool: 扩展名是否受支持（不区分大小写）
+        """
+        return os.path.splitext(file_path)[1].lower() in self.image_extensions
+        
+    def get_files_in_folder(self, folder_path, recursive=False, max_workers=None):
         """获取文件夹中的所有图片文件
         
         Args:
             folder_path: 文件夹路径
             recursive: 是否递归搜索子文件夹
+            max_workers: 递归时并行扫描子文件夹的线程数，None或1表示单线程
             
         Returns:
             list: 图片文件路径列表
         """
+        return list(self.iter_files_in_folder(folder_path, recursive, max_workers))
+        
+    def iter_files_in_folder(self, folder_path, recursive=False, max_workers=None):
+        """逐个产出文件夹中的图片文件
+        
+        基于os.scandir单次遍历，每个目录项只做一次扩展名匹配，调用方可以在
+        整个目录树列举完成之前就开始处理。每个文件只会产出一次，不受文件系统
+        是否区分大小写的影响。
+        
+        Args:
+            folder_path: 文件夹路径
+            recursive: 是否递归搜索子文件夹
+            max_workers: 递归时并行扫描子文件夹的线程数，None或1表示单线程
+            
+        Yields:
+            str: 图片文件路径
+        """
         if not os.path.isdir(folder_path):
-            return []
+            return
             
-        file_paths = []
-        # 获取所有支持的图片格式
-        extensions = ['.jpg', '.jpeg', '.png', '.bmp']
-        
-        if recursive:
-            # 递归搜索
-            for root, _, files in os.walk(folder_path):
-                for file in files:
-                    if any(file.lower().endswith(ext) for ext in extensions):
-                        file_paths.append(os.path.join(root, file))
-        else:
-            # 只搜索当前文件夹
-            for ext in extensions:
-                file_paths.extend(glob.glob(os.path.join(folder_path, f"*{ext}")))
-                file_paths.extend(glob.glob(os.path.join(folder_path, f"*{ext.upper()}")))
+        if recursive and max_workers and max_workers > 1:
+            yield from self._iter_files_parallel(folder_path, max_workers)
+            return
+            
+        for entry in self.iter_image_entries(folder_path, recursive):
+            yield entry.path
+            
+    def iter_image_entries(self, folder_path, recursive=False):
+        """逐个产出文件夹中图片文件的目录项
         
-        return file_paths
+        与iter_files_in_folder相同，但产出os.DirEntry对象，调用方可以直接使用
+        entry.stat()：Windows下文件大小和修改时间来自目录遍历本身，其他系统上
+        结果也会缓存在目录项中。
+        
+        Args:
+            folder_path: 文件夹路径
+            recursive: 是否递归搜索子文件夹
+            
+        Yields:
+            os.DirEntry: 图片文件的目录项
+        """
+        if not os.path.isdir(folder_path):
+            return
+            
+        pending_dirs = [folder_path]
+        while pending_dirs:
+            entries, sub_dirs = self._scan_directory_entries(pending_dirs.pop())
+            yield from entries
+            if recursive:
+                # 倒序压栈，保持与os.walk相近的遍历顺序
+                pending_dirs.extend(reversed(sub_dirs))
+                
+    def _iter_files_parallel(self, folder_path, max_workers):
+        """使用线程池并行扫描子文件夹
+        
+        Args:
+            folder_path: 文件夹路径
+            max_workers: 线程数
+            
+        Yields:
+            str: 图片文件路径
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            running = {executor.submit(self._scan_directory, folder_path)}
+            try:
+                while running:
+                    done, running = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        files, sub_dirs = future.result()
+                        for sub_dir in sub_dirs:
+                            running.add(executor.submit(self._scan_directory, sub_dir))
+                        yield from files
+            finally:
+                # 调用方提前停止迭代时，取消尚未开始的扫描
+                for future in running:
+                    future.cancel()
+                    
+    def _scan_directory(self, dir_path):
+        """扫描单个目录
+        
+        Args:
+            dir_path: 目录路径
+            
+        Returns:
+            tuple: (图片文件路径列表, 子目录路径列表)
+        """
+        entries, sub_dirs = self._scan_directory_entries(dir_path)
+        return [entry.path for entry in entries], sub_dirs
+        
+    def _scan_directory_entries(self, dir_path):
+        """扫描单个目录，返回图片文件的目录项
+        
+        Args:
+            dir_path: 目录路径
+            
+        Returns:
+            tuple: (图片文件目录项列表, 子目录路径列表)
+        """
+        files = []
+        sub_dirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        # 不跟随目录符号链接，避免循环遍历
+                        if entry.is_dir(follow_symlinks=False):
+                            sub_dirs.append(entry.path)
+                        elif self.is_image_path(entry.name) and entry.is_file():
+                            files.append(entry)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return files, sub_dirs
         
     def create_folder_if_not_exists(self, folder_path):
         """如果文件夹不存在则创建
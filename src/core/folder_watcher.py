@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+文件夹监视模块
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+
+from core.file_handler import FileHandler
+
+
+# inotify事件掩码（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class _InotifyBackend:
+    """基于Linux inotify的事件源，通过ctypes直接调用libc"""
+
+    def __init__(self, folder_path, recursive):
+        """初始化inotify监视
+
+        Args:
+            folder_path: 监视的文件夹路径
+            recursive: 是否同时监视子文件夹
+
+        Raises:
+            OSError: 当前系统不支持inotify
+        """
+        import ctypes
+        import ctypes.util
+
+        libc_name = ctypes.util.find_library("c")
+        if not sys.platform.startswith("linux") or not libc_name:
+            raise OSError(errno.ENOSYS, "inotify不可用")
+
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1失败")
+
+        self.recursive = recursive
+        self.watches = {}
+        # 监视的文件夹本身被删除或移走后置为True，之后该路径上的变化不会再产生事件
+        self.root_removed = False
+        self._buffer = b""
+        self._root_wd = self._add_watch(folder_path)
+        if recursive:
+            for root, dirs, _ in os.walk(folder_path):
+                for dir_name in dirs:
+                    self._add_watch(os.path.join(root, dir_name))
+
+    def _add_watch(self, dir_path):
+        """为目录添加监视
+
+        Returns:
+            int: 监视描述符，失败时为负数
+        """
+        mask = (IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MODIFY | IN_DELETE | IN_MOVED_FROM
+                | IN_DELETE_SELF | IN_MOVE_SELF)
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(dir_path), mask)
+        if wd >= 0:
+            self.watches[wd] = dir_path
+        return wd
+
+    def read_events(self, timeout):
+        """读取事件
+
+        Args:
+            timeout: 最长等待时间(秒)
+
+        Returns:
+            list: (路径, 是否已完成写入, 是否已删除或移走)元组列表；删除或移走的可能是目录。
+                  队列溢出时返回None，调用方应退回到一次完整扫描。监视的文件夹本身
+                  被删除或移走时设置root_removed
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+
+        try:
+            self._buffer += os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        overflow = False
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(self._buffer):
+            wd, mask, _, name_len = _INOTIFY_EVENT.unpack_from(self._buffer, offset)
+            end = offset + _INOTIFY_EVENT.size + name_len
+            if end > len(self._buffer):
+                break
+            name = self._buffer[offset + _INOTIFY_EVENT.size:end].rstrip(b"\0")
+            offset = end
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                # 子目录的删除和移走已由父目录的事件报告，只需关注监视的文件夹本身
+                if wd == self._root_wd:
+                    self.root_removed = True
+                continue
+
+            dir_path = self.watches.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, os.fsdecode(name))
+
+            if mask & (IN_DELETE | IN_MOVED_FROM):
+                events.append((path, False, True))
+                continue
+
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_watch(path)
+                    # 新目录中可能在添加监视前就已有文件
+                    for root, dirs, files in os.walk(path):
+                        for dir_name in dirs:
+                            self._add_watch(os.path.join(root, dir_name))
+                        events.extend((os.path.join(root, f), False, False) for f in files)
+                continue
+
+            # CLOSE_WRITE和MOVED_TO表示写入方已经完成
+            events.append((path, bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO)), False))
+
+        self._buffer = self._buffer[offset:]
+        return None if overflow else events
+
+    def close(self):
+        """关闭inotify文件描述符"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class FolderWatcher:
+    """文件夹监视器，发现新图片后等待写入完成并按微批次回调
+
+    优先使用inotify，不可用或监视的文件夹本身被删除、移走后退回到轮询。扫描和扩展名匹配与FileHandler共用同一实现。
+    """
+
+    def __init__(self, folder_path, on_batch, extensions=None, recursive=False,
+                 poll_interval=1.0, settle_time=2.0, debounce=0.5,
+                 max_batch_size=32, exclude_folders=None, use_inotify=True):
+        """初始化文件夹监视器
+
+        Args:
+            folder_path: 监视的文件夹路径
+            on_batch: 回调函数，参数为就绪的图片路径列表
+            extensions: 支持的扩展名列表（小写，带点）
+            recursive: 是否递归监视子文件夹
+            poll_interval: 轮询间隔(秒)
+            settle_time: 文件大小和修改时间保持不变多久后视为写入完成(秒)
+            debounce: 最后一个文件就绪后等待多久再提交批次(秒)
+            max_batch_size: 单个批次的最大文件数
+            exclude_folders: 需要忽略的文件夹列表（例如输出文件夹）
+            use_inotify: 是否尝试使用inotify
+        """
+        self.folder_path = os.path.abspath(folder_path)
+        self.on_batch = on_batch
+        self.file_handler = FileHandler()
+        if extensions:
+            self.file_handler.image_extensions = frozenset(ext.lower() for ext in extensions)
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.settle_time = settle_time
+        self.debounce = debounce
+        self.max_batch_size = max_batch_size
+        self.exclude_folders = [
+            os.path.normcase(os.path.abspath(folder)) + os.sep
+            for folder in (exclude_folders or [])
+        ]
+        self.use_inotify = use_inotify
+
+        self._stop_event = threading.Event()
+        self._backend = None
+        # 等待写入完成的文件: 路径 -> (大小, 修改时间, 最后变化时刻)
+        self._pending = {}
+        # 已提交处理的文件: 路径 -> (大小, 修改时间)，文件删除或移走后移除
+        self._processed = {}
+        self._ready = []
+        self._last_ready_time = 0.0
+
+    @property
+    def backend_name(self):
+        """当前使用的事件源名称"""
+        return "inotify" if self._backend is not None else "polling"
+
+    def _is_candidate(self, path):
+        """检查路径是否为需要处理的图片"""
+        if not self.file_handler.is_image_path(path):
+            return False
+        normalized = os.path.normcase(os.path.abspath(path))
+        return not any(normalized.startswith(folder) for folder in self.exclude_folders)
+
+    def _scan(self):
+        """扫描监视的文件夹
+
+        Returns:
+            dict: 路径 -> (大小, 修改时间)
+        """
+        found = {}
+        for entry in self.file_handler.iter_image_entries(self.folder_path, self.recursive):
+            if not self._is_candidate(entry.path):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return found
+
+    def _forget(self, path):
+        """文件或目录被删除、移走后，移除它及其中文件的记录
+
+        Args:
+            path: 文件或目录路径
+        """
+        self._pending.pop(path, None)
+        self._processed.pop(path, None)
+        prefix = path + os.sep
+        for records in (self._pending, self._processed):
+            for tracked in [tracked for tracked in records if tracked.startswith(prefix)]:
+                del records[tracked]
+
+    def _track(self, path, closed=False, now=None):
+        """记录一个候选文件
+
+        Args:
+            path: 文件路径
+            closed: 写入方是否已关闭文件
+            now: 当前时刻
+        """
+        if not self._is_candidate(path):
+            return
+        now = now if now is not None else time.monotonic()
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if self._processed.get(path) == signature:
+            return
+
+        if closed and stat.st_size > 0:
+            self._mark_ready(path, signature, now)
+            return
+
+        previous = self._pending.get(path)
+        if previous is None or previous[:2] != signature:
+            self._pending[path] = (signature[0], signature[1], now)
+
+    def _rescan(self, now):
+        """完整扫描一次：跟踪新增或变化的文件，移除已不存在的文件的记录
+
+        Args:
+            now: 当前时刻
+        """
+        found = self._scan()
+        for path in [path for path in self._processed if path not in found]:
+            del self._processed[path]
+        for path, signature in found.items():
+            if self._processed.get(path) != signature:
+                self._track(path, now=now)
+
+    def _check_pending(self, now):
+        """检查等待中的文件是否已经写入完成"""
+        for path, (size, mtime, changed_at) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if signature != (size, mtime):
+                self._pending[path] = (signature[0], signature[1], now)
+            elif size > 0 and now - changed_at >= self.settle_time:
+                self._mark_ready(path, signature, now)
+
+    def _mark_ready(self, path, signature, now):
+        """将文件标记为就绪"""
+        self._pending.pop(path, None)
+        self._processed[path] = signature
+        self._ready.append(path)
+        self._last_ready_time = now
+
+    def _flush(self, now, force=False):
+        """按防抖规则提交就绪文件"""
+        while self._ready and (
+            force
+            or len(self._ready) >= self.max_batch_size
+            or now - self._last_ready_time >= self.debounce
+        ):
+            batch = self._ready[:self.max_batch_size]
+            self._ready = self._ready[self.max_batch_size:]
+            try:
+                self.on_batch(batch)
+            except Exception as e:
+                print(f"处理批次时发生错误: {str(e)}")
+
+    def _open_backend(self):
+        """尝试打开inotify事件源"""
+        if not self.use_inotify:
+            return None
+        try:
+            return _InotifyBackend(self.folder_path, self.recursive)
+        except (OSError, AttributeError):
+            return None
+
+    def run(self, process_existing=False):
+        """开始监视，阻塞直到stop()被调用
+
+        Args:
+            process_existing: 是否处理启动时文件夹中已存在的图片
+        """
+        if not os.path.isdir(self.folder_path):
+            raise NotADirectoryError(f"不是有效的文件夹: {self.folder_path}")
+
+        self._stop_event.clear()
+        self._backend = self._open_backend()
+        now = time.monotonic()
+
+        # 启动时的快照：要么作为待处理文件，要么视为已处理
+        for path, signature in self._scan().items():
+            if process_existing:
+                self._track(path, now=now)
+            else:
+                self._processed[path] = signature
+
+        try:
+            while not self._stop_event.is_set():
+                # 有待定文件时需要更频繁地醒来检查稳定性和防抖
+                timeout = self.poll_interval
+                if self._pending:
+                    timeout = min(timeout, self.settle_time / 2)
+                if self._ready:
+                    timeout = min(timeout, self.debounce)
+
+                if self._backend is not None:
+                    events = self._backend.read_events(timeout)
+                    now = time.monotonic()
+                    if events is None:
+                        # 事件队列溢出，做一次完整扫描补齐
+                        self._rescan(now)
+                    else:
+                        for path, closed, removed in events:
+                            if removed:
+                                self._forget(path)
+                            else:
+                                self._track(path, closed, now)
+                    if self._backend.root_removed:
+                        # inotify跟随的是原来的目录，按路径轮询才能在文件夹重新出现后继续工作
+                        print(f"监视的文件夹已被删除或移走，改为轮询: {self.folder_path}")
+                        self._backend.close()
+                        self._backend = None
+                        self._rescan(now)
+                else:
+                    self._stop_event.wait(timeout)
+                    now = time.monotonic()
+                    self._rescan(now)
+
+                self._check_pending(now)
+                self._flush(now)
+        finally:
+            self._flush(time.monotonic(), force=True)
+            if self._backend is not None:
+                self._backend.close()
+                self._backend = None
+
+    def stop(self):
+        """停止监视"""
+        self._stop_event.set()
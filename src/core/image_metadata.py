@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+图片元数据模块
+"""
+
+import io
+import struct
+from PIL import Image, PngImagePlugin
+
+
+ORIENTATION_TAG = 0x0112
+EXIF_HEADER = b"Exif\x00\x00"
+# JPEG的APP1段最多65535字节，减去长度字段和Exif头
+MAX_EXIF_SIZE = 65533 - len(EXIF_HEADER)
+EXIF_THUMBNAIL_SIZE = (160, 120)
+
+
+class ImageMetadata:
+    """图片元数据类，保存从源图片读取的EXIF、XMP和ICC配置
+
+    所有数据都来自解码时已经打开的Image对象的文件头，不需要再次读取文件。
+    """
+
+    def __init__(self, exif=None, icc_profile=None, xmp=None, has_thumbnail=False):
+        """初始化图片元数据
+
+        Args:
+            exif: 原始EXIF数据(bytes)
+            icc_profile: ICC配置数据(bytes)
+            xmp: XMP数据(bytes)
+            has_thumbnail: 原始EXIF中是否包含缩略图
+        """
+        self.exif = exif
+        self.icc_profile = icc_profile
+        self.xmp = xmp
+        self.has_thumbnail = has_thumbnail
+        self.orientation = 1
+        self._exif_modified = False
+
+        if exif:
+            try:
+                parsed = Image.Exif()
+                parsed.load(exif)
+                orientation = parsed.get(ORIENTATION_TAG, 1)
+                self.orientation = orientation if orientation in range(1, 9) else 1
+            except Exception:
+                self.orientation = 1
+
+    @classmethod
+    def from_image(cls, img):
+        """从打开的图片中读取元数据
+
+        Args:
+            img: 通过Image.open打开的图像对象
+
+        Returns:
+            ImageMetadata: 元数据对象
+        """
+        info = img.info
+        exif = info.get("exif")
+        if isinstance(exif, Image.Exif):
+            exif = exif.tobytes()
+        if exif and not exif.startswith(EXIF_HEADER):
+            exif = EXIF_HEADER + exif
+
+        # CMYK等颜色空间的ICC配置不适用于转换后的RGB输出
+        icc_profile = info.get("icc_profile") if img.mode in ("RGB", "RGBA", "L", "LA", "P") else None
+
+        xmp = info.get("xmp") or info.get("XML:com.adobe.xmp")
+        if isinstance(xmp, str):
+            xmp = xmp.encode("utf-8")
+
+        return cls(exif or None, icc_profile or None, xmp or None, _exif_has_ifd1(exif))
+
+    def reset_orientation(self):
+        """像素已经按EXIF方向转正后调用，把方向标记重置为1"""
+        if self.orientation != 1:
+            self.orientation = 1
+            self._exif_modified = True
+
+    def build_exif(self, image=None):
+        """生成写入输出文件的EXIF数据
+
+        如果原图带有EXIF缩略图，则用已合成水印的图像重新生成缩略图，
+        保证缩略图与正图一致。
+
+        Args:
+            image: 输出图像，用于生成缩略图
+
+        Returns:
+            bytes: EXIF数据，没有EXIF时返回None
+        """
+        if not self.exif:
+            return None
+
+        regenerate_thumbnail = self.has_thumbnail and image is not None
+        if not regenerate_thumbnail and not self._exif_modified:
+            # 未做修改时直接写回原始数据，完整保留厂商私有标签
+            return self.exif
+
+        try:
+            exif = Image.Exif()
+            exif.load(self.exif)
+            if self._exif_modified:
+                exif[ORIENTATION_TAG] = self.orientation
+            # Pillow序列化时不包含IFD1，缩略图在后面重新追加
+            exif_bytes = exif.tobytes()
+        except Exception:
+            return self.exif if not self._exif_modified else None
+
+        if regenerate_thumbnail:
+            thumbnail = make_exif_thumbnail(image)
+            with_thumbnail = _append_thumbnail_ifd(exif_bytes, thumbnail)
+            if len(with_thumbnail) - len(EXIF_HEADER) <= MAX_EXIF_SIZE:
+                exif_bytes = with_thumbnail
+        return exif_bytes
+
+    def get_save_options(self, image_format, image=None):
+        """获取写入元数据的保存参数
+
+        Args:
+            image_format: 输出格式
+            image: 输出图像，用于重新生成EXIF缩略图
+
+        Returns:
+            dict: 传给Image.save的关键字参数
+        """
+        options = {}
+        exif = self.build_exif(image)
+        if exif:
+            options["exif"] = exif
+        if self.icc_profile:
+            options["icc_profile"] = self.icc_profile
+        if self.xmp:
+            if image_format == "PNG":
+                pnginfo = PngImagePlugin.PngInfo()
+                pnginfo.add_itxt("XML:com.adobe.xmp", self.xmp.decode("utf-8", "replace"))
+                options["pnginfo"] = pnginfo
+            else:
+                options["xmp"] = self.xmp
+        return options
+
+
+def make_exif_thumbnail(image, max_size=EXIF_THUMBNAIL_SIZE, quality=75):
+    """生成EXIF缩略图
+
+    先用整数倍的box缩小(reduce)快速降到接近目标尺寸，再做一次小图重采样，
+    避免在全尺寸图像上运行高质量滤波。
+
+    Args:
+        image: 图像对象
+        max_size: 缩略图最大尺寸
+        quality: JPEG质量
+
+    Returns:
+        bytes: JPEG格式的缩略图数据
+    """
+    factor = max(1, min(image.width // max_size[0], image.height // max_size[1]))
+    thumbnail = image.reduce(factor) if factor > 1 else image.copy()
+    if thumbnail.mode != "RGB":
+        thumbnail = thumbnail.convert("RGB")
+    thumbnail.thumbnail(max_size, getattr(Image, "Resampling", Image).BILINEAR)
+
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def _exif_has_ifd1(exif):
+    """检查EXIF数据中IFD0之后是否还有IFD1（缩略图所在的目录）"""
+    try:
+        if not exif:
+            return False
+        tiff = exif[len(EXIF_HEADER):] if exif.startswith(EXIF_HEADER) else exif
+        endian = "<" if tiff[:2] == b"II" else ">"
+        ifd0_offset = struct.unpack_from(endian + "L", tiff, 4)[0]
+        entry_count = struct.unpack_from(endian + "H", tiff, ifd0_offset)[0]
+        next_offset = struct.unpack_from(endian + "L", tiff, ifd0_offset + 2 + 12 * entry_count)[0]
+        return 0 < next_offset < len(tiff)
+    except (struct.error, IndexError):
+        return False
+
+
+def _append_thumbnail_ifd(exif_bytes, thumbnail):
+    """在Pillow生成的EXIF数据后追加包含JPEG缩略图的IFD1
+
+    Args:
+        exif_bytes: 以Exif头开始、不含IFD1的EXIF数据
+        thumbnail: JPEG缩略图数据
+
+    Returns:
+        bytes: 追加了IFD1的EXIF数据
+    """
+    tiff = bytearray(exif_bytes[len(EXIF_HEADER):])
+    endian = "<" if tiff[:2] == b"II" else ">"
+    ifd0_offset = struct.unpack_from(endian + "L", tiff, 4)[0]
+    entry_count = struct.unpack_from(endian + "H", tiff, ifd0_offset)[0]
+    next_pointer = ifd0_offset + 2 + 12 * entry_count
+
+    # IFD需要字对齐
+    if len(tiff) % 2:
+        tiff += b"\0"
+    ifd1_offset = len(tiff)
+    # 3个条目：Compression、JPEGInterchangeFormat、JPEGInterchangeFormatLength
+    thumbnail_offset = ifd1_offset + 2 + 12 * 3 + 4
+    ifd1 = struct.pack(endian + "H", 3)
+    ifd1 += struct.pack(endian + "HHLHH", 0x0103, 3, 1, 6, 0)
+    ifd1 += struct.pack(endian + "HHLL", 0x0201, 4, 1, thumbnail_offset)
+    ifd1 += struct.pack(endian + "HHLL", 0x0202, 4, 1, len(thumbnail))
+    ifd1 += struct.pack(endian + "L", 0)
+
+    struct.pack_into(endian + "L", tiff, next_pointer, ifd1_offset)
+    return EXIF_HEADER + bytes(tiff) + ifd1 + thumbnail
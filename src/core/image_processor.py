@@ -6,9 +6,12 @@ Photo-Watermark-2 - 图片水印工具
 图像处理器模块
 """
 
-from PIL import Image
 import os
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from core.encoder_profiles import get_encoder_profile
+from core.layout import read_orientation
 
 
 class ImageProcessor:
@@ -18,6 +21,7 @@ class ImageProcessor:
         """初始化图像处理器"""
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp']
         self.loaded_images = []  # 存储已加载的图片路径列表
+        self._loaded_image_set = set()  # 用于快速判断路径是否已加载
         self.current_image_index = -1  # 当前选中的图片索引
         self.temp_folder = tempfile.gettempdir()
         
@@ -49,6 +53,8 @@ class ImageProcessor:
             raise ValueError(f"不支持的文件格式: {file_path}")
             
         try:
+            # Pillow只在需要时导入，主窗口创建图像处理器时不必加载
+            from PIL import Image
             with Image.open(file_path) as img:
                 # 确保图片有Alpha通道（如果是PNG格式）
                 if file_path.lower().endswith('.png') and img.mode != 'RGBA':
@@ -57,8 +63,9 @@ class ImageProcessor:
                     img = img.convert('RGB')
                 
                 # 添加到已加载图片列表
-                if file_path not in self.loaded_images:
+                if file_path not in self._loaded_image_set:
                     self.loaded_images.append(file_path)
+                    self._loaded_image_set.add(file_path)
                     self.current_image_index = len(self.loaded_images) - 1
                 
                 return img.copy()
@@ -85,6 +92,29 @@ class ImageProcessor:
                 
         return success_paths
         
+    def add_image_paths(self, file_paths):
+        """登记图片路径但不解码图片
+        
+        用于大批量导入，真正的解码推迟到预览或导出时进行。
+        
+        Args:
+            file_paths: 图片文件路径列表
+            
+        Returns:
+            list: 新登记的图片路径列表
+        """
+        added_paths = []
+        for file_path in file_paths:
+            if file_path in self._loaded_image_set or not self.is_supported_format(file_path):
+                continue
+            self.loaded_images.append(file_path)
+            self._loaded_image_set.add(file_path)
+            added_paths.append(file_path)
+            
+        if added_paths and self.current_image_index < 0:
+            self.current_image_index = 0
+        return added_paths
+        
     def load_folder(self, folder_path):
         """加载文件夹中的所有图片
         
@@ -142,27 +172,44 @@ class ImageProcessor:
                 img.thumbnail(max_size, Image.ANTIALIAS)
         return img
         
-    def save_image(self, img, output_path, quality=95):
+    def create_thumbnail(self, file_path, max_width=100, max_height=100):
+        """生成图片缩略图，不登记到已加载图片列表
+        
+        对JPEG使用draft模式在解码阶段直接按比例缩小，避免完整解码大图。
+        
+        Args:
+            file_path: 图片文件路径
+            max_width: 缩略图的最大宽度
+            max_height: 缩略图的最大高度
+            
+        Returns:
+            Image: 缩略图对象，生成失败返回None
+        """
+        max_size = (max_width, max_height)
+        try:
+            from PIL import Image
+            with Image.open(file_path) as img:
+                img.draft('RGB', max_size)
+                if img.mode != 'RGB':
+                    img = img.convert('RGBA')
+                # 兼容Pillow 9.0（没有Image.Resampling）
+                img.thumbnail(max_size, getattr(Image, 'Resampling', Image).LANCZOS)
+                return img.copy()
+        except Exception:
+            return None
+        
+    def save_image(self, img, output_path, quality=None, preset=None):
         """保存图像到文件
         
         Args:
             img: 图像对象
             output_path: 输出文件路径
-            quality: 保存质量（0-100）
+            quality: 保存质量（0-100），None表示使用预设中的质量
+            preset: 编码预设名称，None表示默认预设
         """
         try:
-            # 根据文件扩展名选择保存格式
-            ext = os.path.splitext(output_path)[1].lower()
-            if ext in ['.jpg', '.jpeg']:
-                # JPEG不支持透明通道，转换为RGB
-                if img.mode == 'RGBA':
-                    img = img.convert('RGB')
-                img.save(output_path, 'JPEG', quality=quality)
-            elif ext == '.png':
-                img.save(output_path, 'PNG')
-            else:
-                # 默认保存为PNG
-                img.save(output_path, 'PNG')
+            # 根据文件扩展名选择保存格式，按编码预设设置参数
+            get_encoder_profile(preset).save(img, output_path, quality=quality)
         except Exception as e:
             raise Exception(f"保存图片时发生错误: {str(e)}")
             
@@ -175,18 +222,87 @@ class ImageProcessor:
         Returns:
             dict: 图片信息字典
         """
-        img = self.load_image(file_path)
-        return {
-            'width': img.width,
-            'height': img.height,
-            'mode': img.mode,
-            'format': img.format,
-            'size_kb': os.path.getsize(file_path) / 1024
-        }
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+            
+        info = self.probe_image(file_path)
+        if info is None:
+            raise Exception(f"读取图片信息时发生错误: {file_path}")
+        return info
+        
+    def probe_image(self, file_path):
+        """只读取文件头获取图片元数据，不解码像素
+        
+        Image.open只解析文件头，像素数据在load()时才会解码，因此这里
+        不访问任何需要像素的接口。
+        
+        Args:
+            file_path: 图片文件路径
+            
+        Returns:
+            dict: 包含width、height、mode、format、orientation、has_icc、
+                  display_width、display_height和size_kb的字典，读取失败返回None
+        """
+        try:
+            from PIL import Image
+            with Image.open(file_path) as img:
+                width, height = img.size
+                orientation = self._read_orientation(img)
+                info = {
+                    'path': file_path,
+                    'width': width,
+                    'height': height,
+                    'mode': img.mode,
+                    'format': img.format,
+                    'orientation': orientation,
+                    'has_icc': bool(img.info.get('icc_profile')),
+                    'size_kb': os.path.getsize(file_path) / 1024
+                }
+        except Exception:
+            return None
+            
+        # EXIF方向5-8表示需要旋转90度，显示尺寸宽高互换
+        if orientation in (5, 6, 7, 8):
+            info['display_width'], info['display_height'] = height, width
+        else:
+            info['display_width'], info['display_height'] = width, height
+        return info
         
+    def probe_images(self, file_paths, max_workers=None):
+        """并行读取多个图片的文件头
+        
+        Args:
+            file_paths: 图片文件路径列表
+            max_workers: 线程数，None表示使用默认值
+            
+        Returns:
+            list: 与file_paths顺序一致的信息字典列表，读取失败的位置为None
+        """
+        file_paths = list(file_paths)
+        if len(file_paths) <= 1:
+            return [self.probe_image(file_path) for file_path in file_paths]
+            
+        # 读取文件头主要是IO等待，线程数可以多于CPU核心数
+        max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(self.probe_image, file_paths, chunksize=16))
+            
+    def _read_orientation(self, img):
+        """从未解码的图片中读取EXIF方向
+        
+        Args:
+            img: 通过Image.open打开的图像对象
+            
+        Returns:
+            int: EXIF方向值(1-8)，没有方向信息时返回1
+        """
+        # 与水印布局共用同一个只读文件头的实现
+        return read_orientation(img)
+            
     def clear_loaded_images(self):
         """清除已加载的图片列表"""
         self.loaded_images = []
+        self._loaded_image_set = set()
         self.current_image_index = -1
         
     def set_current_image(self, index):
@@ -218,6 +334,7 @@ class ImageProcessor:
             bool: 是否移除成功
         """
         if 0 <= index < len(self.loaded_images):
+            self._loaded_image_set.discard(self.loaded_images[index])
             del self.loaded_images[index]
             # 如果移除的是当前选中的图片，更新当前索引
             if self.current_image_index >= len(self.loaded_images):
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+图片水印图块模块
+"""
+
+import os
+from collections import namedtuple
+
+from PIL import Image
+
+from core.text_sprite import RESAMPLE_MODES, DEFAULT_RESAMPLE, SUPERSAMPLE_FACTOR
+
+
+# 金字塔最小一层的短边长度(像素)
+MIN_LEVEL_SIZE = 8
+
+_Resampling = getattr(Image, "Resampling", Image)
+
+# 决定图片水印图块内容的全部设置，用作缓存的键
+ImageWatermarkSpec = namedtuple(
+    "ImageWatermarkSpec",
+    ["path", "mtime", "width", "opacity", "rotation", "resample"]
+)
+
+
+class LogoSource:
+    """图片水印的源图
+
+    源图只读取一次并转换为预乘透明度的RGBa模式，再逐级缩小一半生成金字塔。
+    缩放到目标尺寸时从不小于目标的最小一层开始重采样，
+    不必每次都从全分辨率的源图缩小；预乘后插值也不会在透明边缘混入杂色。
+    """
+
+    def __init__(self, path):
+        """加载源图并生成金字塔
+
+        Args:
+            path: 图片路径，通常为带透明通道的PNG
+        """
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with Image.open(path) as img:
+            source = img.convert("RGBA").convert("RGBa")
+        self.size = source.size
+        self.levels = [source]
+        while min(self.levels[-1].size) // 2 >= MIN_LEVEL_SIZE:
+            self.levels.append(self.levels[-1].reduce(2))
+
+    def is_stale(self):
+        """源文件是否在加载后被修改过"""
+        try:
+            return os.path.getmtime(self.path) != self.mtime
+        except OSError:
+            return True
+
+    def get_level(self, width):
+        """获取宽度不小于目标宽度的最小一层
+
+        Args:
+            width: 目标宽度(像素)
+
+        Returns:
+            Image: RGBa模式的图像
+        """
+        for level in reversed(self.levels):
+            if level.width >= width:
+                return level
+        return self.levels[0]
+
+    def scaled(self, width):
+        """缩放到指定宽度，保持宽高比
+
+        Args:
+            width: 目标宽度(像素)
+
+        Returns:
+            Image: RGBa模式的图像
+        """
+        width = max(1, int(width))
+        height = max(1, int(round(self.size[1] * width / self.size[0])))
+        level = self.get_level(width)
+        if level.size == (width, height):
+            return level.copy()
+        return level.resize((width, height), _Resampling.LANCZOS)
+
+
+def render_image_sprite(source, width, opacity=100, rotation=0, resample=DEFAULT_RESAMPLE):
+    """生成图片水印图块
+
+    Args:
+        source: LogoSource对象
+        width: 水印宽度(像素)，旋转前
+        opacity: 透明度(0-100%)
+        rotation: 旋转角度(度)，逆时针
+        resample: 旋转时的重采样方式，见RESAMPLE_MODES
+
+    Returns:
+        Image: RGBA水印图块，旋转后按实际内容裁剪
+    """
+    if resample not in RESAMPLE_MODES:
+        raise ValueError(f"未知的重采样方式: {resample}")
+
+    if rotation % 360 == 0:
+        sprite = source.scaled(width)
+    elif resample == "supersample":
+        # 从更高的一层取放大的图像旋转，再以盒式滤波缩小
+        large = source.scaled(width * SUPERSAMPLE_FACTOR)
+        large = large.rotate(rotation, resample=_Resampling.BILINEAR, expand=True)
+        sprite = large.reduce(SUPERSAMPLE_FACTOR)
+    else:
+        sprite = source.scaled(width).rotate(rotation, resample=_Resampling.BICUBIC, expand=True)
+
+    sprite = sprite.convert("RGBA")
+    if opacity < 100:
+        alpha = sprite.getchannel("A").point(lambda value: value * opacity // 100)
+        sprite.putalpha(alpha)
+    if rotation % 360 != 0:
+        content = sprite.getchannel("A").getbbox()
+        sprite = sprite.crop(content) if content else Image.new("RGBA", (1, 1), (0, 0, 0, 0))
+    return sprite
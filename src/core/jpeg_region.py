@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+JPEG区域重编码模块
+"""
+
+import os
+import shutil
+import struct
+import tempfile
+import subprocess
+from PIL import Image, JpegImagePlugin
+
+from core.blend import blend_image
+from core.image_metadata import EXIF_HEADER, MAX_EXIF_SIZE
+
+
+class JpegRegionEncoder:
+    """JPEG区域重编码器
+
+    只重新编码与水印相交的MCU块，其余DCT系数原样复制，输出中未被水印覆盖的
+    部分与原图逐位一致，且不需要解码整张图片。
+
+    Pillow不提供DCT系数级别的读写，因此借助libjpeg/libjpeg-turbo附带的
+    jpegtran完成无损裁剪(-crop)和无损替换(-drop)。系统中没有支持-drop的
+    jpegtran时，can_encode()返回False，调用方回退到整图重新编码。
+    """
+
+    _jpegtran_cache = {}
+
+    def __init__(self, jpegtran_path=None):
+        """初始化JPEG区域重编码器
+
+        Args:
+            jpegtran_path: jpegtran可执行文件路径，None表示在PATH中查找
+        """
+        self.jpegtran_path = self._find_jpegtran(jpegtran_path)
+
+    @classmethod
+    def _find_jpegtran(cls, jpegtran_path=None):
+        """查找支持-crop和-drop的jpegtran
+
+        Args:
+            jpegtran_path: 指定的可执行文件路径
+
+        Returns:
+            str: 可执行文件路径，找不到时返回None
+        """
+        path = jpegtran_path or shutil.which("jpegtran")
+        if not path:
+            return None
+        if path not in cls._jpegtran_cache:
+            try:
+                # jpegtran把用法说明输出到stderr
+                completed = subprocess.run(
+                    [path, "-help"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10
+                )
+                usage = (completed.stdout + completed.stderr).decode("latin-1")
+                cls._jpegtran_cache[path] = "-drop" in usage and "-crop" in usage
+            except (OSError, subprocess.SubprocessError):
+                cls._jpegtran_cache[path] = False
+        return path if cls._jpegtran_cache[path] else None
+
+    def is_available(self):
+        """是否可以使用区域重编码"""
+        return self.jpegtran_path is not None
+
+    def can_encode(self, img):
+        """检查图片是否可以走区域重编码
+
+        Args:
+            img: 通过Image.open打开但尚未解码的图像对象
+
+        Returns:
+            bool: 是否可以区域重编码
+        """
+        return (
+            self.is_available()
+            and isinstance(img, JpegImagePlugin.JpegImageFile)
+            and img.mode in ("RGB", "L")
+        )
+
+    def get_mcu_size(self, img):
+        """获取JPEG的MCU尺寸
+
+        Args:
+            img: JPEG图像对象
+
+        Returns:
+            tuple: (MCU宽度, MCU高度)
+        """
+        if len(img.layer) == 1:
+            return 8, 8
+        h_max = max(layer[1] for layer in img.layer)
+        v_max = max(layer[2] for layer in img.layer)
+        return 8 * h_max, 8 * v_max
+
+    def get_source_options(self, img):
+        """获取使用源图量化表和采样方式的保存参数
+
+        jpegtran -drop要求替换的区域与源图的量化表和采样方式一致，只在区域重编码时使用；
+        整图重新编码由编码预设决定质量。
+
+        Args:
+            img: 通过Image.open打开的图像对象
+
+        Returns:
+            dict: JPEG保存参数，不是JPEG时返回空字典
+        """
+        if not isinstance(img, JpegImagePlugin.JpegImageFile) or not getattr(img, "quantization", None):
+            return {}
+        options = {"qtables": [img.quantization[key] for key in sorted(img.quantization)]}
+        sampling = JpegImagePlugin.get_sampling(img)
+        if sampling != -1:
+            options["subsampling"] = sampling
+        return options
+
+    def align_box(self, box, mcu_size, image_size):
+        """把区域扩展到MCU边界
+
+        Args:
+            box: (left, top, right, bottom)区域
+            mcu_size: (MCU宽度, MCU高度)
+            image_size: 图片尺寸
+
+        Returns:
+            tuple: 对齐后的区域，与图片不相交时返回None
+        """
+        left, top = max(0, box[0]), max(0, box[1])
+        right, bottom = min(image_size[0], box[2]), min(image_size[1], box[3])
+        if right <= left or bottom <= top:
+            return None
+        mcu_width, mcu_height = mcu_size
+        left -= left % mcu_width
+        top -= top % mcu_height
+        # 右下边界向上取整到MCU，但不超过图片边缘
+        right = min(image_size[0], -(-right // mcu_width) * mcu_width)
+        bottom = min(image_size[1], -(-bottom // mcu_height) * mcu_height)
+        return left, top, right, bottom
+
+    def encode(self, image_path, output_path, img, sprite, position, metadata=None):
+        """只重新编码水印所在的区域
+
+        Args:
+            image_path: 源JPEG路径
+            output_path: 输出JPEG路径
+            img: 通过Image.open打开但尚未解码的源图像对象
+            sprite: RGBA水印图块或PremultipliedSprite
+            position: 水印左上角坐标
+            metadata: 源图元数据，用于重新生成EXIF缩略图
+
+        Returns:
+            bool: 是否成功，失败时调用方应回退到整图重新编码
+        """
+        x, y = position
+        box = self.align_box(
+            (x, y, x + sprite.width, y + sprite.height), self.get_mcu_size(img), img.size
+        )
+        temp_dir = tempfile.mkdtemp(prefix="watermark_region_")
+        try:
+            if box is None:
+                # 水印完全在图片之外，无损复制即可
+                self._run_jpegtran(["-copy", "all", "-outfile", output_path, image_path])
+                return True
+
+            left, top, right, bottom = box
+            crop_path = os.path.join(temp_dir, "crop.jpg")
+            patch_path = os.path.join(temp_dir, "patch.jpg")
+
+            # 1. 无损裁剪出对齐后的区域，只解码这一小块
+            self._run_jpegtran([
+                "-copy", "none", "-crop", f"{right - left}x{bottom - top}+{left}+{top}",
+                "-outfile", crop_path, image_path
+            ])
+            with Image.open(crop_path) as region:
+                patch = region.copy()
+            blend_image(patch, sprite, (x - left, y - top))
+
+            # 2. 使用源图的量化表和采样方式编码该区域，-drop要求两者一致
+            patch.save(patch_path, "JPEG", **self.get_source_options(img))
+
+            # 3. 无损替换源图中对应的MCU块，其余DCT系数原样保留
+            self._run_jpegtran([
+                "-copy", "all", "-drop", f"+{left}+{top}", patch_path,
+                "-outfile", output_path, image_path
+            ])
+
+            if metadata is not None and metadata.has_thumbnail:
+                self._refresh_exif_thumbnail(output_path, metadata)
+            return True
+        except (OSError, subprocess.SubprocessError, ValueError) as e:
+            print(f"区域重编码失败，回退到整图编码: {str(e)}")
+            return False
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    def _run_jpegtran(self, args):
+        """运行jpegtran"""
+        completed = subprocess.run(
+            [self.jpegtran_path] + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=300
+        )
+        if completed.returncode != 0:
+            raise ValueError(completed.stderr.decode("utf-8", "replace").strip() or "jpegtran执行失败")
+
+    def _refresh_exif_thumbnail(self, output_path, metadata):
+        """用输出图片替换EXIF缩略图
+
+        缩略图通过draft模式以1/8比例解码输出图片生成，开销很小。
+
+        Args:
+            output_path: 输出JPEG路径
+            metadata: 源图元数据
+        """
+        with Image.open(output_path) as output:
+            output.draft("RGB", (output.width // 8, output.height // 8))
+            exif = metadata.build_exif(output.convert("RGB"))
+        if not exif or len(exif) - len(EXIF_HEADER) > MAX_EXIF_SIZE:
+            return
+
+        with open(output_path, "rb") as f:
+            data = f.read()
+        segment = replace_app1_exif(data, exif)
+        if segment is not None:
+            with open(output_path, "wb") as f:
+                f.write(segment)
+
+
+def replace_app1_exif(data, exif):
+    """替换JPEG数据中的EXIF段
+
+    Args:
+        data: JPEG文件数据
+        exif: 以Exif头开始的新EXIF数据
+
+    Returns:
+        bytes: 替换后的JPEG数据，找不到EXIF段时返回None
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+    offset = 2
+    while offset + 4 <= len(data) and data[offset] == 0xFF:
+        marker = data[offset + 1]
+        # SOS之后是熵编码数据，元数据段都在它之前
+        if marker == 0xDA:
+            break
+        length = struct.unpack_from(">H", data, offset + 2)[0]
+        if marker == 0xE1 and data[offset + 4:offset + 4 + len(EXIF_HEADER)] == EXIF_HEADER:
+            new_segment = b"\xff\xe1" + struct.pack(">H", len(exif) + 2) + exif
+            return data[:offset] + new_segment + data[offset + 2 + length:]
+        offset += 2 + length
+    return None
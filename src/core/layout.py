@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+水印布局模块
+"""
+
+import math
+
+
+# 预设位置在可用范围内的横向、纵向比例
+ANCHORS = {
+    "top_left": (0.0, 0.0),
+    "top_center": (0.5, 0.0),
+    "top_right": (1.0, 0.0),
+    "middle_left": (0.0, 0.5),
+    "center": (0.5, 0.5),
+    "middle_right": (1.0, 0.5),
+    "bottom_left": (0.0, 1.0),
+    "bottom_center": (0.5, 1.0),
+    "bottom_right": (1.0, 1.0)
+}
+
+DEFAULT_ANCHOR = "center"
+
+# 预设位置和相对坐标与图片边缘的距离(像素)
+DEFAULT_MARGIN = 10
+
+# 按比例设置字号和边距时可选的参照长度
+SIZE_REFERENCES = {
+    "width": "图片宽度",
+    "short_side": "图片短边"
+}
+
+# EXIF方向中需要交换宽高的取值（转置和90度旋转）
+SWAPPED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def oriented_size(size, orientation):
+    """计算按EXIF方向转正后的图片尺寸
+
+    Args:
+        size: 文件中存储的尺寸(宽, 高)
+        orientation: EXIF方向(1-8)
+
+    Returns:
+        tuple: 转正后的尺寸(宽, 高)
+    """
+    if orientation in SWAPPED_ORIENTATIONS:
+        return (size[1], size[0])
+    return tuple(size)
+
+
+def reference_length(image_size, reference):
+    """获取按比例设置尺寸时的参照长度
+
+    Args:
+        image_size: 图片尺寸(宽, 高)
+        reference: 参照，见SIZE_REFERENCES
+
+    Returns:
+        int: 参照长度(像素)
+    """
+    if reference == "width":
+        return image_size[0]
+    if reference == "short_side":
+        return min(image_size)
+    raise ValueError(f"未知的尺寸参照: {reference}")
+
+
+def read_orientation(img):
+    """从未解码的图片中读取EXIF方向
+
+    Args:
+        img: 通过Image.open打开的图像对象
+
+    Returns:
+        int: EXIF方向值(1-8)，没有方向信息时返回1
+    """
+    try:
+        if hasattr(img, 'tag_v2'):
+            # TIFF的方向标签在文件头的IFD中
+            orientation = img.tag_v2.get(0x0112, 1)
+        else:
+            # 只解析文件头中已读取的EXIF数据。PNG的eXIf块可能位于图像数据之后，
+            # 此时img.getexif()会触发完整解码，因此不调用它
+            exif_data = img.info.get('exif')
+            if not exif_data:
+                return 1
+            from PIL import Image
+            exif = Image.Exif()
+            exif.load(exif_data)
+            orientation = exif.get(0x0112, 1)
+        return orientation if orientation in range(1, 9) else 1
+    except Exception:
+        return 1
+
+
+def read_image_size(image_path):
+    """只读取文件头，获取按EXIF方向转正后的图片尺寸
+
+    Args:
+        image_path: 图片路径
+
+    Returns:
+        tuple: 尺寸(宽, 高)
+    """
+    # Pillow只在需要时导入，界面只需要本模块的常量时不必加载
+    from PIL import Image
+    with Image.open(image_path) as img:
+        return oriented_size(img.size, read_orientation(img))
+
+
+def is_relative_position(position):
+    """判断位置是否为相对坐标
+
+    两个分量都是0到1之间的浮点数时视为相对坐标，
+    (0, 0)表示左上角，(0.5, 0.5)表示居中，(1, 1)表示右下角。
+    """
+    return (isinstance(position, (tuple, list)) and len(position) == 2
+            and all(isinstance(value, float) and 0.0 <= value <= 1.0 for value in position))
+
+
+def compute_placement(image_size, sprite_size, position, margin=DEFAULT_MARGIN):
+    """计算水印在原图上的粘贴范围
+
+    Args:
+        image_size: 原图尺寸(宽, 高)
+        sprite_size: 水印图块尺寸(宽, 高)
+        position: 预设位置名称、相对坐标(0-1的浮点数)或绝对坐标(x, y)，
+                  未知的预设位置按居中处理
+        margin: 预设位置和相对坐标与图片边缘的距离
+
+    Returns:
+        tuple: (left, top, right, bottom)，可能超出原图范围
+    """
+    sprite_width, sprite_height = sprite_size
+    if isinstance(position, (tuple, list)) and len(position) == 2 and not is_relative_position(position):
+        # 手动指定的左上角坐标
+        left, top = int(position[0]), int(position[1])
+        return (left, top, left + sprite_width, top + sprite_height)
+
+    if is_relative_position(position):
+        ratio_x, ratio_y = position
+    else:
+        ratio_x, ratio_y = ANCHORS.get(position, ANCHORS[DEFAULT_ANCHOR])
+
+    img_width, img_height = image_size
+    left = margin + int(math.floor((img_width - sprite_width - 2 * margin) * ratio_x))
+    top = margin + int(math.floor((img_height - sprite_height - 2 * margin) * ratio_y))
+    return (left, top, left + sprite_width, top + sprite_height)
+
+
+def is_overflowing(rect, image_size):
+    """判断粘贴范围是否超出原图
+
+    Args:
+        rect: (left, top, right, bottom)
+        image_size: 原图尺寸(宽, 高)
+
+    Returns:
+        bool: 水印是否有一部分落在原图之外
+    """
+    return rect[0] < 0 or rect[1] < 0 or rect[2] > image_size[0] or rect[3] > image_size[1]
+
+
+def plan_layout(image_paths, place):
+    """为一批图片预先计算水印位置
+
+    只读取文件头，不解码像素，可在处理前检查哪些图片的水印会超出范围。
+
+    Args:
+        image_paths: 图片路径列表
+        place: 根据图片尺寸返回粘贴范围的函数，如
+               lambda size: compute_placement(size, sprite_size, "center")
+
+    Returns:
+        list: 每张图片一个字典，包含path、image_size、rect、overflow和error，
+              读取失败时image_size和rect为None
+    """
+    plan = []
+    for image_path in image_paths:
+        entry = {"path": image_path, "image_size": None, "rect": None, "overflow": False, "error": None}
+        try:
+            image_size = read_image_size(image_path)
+            rect = place(image_size)
+            entry.update(image_size=image_size, rect=rect, overflow=is_overflowing(rect, image_size))
+        except Exception as e:
+            entry["error"] = str(e)
+        plan.append(entry)
+    return plan
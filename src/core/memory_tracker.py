@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+内存跟踪模块
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+
+
+def _read_proc_status(field):
+    """读取/proc/self/status中的内存字段（MB），不是Linux时返回None"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def get_current_rss_mb():
+    """获取当前进程的常驻内存（MB）
+
+    Returns:
+        float: 常驻内存，无法获取时返回None
+    """
+    current = _read_proc_status("VmRSS")
+    if current is not None:
+        return current
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def get_peak_rss_mb():
+    """获取当前进程的峰值常驻内存（MB）
+
+    Linux下读取VmHWM。不使用ru_maxrss，因为spawn启动的子进程会在exec后
+    保留父进程的ru_maxrss。
+
+    Returns:
+        float: 峰值内存，无法获取时返回None
+    """
+    peak = _read_proc_status("VmHWM")
+    if peak is not None:
+        return peak
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS单位为字节，其他系统为KB
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+
+def reset_peak_rss():
+    """重置当前进程的峰值内存记录（仅Linux支持）
+
+    Returns:
+        bool: 是否成功重置
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+class _Scope:
+    """一次内存跟踪范围（一张图片或一个阶段）"""
+
+    __slots__ = ("kind", "name", "start_mb", "peak_mb", "python_start", "python_peak", "sites")
+
+    def __init__(self, kind, name, start_mb, python_start):
+        self.kind = kind
+        self.name = name
+        self.start_mb = start_mb
+        self.peak_mb = start_mb
+        self.python_start = python_start
+        self.python_peak = python_start
+        self.sites = []
+
+
+class _ScopeContext:
+    """MemoryTracker.scope()返回的上下文"""
+
+    def __init__(self, tracker, kind, name):
+        self.tracker = tracker
+        self.kind = kind
+        self.name = name
+        self.record = None
+        self._scope = None
+
+    def __enter__(self):
+        self._scope = self.tracker.begin(self.kind, self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record = self.tracker.end(self._scope)
+        return False
+
+
+class MemoryTracker:
+    """内存跟踪器，记录每张图片和每个阶段的峰值常驻内存
+
+    后台线程按固定间隔采样进程常驻内存，并更新所有正在进行的范围的峰值。
+    多个工作线程并行处理时，一个范围内观察到的峰值包含同时进行的其他图片，
+    因此是上限估计；单线程处理时即为该图片或阶段的实际峰值。
+
+    调试模式下同时启用tracemalloc，记录Python分配的峰值，并在峰值上升时
+    记录分配最多的代码位置。Pillow的像素缓冲区不经过Python分配器，
+    只反映在常驻内存中；NumPy数组会被tracemalloc统计。
+    """
+
+    def __init__(self, interval=0.01, trace_python=False, top_sites=3):
+        """初始化内存跟踪器
+
+        Args:
+            interval: 采样间隔(秒)
+            trace_python: 是否启用tracemalloc记录Python分配的来源
+            top_sites: 每个范围记录的分配位置数量
+        """
+        self.interval = interval
+        self.trace_python = trace_python
+        self.top_sites = top_sites
+        self.available = get_current_rss_mb() is not None
+        self._active = set()
+        self._images = []
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """启动采样线程"""
+        if self.trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if not self.available or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止采样线程"""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def reset(self):
+        """清空已记录的结果，用于开始新的批次"""
+        with self._lock:
+            self._images = []
+            self._stages = {}
+
+    def scope(self, kind, name):
+        """跟踪一个范围内的峰值内存
+
+        Args:
+            kind: "image"或"stage"
+            name: 图片路径或阶段名称
+
+        Returns:
+            上下文管理器，退出后record属性为记录结果
+        """
+        return _ScopeContext(self, kind, name)
+
+    def begin(self, kind, name):
+        """开始跟踪一个范围
+
+        Returns:
+            _Scope: 传给end()的范围对象
+        """
+        with self._lock:
+            # 没有其他进行中的范围时重置tracemalloc的峰值，使峰值只反映本范围
+            if self.trace_python and not self._active and tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            scope = _Scope(kind, name, get_current_rss_mb() or 0.0, self._python_memory(current=True))
+            self._active.add(scope)
+        return scope
+
+    def end(self, scope):
+        """结束跟踪一个范围
+
+        Args:
+            scope: begin()返回的范围对象
+
+        Returns:
+            dict: 记录结果，包含name、peak_mb、delta_mb、python_peak_mb和sites
+        """
+        self._update(scope, get_current_rss_mb() or 0.0, self._python_memory())
+        with self._lock:
+            self._active.discard(scope)
+            record = {
+                "name": scope.name,
+                "peak_mb": scope.peak_mb,
+                "delta_mb": max(0.0, scope.peak_mb - scope.start_mb),
+                "python_peak_mb": (scope.python_peak - scope.python_start) / (1024 * 1024)
+                if self.trace_python else None,
+                "sites": scope.sites
+            }
+            if scope.kind == "image":
+                self._images.append(record)
+            else:
+                self._stages.setdefault(scope.name, []).append(record["delta_mb"])
+        return record
+
+    def largest_images(self, count=5):
+        """获取峰值内存增量最大的图片
+
+        Args:
+            count: 返回的数量
+
+        Returns:
+            list: 记录结果列表，按delta_mb从大到小排列
+        """
+        with self._lock:
+            images = list(self._images)
+        return sorted(images, key=lambda record: record["delta_mb"], reverse=True)[:count]
+
+    def stage_summary(self):
+        """汇总每个阶段的峰值内存增量
+
+        Returns:
+            dict: 阶段名称到{"count", "max_mb", "mean_mb"}的映射
+        """
+        with self._lock:
+            stages = {name: list(values) for name, values in self._stages.items()}
+        return {
+            name: {"count": len(values), "max_mb": max(values), "mean_mb": sum(values) / len(values)}
+            for name, values in stages.items()
+        }
+
+    def format_report(self, count=5):
+        """生成内存报告文本
+
+        Args:
+            count: 列出的图片数量
+
+        Returns:
+            str: 报告文本，没有记录时返回空字符串
+        """
+        if not self.available:
+            return "无法读取进程内存，内存跟踪不可用"
+        largest = self.largest_images(count)
+        stages = self.stage_summary()
+        if not largest and not stages:
+            return ""
+
+        peak = get_peak_rss_mb()
+        lines = [f"进程峰值内存: {peak:.1f} MB" if peak is not None else "进程峰值内存: 未知"]
+        if largest:
+            lines.append("内存占用最多的图片:")
+            for record in largest:
+                line = f"  {os.path.basename(str(record['name']))}: +{record['delta_mb']:.1f} MB (峰值 {record['peak_mb']:.1f} MB)"
+                if record["python_peak_mb"] is not None:
+                    line += f"，Python分配 {record['python_peak_mb']:.1f} MB"
+                lines.append(line)
+                for site in record["sites"]:
+                    lines.append(f"      {site}")
+        if stages:
+            lines.append("各阶段内存增量(最大/平均):")
+            for name, stats in sorted(stages.items(), key=lambda item: item[1]["max_mb"], reverse=True):
+                lines.append(f"  {name}: {stats['max_mb']:.1f} / {stats['mean_mb']:.1f} MB")
+        return "\n".join(lines)
+
+    def _python_memory(self, current=False):
+        """获取tracemalloc统计的Python分配量（字节）
+
+        Args:
+            current: True返回当前分配量，False返回上次重置以来的峰值
+        """
+        if self.trace_python and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()[0 if current else 1]
+        return 0
+
+    def _run(self):
+        """采样线程"""
+        while not self._stop_event.wait(self.interval):
+            rss = get_current_rss_mb()
+            if rss is None:
+                continue
+            python_memory = self._python_memory()
+            with self._lock:
+                scopes = list(self._active)
+            for scope in scopes:
+                self._update(scope, rss, python_memory)
+
+    def _update(self, scope, rss, python_memory):
+        """用一次采样更新范围的峰值"""
+        if rss > scope.peak_mb:
+            # 调试模式下峰值明显上升时记录分配最多的位置
+            if (self.trace_python and scope.kind == "image"
+                    and rss - scope.peak_mb >= max(1.0, scope.peak_mb * 0.05)):
+                scope.sites = self._capture_sites()
+            scope.peak_mb = rss
+        scope.python_peak = max(scope.python_peak, python_memory)
+
+    def _capture_sites(self):
+        """记录当前分配最多的代码位置"""
+        if not tracemalloc.is_tracing():
+            return []
+        statistics = tracemalloc.take_snapshot().statistics("lineno")[:self.top_sites]
+        return [
+            f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size / (1024 * 1024):.1f} MB"
+            for stat in statistics
+        ]
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+会话保存模块
+"""
+
+import os
+import gzip
+import json
+import time
+import sqlite3
+import threading
+
+
+# 会话文件和缩略图缓存的默认位置，与模板文件夹同在用户目录下
+DEFAULT_FOLDER = os.path.join(os.path.expanduser("~"), "Photo-Watermark-2")
+
+# 会话文件格式版本，不一致时忽略旧文件
+SESSION_VERSION = 1
+
+# 会话文件中每张图片一行，按以下顺序保存
+IMAGE_FIELDS = ("path", "mtime_ns", "size", "width", "height", "format", "orientation")
+
+# 缩略图缓存最多保留的条目数，超出时删除最久未使用的
+MAX_THUMBNAILS = 20000
+
+
+def file_stamp(path):
+    """获取文件的(修改时间纳秒, 大小)，用于判断文件是否变化
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        tuple: (mtime_ns, size)，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SessionStore:
+    """会话文件
+
+    保存图片列表、每张图片的文件头信息、当前图片和水印设置。
+    每张图片按IMAGE_FIELDS保存为一行数组并用gzip压缩，数千张图片的会话只有几十KB，
+    启动时读取只需几毫秒。
+    """
+
+    def __init__(self, path=None):
+        """初始化会话文件
+
+        Args:
+            path: 会话文件路径，None表示使用默认位置
+        """
+        self.path = path or os.path.join(DEFAULT_FOLDER, "session.json.gz")
+
+    def save(self, images, current_path=None, watermark=None):
+        """保存会话
+
+        先写入临时文件再替换，保存中断不会损坏上一次的会话。
+
+        Args:
+            images: 图片信息字典列表，包含IMAGE_FIELDS中的键，缺少的键保存为None
+            current_path: 当前选中的图片路径
+            watermark: 水印设置字典，格式与模板数据相同
+        """
+        session = {
+            "version": SESSION_VERSION,
+            "saved": time.time(),
+            "current": current_path,
+            "watermark": watermark or {},
+            "images": [[image.get(field) for field in IMAGE_FIELDS] for image in images]
+        }
+        folder = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(folder, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with gzip.open(temp_path, "wt", encoding="utf-8") as f:
+            json.dump(session, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """读取会话
+
+        Returns:
+            dict: 包含current、watermark和images(图片信息字典列表)，
+                  没有会话或文件无效时返回None
+        """
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(session, dict) or session.get("version") != SESSION_VERSION:
+            return None
+        session["images"] = [dict(zip(IMAGE_FIELDS, row)) for row in session.get("images", [])]
+        return session
+
+    def clear(self):
+        """删除会话文件"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ThumbnailCache:
+    """缩略图缓存
+
+    按图片路径保存编码后的缩略图和文件头信息，同时记录生成时文件的修改时间和大小，
+    文件变化后缓存自动失效。重新导入同一批图片时不必再解码原图生成缩略图。
+    多个线程可以共用同一个对象。
+    """
+
+    def __init__(self, db_path=None, max_entries=MAX_THUMBNAILS):
+        """打开或创建缩略图缓存
+
+        Args:
+            db_path: 数据库文件路径，None表示使用默认位置，":memory:"表示内存数据库
+            max_entries: prune()之后最多保留的条目数
+        """
+        self.db_path = db_path or os.path.join(DEFAULT_FOLDER, "thumbnails.db")
+        self.max_entries = max_entries
+        if self.db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            if self.db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS thumbnails ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER NOT NULL, size INTEGER NOT NULL, "
+                "max_size INTEGER NOT NULL, info TEXT NOT NULL, data BLOB NOT NULL, used REAL NOT NULL)"
+            )
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM thumbnails").fetchone()[0]
+
+    def get(self, path, stamp, max_size):
+        """获取缩略图
+
+        Args:
+            path: 图片路径
+            stamp: 文件当前的(mtime_ns, size)
+            max_size: 缩略图最大边长
+
+        Returns:
+            tuple: (文件头信息字典, 编码后的缩略图bytes)，没有缓存或文件已变化时返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT mtime_ns, size, max_size, info, data FROM thumbnails WHERE path = ?", (path,)
+            ).fetchone()
+        if row is None or (row[0], row[1]) != tuple(stamp) or row[2] != max_size:
+            return None
+        return json.loads(row[3]), bytes(row[4])
+
+    def put_many(self, entries):
+        """在一个事务中写入多个缩略图
+
+        Args:
+            entries: (path, stamp, max_size, info, data)元组的列表
+        """
+        if not entries:
+            return
+        now = time.time()
+        rows = [
+            (path, stamp[0], stamp[1], max_size, json.dumps(info, ensure_ascii=False), data, now)
+            for path, stamp, max_size, info, data in entries
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO thumbnails VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def touch(self, paths):
+        """更新缩略图的使用时间，prune()时优先保留最近使用的
+
+        Args:
+            paths: 图片路径列表
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE thumbnails SET used = ? WHERE path = ?", [(now, path) for path in paths])
+
+    def prune(self):
+        """删除最久未使用的条目，使条目数不超过max_entries
+
+        Returns:
+            int: 删除的条目数
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM thumbnails WHERE path IN ("
+                "SELECT path FROM thumbnails ORDER BY used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        return cursor.rowcount
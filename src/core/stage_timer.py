@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+阶段计时模块
+"""
+
+import math
+import time
+import threading
+
+
+# 渲染和导出流程的阶段名称，按执行顺序排列
+STAGE_LABELS = {
+    "total": "总计",
+    "open": "打开",
+    "metadata": "读取元数据",
+    "font": "加载字体",
+    "render": "渲染文本",
+    "decode": "解码",
+    "composite": "合成",
+    "encode": "编码",
+    "region_encode": "区域重编码",
+    "strip": "分条带处理"
+}
+
+
+def percentile(sorted_values, percent):
+    """计算百分位数（最近秩法）
+
+    Args:
+        sorted_values: 已排序的数值列表
+        percent: 百分位(0-100)
+
+    Returns:
+        float: 百分位数，列表为空时返回0
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(math.ceil(percent / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class _NullStage:
+    """计时关闭时使用的空上下文，不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    """一次阶段计时"""
+
+    __slots__ = ("timer", "name", "start", "memory_scope")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+        self.memory_scope = None
+
+    def __enter__(self):
+        if self.timer.memory_tracker is not None:
+            self.memory_scope = self.timer.memory_tracker.begin("stage", self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.timer.record(self.name, time.perf_counter() - self.start)
+        if self.memory_scope is not None:
+            self.timer.memory_tracker.end(self.memory_scope)
+        return False
+
+
+class StageTimer:
+    """阶段计时器，统计每个阶段的耗时分布
+
+    关闭时stage()返回共享的空上下文，开销只有一次方法调用。
+    多个工作线程可以共用同一个计时器。
+    """
+
+    def __init__(self, enabled=True, memory_tracker=None):
+        """初始化阶段计时器
+
+        Args:
+            enabled: 是否启用计时
+            memory_tracker: MemoryTracker对象，提供时同时记录每个阶段的峰值内存
+        """
+        self.enabled = enabled
+        self.memory_tracker = memory_tracker
+        self._samples = {}
+        # 创建以来的累计次数和耗时，reset()不清空
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name):
+        """为一个阶段计时
+
+        Args:
+            name: 阶段名称
+
+        Returns:
+            上下文管理器，用法: with timer.stage("decode"): ...
+        """
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        """记录一次阶段耗时
+
+        Args:
+            name: 阶段名称
+            seconds: 耗时(秒)
+        """
+        with self._lock:
+            self._samples.setdefault(name, []).append(seconds)
+            totals = self._totals.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+
+    def reset(self):
+        """清空已记录的耗时，用于开始新的批次
+
+        累计次数和耗时不会清空，见totals()。
+        """
+        with self._lock:
+            self._samples = {}
+
+    def summary(self):
+        """汇总每个阶段的耗时分布
+
+        Returns:
+            dict: 阶段名称到统计结果的映射，统计结果包含count、total_ms、
+                  mean_ms、p50_ms、p95_ms和max_ms
+        """
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+
+        # 已知阶段按流程顺序排列，其余按首次出现的顺序
+        names = [name for name in STAGE_LABELS if name in samples]
+        names += [name for name in samples if name not in STAGE_LABELS]
+
+        result = {}
+        for name in names:
+            values = samples[name]
+            total = sum(values)
+            result[name] = {
+                "count": len(values),
+                "total_ms": total * 1000,
+                "mean_ms": total * 1000 / len(values),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "max_ms": values[-1] * 1000
+            }
+        return result
+
+    def totals(self):
+        """获取计时器创建以来每个阶段的累计次数和耗时
+
+        与summary()不同，reset()之后不会减少，可以作为监控系统的计数器。
+
+        Returns:
+            dict: 阶段名称到(次数, 耗时秒数)的映射
+        """
+        with self._lock:
+            return {name: tuple(values) for name, values in self._totals.items()}
+
+    def format_summary(self):
+        """把耗时分布格式化为文本表格
+
+        Returns:
+            str: 表格文本，没有记录时返回空字符串
+        """
+        summary = self.summary()
+        if not summary:
+            return ""
+        lines = [f"{'阶段':<10}{'次数':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'最大(ms)':>10}{'合计(ms)':>12}"]
+        for name, stats in summary.items():
+            label = STAGE_LABELS.get(name, name)
+            lines.append(
+                f"{label:<10}{stats['count']:>6}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+                f"{stats['max_ms']:>10.1f}{stats['total_ms']:>12.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+启动耗时分析模块
+"""
+
+import sys
+import time
+import builtins
+import threading
+
+
+class _NullPhase:
+    """分析关闭时使用的空上下文，不做任何事"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    """一次初始化阶段计时"""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.profiler.record_phase(self.name, self.start, time.perf_counter())
+        return False
+
+
+class StartupProfiler:
+    """启动耗时分析器
+
+    install()后替换内置的__import__，记录每个首次导入的模块的自身耗时和累计耗时
+    (累计耗时包含它导入的其他模块)；phase()记录各个初始化阶段，mark()记录
+    首个窗口显示等时间点。关闭时phase()返回共享的空上下文。
+    """
+
+    def __init__(self, enabled=True):
+        """初始化启动耗时分析器
+
+        Args:
+            enabled: 是否启用分析
+        """
+        self.enabled = enabled
+        self.start = time.perf_counter()
+        self.phases = []
+        self.marks = []
+        self.modules = {}
+        self._stack = []
+        self._original_import = None
+        self._lock = threading.Lock()
+
+    def install(self):
+        """开始记录模块导入耗时"""
+        if not self.enabled or self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        """停止记录模块导入耗时"""
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, *args, **kwargs):
+        """计时版本的__import__，只记录主线程中首次导入的模块"""
+        if (not name or name in sys.modules or self._original_import is None
+                or threading.current_thread() is not threading.main_thread()):
+            return (self._original_import or builtins.__import__)(name, *args, **kwargs)
+
+        # 栈中每一项记录子模块的累计耗时，用于从累计耗时中扣除得到自身耗时
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            return self._original_import(name, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            if name not in self.modules:
+                self.modules[name] = (max(0.0, elapsed - children), elapsed)
+
+    def phase(self, name):
+        """为一个初始化阶段计时
+
+        Args:
+            name: 阶段名称
+
+        Returns:
+            上下文管理器，用法: with profiler.phase("创建主窗口"): ...
+        """
+        if not self.enabled:
+            return _NULL_PHASE
+        return _Phase(self, name)
+
+    def record_phase(self, name, start, end):
+        """记录一个阶段的起止时间
+
+        Args:
+            name: 阶段名称
+            start: 开始时间(perf_counter)
+            end: 结束时间(perf_counter)
+        """
+        with self._lock:
+            self.phases.append((name, start - self.start, end - start))
+
+    def mark(self, name):
+        """记录一个时间点，如首个窗口显示
+
+        Args:
+            name: 时间点名称
+        """
+        if self.enabled:
+            with self._lock:
+                self.marks.append((name, time.perf_counter() - self.start))
+
+    def get_mark(self, name):
+        """获取时间点距分析开始的秒数，没有记录时返回None"""
+        for mark_name, offset in self.marks:
+            if mark_name == name:
+                return offset
+        return None
+
+    def format_report(self, count=15):
+        """生成文本报告
+
+        Args:
+            count: 列出自身耗时最多的模块数
+
+        Returns:
+            str: 多行文本报告
+        """
+        lines = ["启动耗时分析:"]
+        for name, offset in self.marks:
+            lines.append(f"  {name}: {offset * 1000:.1f} ms")
+
+        if self.phases:
+            lines.append("初始化阶段:")
+            lines.append(f"  {'阶段':<24}{'开始(ms)':>10}{'耗时(ms)':>10}")
+            for name, offset, elapsed in self.phases:
+                lines.append(f"  {name:<24}{offset * 1000:>10.1f}{elapsed * 1000:>10.1f}")
+
+        if self.modules:
+            total = sum(self_time for self_time, _ in self.modules.values())
+            lines.append(f"模块导入: {len(self.modules)} 个模块，共 {total * 1000:.1f} ms，自身耗时最多的 {count} 个:")
+            lines.append(f"  {'模块':<36}{'自身(ms)':>10}{'累计(ms)':>10}")
+            ranked = sorted(self.modules.items(), key=lambda item: item[1][0], reverse=True)
+            for name, (self_time, cumulative) in ranked[:count]:
+                lines.append(f"  {name:<36}{self_time * 1000:>10.1f}{cumulative * 1000:>10.1f}")
+        return "\n".join(lines)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+分条带处理模块
+"""
+
+import os
+import shutil
+from PIL import Image
+
+from core.blend import blend_image, prepare_sprite
+
+
+# 可以原地改写的像素排列：图像模式 -> 文件中的原始像素格式
+SUPPORTED_RAWMODES = {
+    "RGB": ("RGB", "BGR"),
+    "RGBA": ("RGBA",)
+}
+
+# 支持分条带处理的格式，输出格式必须与源格式相同
+SUPPORTED_FORMATS = ("BMP", "TIFF")
+
+# 每次读入内存的条带字节数上限
+DEFAULT_MAX_BAND_BYTES = 16 * 1024 * 1024
+
+
+class StripProcessor:
+    """分条带处理器，用于超大图片（扫描地图、拼接全景图等）
+
+    把源文件原样复制到输出路径，然后只读取与水印相交的像素行，合成后写回原来的位置，
+    其余条带不解码也不进入内存，内存占用只取决于水印高度和图片宽度。
+
+    适用于未压缩的BMP和TIFF（按条带或分块存储）。PNG的所有行经过过滤后压缩在同一个
+    zlib流中，压缩的TIFF条带也无法原地替换，这些图片由调用方按整图处理。
+    """
+
+    def __init__(self, max_band_bytes=DEFAULT_MAX_BAND_BYTES):
+        """初始化分条带处理器
+
+        Args:
+            max_band_bytes: 每次读入内存的条带字节数上限
+        """
+        self.max_band_bytes = max_band_bytes
+
+    def can_process(self, img, image_format, save_options=None):
+        """检查图片是否可以分条带处理
+
+        Args:
+            img: 通过Image.open打开但尚未解码的图像对象
+            image_format: 输出格式
+            save_options: 输出格式的编码参数，要求压缩时不能原地改写
+
+        Returns:
+            bool: 是否可以分条带处理
+        """
+        if img.format not in SUPPORTED_FORMATS or image_format != img.format:
+            return False
+        if (save_options or {}).get("compression") not in (None, "raw"):
+            return False
+        if img.mode not in SUPPORTED_RAWMODES or not img.tile:
+            return False
+
+        extents = set()
+        for tile in img.tile:
+            if tile[0] != "raw" or self._get_tile_layout(tile)[0] not in SUPPORTED_RAWMODES[img.mode]:
+                return False
+            # 分平面存储的TIFF每个通道一个tile，区域会重复
+            if tile[1] in extents:
+                return False
+            extents.add(tile[1])
+        return True
+
+    def process(self, image_path, output_path, img, sprite, position):
+        """把水印写入与其相交的条带
+
+        Args:
+            image_path: 源图片路径
+            output_path: 输出图片路径
+            img: 通过Image.open打开但尚未解码的源图像对象
+            sprite: RGBA水印图块或PremultipliedSprite
+            position: 水印左上角坐标
+
+        Returns:
+            bool: 是否成功，失败时调用方应回退到整图处理
+        """
+        x, y = position
+        box = (x, y, x + sprite.width, y + sprite.height)
+        try:
+            if not (os.path.exists(output_path) and os.path.samefile(image_path, output_path)):
+                # 流式复制，不经过解码
+                shutil.copyfile(image_path, output_path)
+            with open(output_path, "r+b") as f:
+                sprite = prepare_sprite(sprite)
+                for tile in img.tile:
+                    self._patch_tile(f, img.mode, tile, sprite, box)
+            return True
+        except (OSError, ValueError) as e:
+            print(f"分条带处理失败，回退到整图处理: {str(e)}")
+            return False
+
+    def _get_tile_layout(self, tile):
+        """解析raw解码器参数
+
+        Returns:
+            tuple: (原始像素格式, 行跨度, 行方向)
+        """
+        args = tile[3] if isinstance(tile[3], tuple) else (tile[3],)
+        rawmode = args[0]
+        stride = args[1] if len(args) > 1 else 0
+        ystep = args[2] if len(args) > 2 else 1
+        return rawmode, stride, ystep
+
+    def _patch_tile(self, f, mode, tile, sprite, box):
+        """改写一个tile中与水印相交的行
+
+        Args:
+            f: 以读写方式打开的输出文件
+            mode: 图像模式
+            tile: Pillow的tile描述
+            sprite: 预乘后的水印图块
+            box: 水印在原图中的区域
+        """
+        tile_left, tile_top, tile_right, tile_bottom = tile[1]
+        left, top = max(tile_left, box[0]), max(tile_top, box[1])
+        right, bottom = min(tile_right, box[2]), min(tile_bottom, box[3])
+        if right <= left or bottom <= top:
+            return
+
+        rawmode, stride, ystep = self._get_tile_layout(tile)
+        tile_width, tile_height = tile_right - tile_left, tile_bottom - tile_top
+        row_bytes = len(Image.new(mode, (tile_width, 1)).tobytes("raw", rawmode))
+        stride = stride or row_bytes
+        band_rows = max(1, self.max_band_bytes // stride)
+
+        for band_top in range(top, bottom, band_rows):
+            band_bottom = min(bottom, band_top + band_rows)
+            rows = band_bottom - band_top
+            # 以tile为基准的行号；自下而上存储时文件中的第一行是区域的最后一行
+            first_row = band_top - tile_top
+            if ystep < 0:
+                first_row = tile_height - (band_bottom - tile_top)
+            start = tile[2] + first_row * stride
+            length = (rows - 1) * stride + row_bytes
+
+            f.seek(start)
+            data = bytearray(f.read(length))
+            if len(data) != length:
+                raise ValueError("文件长度与图像描述不符")
+
+            band = Image.frombytes(mode, (tile_width, rows), bytes(data), "raw", rawmode, stride, ystep)
+            blend_image(band, sprite, (box[0] - tile_left, box[1] - band_top))
+            packed = band.tobytes("raw", rawmode)
+
+            # 逐行写回，保留行尾的填充字节
+            for row in range(rows):
+                file_row = row if ystep > 0 else rows - 1 - row
+                data[file_row * stride:file_row * stride + row_bytes] = packed[row * row_bytes:(row + 1) * row_bytes]
+            f.seek(start)
+            f.write(data)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+模板索引模块
+"""
+
+import os
+import copy
+import json
+import time
+import threading
+
+
+# 修改时间距今不足该秒数的目录或文件视为仍可能变化，下次访问时重新检查。
+# 部分文件系统的时间精度只有1秒，同一秒内的两次修改无法通过修改时间区分
+RACY_SECONDS = 2.0
+
+
+class TemplateIndex:
+    """模板文件夹的内存索引
+
+    缓存模板名称列表和已解析的模板数据。列表只在文件夹的修改时间变化后重新扫描，
+    模板数据只在文件的修改时间或大小变化后重新读取，
+    因此反复列出和切换模板时不会重复读取和解析文件。
+    """
+
+    def __init__(self, folder, extension=".json"):
+        """初始化模板索引
+
+        Args:
+            folder: 模板文件夹
+            extension: 模板文件扩展名
+        """
+        self.folder = folder
+        self.extension = extension
+        self._folder_stamp = None
+        self._names = []
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_path(self, name):
+        """获取模板文件路径
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            str: 模板文件路径
+        """
+        return os.path.join(self.folder, f"{name}{self.extension}")
+
+    def list_names(self):
+        """获取按名称排序的模板列表
+
+        Returns:
+            list: 模板名称列表
+        """
+        with self._lock:
+            stamp = _stat_stamp(self.folder)
+            if stamp is None:
+                self._folder_stamp = None
+                self._names = []
+                self._entries = {}
+            elif stamp != self._folder_stamp or _is_racy(stamp):
+                self._scan(stamp)
+            return list(self._names)
+
+    def get(self, name):
+        """获取已解析的模板数据
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            dict: 模板数据的副本，模板不存在时返回None
+
+        Raises:
+            ValueError: 模板文件不是有效的JSON
+        """
+        path = self.get_path(name)
+        stamp = _stat_stamp(path)
+        if stamp is None:
+            with self._lock:
+                self._entries.pop(name, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None or entry[0] != stamp or _is_racy(stamp):
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entry = (stamp, data)
+            with self._lock:
+                self._entries[name] = entry
+        # 返回副本，调用方修改数据不会影响缓存
+        return copy.deepcopy(entry[1])
+
+    def put(self, name, data):
+        """在模板文件写入后直接更新缓存，不必再读取一次文件
+
+        Args:
+            name: 模板名称
+            data: 刚写入的模板数据
+        """
+        stamp = _stat_stamp(self.get_path(name))
+        with self._lock:
+            if stamp is None:
+                self._entries.pop(name, None)
+            else:
+                self._entries[name] = (stamp, copy.deepcopy(data))
+            # 新增模板会改变文件夹，下次列出时重新扫描
+            self._folder_stamp = None
+
+    def invalidate(self, name=None):
+        """使缓存失效
+
+        Args:
+            name: 模板名称，None表示整个索引
+        """
+        with self._lock:
+            if name is None:
+                self._entries = {}
+            else:
+                self._entries.pop(name, None)
+            self._folder_stamp = None
+
+    def _scan(self, stamp):
+        """重新扫描文件夹，丢弃已删除模板的缓存"""
+        names = []
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    # 与glob一致，跳过隐藏文件
+                    if (entry.name.endswith(self.extension) and not entry.name.startswith(".")
+                            and entry.is_file()):
+                        names.append(entry.name[:-len(self.extension)])
+        except OSError:
+            names = []
+        names.sort()
+        self._names = names
+        present = set(names)
+        self._entries = {name: entry for name, entry in self._entries.items() if name in present}
+        self._folder_stamp = stamp
+
+
+def _stat_stamp(path):
+    """获取文件或文件夹的(修改时间纳秒, 大小)，不存在时返回None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _is_racy(stamp):
+    """修改时间是否过近，可能在同一时间精度内再次被修改"""
+    return time.time() - stamp[0] / 1e9 < RACY_SECONDS
@@ -8,22 +8,66 @@ Photo-Watermark-2 - 图片水印工具
 
 import os
 import json
-import glob
 from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
+from core.template_index import TemplateIndex
+from core.compiled_template import CompiledTemplate
+
 
 class TemplateManager:
     """模板管理器类，负责水印模板的保存、加载和管理"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, store=None):
         """初始化模板管理器
         
         Args:
             parent: 父窗口对象，用于文件对话框和消息框
+            store: 可选的SqliteTemplateStore对象，指定后模板保存在数据库中而不是JSON文件中
         """
         self.parent = parent
         self.templates_folder = self._get_default_templates_folder()
         self.template_extension = '.json'
+        # 缓存模板列表和已解析的模板数据，文件夹或文件变化后自动失效
+        self.index = TemplateIndex(self.templates_folder, self.template_extension)
+        self.store = store
+        # 编译后的模板，按名称缓存，模板数据变化或图片水印源文件被修改后重新编译
+        self.compiled = {}
+        
+    def use_database(self, db_path, import_existing=True):
+        """改用SQLite数据库保存模板
+        
+        Args:
+            db_path: 数据库文件路径
+            import_existing: 数据库为空时是否先导入模板文件夹中已有的JSON模板
+            
+        Returns:
+            bool: 是否切换成功
+        """
+        # sqlite3只在使用数据库时导入，不影响启动
+        from core.template_store import SqliteTemplateStore
+        try:
+            store = SqliteTemplateStore(db_path)
+            if import_existing and len(store) == 0:
+                store.import_folder(self.templates_folder, self.template_extension)
+        except Exception as e:
+            print(f"无法打开模板数据库 {db_path}: {str(e)}")
+            return False
+        if self.store is not None:
+            self.store.close()
+        self.store = store
+        self.compiled = {}
+        return True
+        
+    def _confirm_overwrite(self, template_name):
+        """询问是否覆盖已存在的模板"""
+        reply = QMessageBox.question(
+            self.parent,
+            "确认覆盖",
+            f"模板 '{template_name}' 已存在，是否覆盖？",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.No
+        )
+        return reply == QMessageBox.Yes
         
     def _get_default_templates_folder(self):
         """获取默认的模板文件夹路径
@@ -70,6 +114,12 @@ class TemplateManager:
             if not isinstance(template_data, dict):
                 return False
             
+            if self.store is not None:
+                if self.store.exists(template_name) and not self._confirm_overwrite(template_name):
+                    return False
+                self.store.save(template_name, template_data)
+                return True
+            
             # 为模板名称添加扩展名
             template_file_name = f"{template_name}{self.template_extension}"
             template_path = os.path.join(self.templates_folder, template_file_name)
@@ -90,6 +140,7 @@ class TemplateManager:
             # 保存模板数据
             with open(template_path, 'w', encoding='utf-8') as f:
                 json.dump(template_data, f, ensure_ascii=False, indent=4)
+            self.index.put(template_name, template_data)
             
             return True
         except Exception:
@@ -105,28 +156,25 @@ class TemplateManager:
             dict: 模板数据字典，如果加载失败则返回None
         """
         try:
-            template_path = None
-            
             if template_name:
-                # 使用指定的模板名称
-                template_file_name = f"{template_name}{self.template_extension}"
-                template_path = os.path.join(self.templates_folder, template_file_name)
-                
-                if not os.path.exists(template_path):
-                    # 模板不存在，让用户选择
-                    template_path = None
+                # 使用指定的模板名称，已解析的数据从数据库或索引中获取
+                if self.store is not None:
+                    template_data = self.store.load(template_name)
+                else:
+                    template_data = self.index.get(template_name)
+                if template_data is not None:
+                    return template_data
+            
+            # 模板不存在或未指定，打开文件对话框让用户选择模板文件
+            template_path, _ = QFileDialog.getOpenFileName(
+                self.parent,
+                "选择模板",
+                self.templates_folder,
+                f"模板文件 (*{self.template_extension})"
+            )
             
             if not template_path:
-                # 打开文件对话框让用户选择模板文件
-                template_path, _ = QFileDialog.getOpenFileName(
-                    self.parent,
-                    "选择模板",
-                    self.templates_folder,
-                    f"模板文件 (*{self.template_extension})"
-                )
-                
-                if not template_path:
-                    return None
+                return None
             
             # 加载模板数据
             with open(template_path, 'r', encoding='utf-8') as f:
@@ -136,6 +184,35 @@ class TemplateManager:
         except Exception:
             return None
             
+    def compile_template(self, template_name):
+        """获取编译后的模板，模板数据未变化时直接返回缓存的结果
+        
+        Args:
+            template_name: 模板名称
+            
+        Returns:
+            CompiledTemplate: 编译后的模板，模板不存在或无效时返回None
+        """
+        try:
+            if self.store is not None:
+                template_data = self.store.load(template_name)
+            else:
+                template_data = self.index.get(template_name)
+            if template_data is None:
+                self.compiled.pop(template_name, None)
+                return None
+            
+            # 读取模板数据本身有索引或数据库缓存，只有数据变化时才重新解析字体和渲染
+            cached = self.compiled.get(template_name)
+            if cached is not None and cached[0] == template_data and not cached[1].is_stale():
+                return cached[1]
+            compiled = CompiledTemplate(template_name, template_data)
+            self.compiled[template_name] = (template_data, compiled)
+            return compiled
+        except Exception as e:
+            print(f"无法编译模板 '{template_name}': {str(e)}")
+            return None
+            
     def delete_template(self, template_name):
         """删除水印模板
         
@@ -151,7 +228,10 @@ class TemplateManager:
             template_path = os.path.join(self.templates_folder, template_file_name)
             
             # 检查模板是否存在
-            if not os.path.exists(template_path):
+            if self.store is not None:
+                if not self.store.exists(template_name):
+                    return False
+            elif not os.path.exists(template_path):
                 return False
             
             # 显示确认对话框
@@ -166,8 +246,12 @@ class TemplateManager:
             if reply != QMessageBox.Yes:
                 return False
             
+            if self.store is not None:
+                return self.store.delete(template_name)
+            
             # 删除模板文件
             os.remove(template_path)
+            self.index.invalidate(template_name)
             
             return True
         except Exception:
@@ -180,21 +264,10 @@ class TemplateManager:
             list: 模板名称列表
         """
         try:
-            templates = []
-            
-            # 获取模板文件夹中的所有模板文件
-            template_files = glob.glob(os.path.join(self.templates_folder, f"*{self.template_extension}"))
-            
-            # 提取模板名称
-            for template_file in template_files:
-                # 获取文件名（不带路径和扩展名）
-                template_name = os.path.splitext(os.path.basename(template_file))[0]
-                templates.append(template_name)
-            
-            # 按名称排序
-            templates.sort()
-            
-            return templates
+            if self.store is not None:
+                return self.store.list_names()
+            # 文件夹未变化时直接返回缓存的列表
+            return self.index.list_names()
         except Exception:
             return []
             
@@ -209,6 +282,16 @@ class TemplateManager:
             bool: 是否重命名成功
         """
         try:
+            if self.store is not None:
+                if not self.store.exists(old_name):
+                    return False
+                overwrite = False
+                if old_name != new_name and self.store.exists(new_name):
+                    if not self._confirm_overwrite(new_name):
+                        return False
+                    overwrite = True
+                return self.store.rename(old_name, new_name, overwrite=overwrite)
+            
             # 构建原模板和新模板的文件路径
             old_file_name = f"{old_name}{self.template_extension}"
             new_file_name = f"{new_name}{self.template_extension}"
@@ -235,6 +318,8 @@ class TemplateManager:
             
             # 重命名文件
             os.rename(old_path, new_path)
+            self.index.invalidate(old_name)
+            self.index.invalidate(new_name)
             
             return True
         except Exception:
@@ -251,6 +336,14 @@ class TemplateManager:
             bool: 是否导出成功
         """
         try:
+            if self.store is not None:
+                template_data = self.store.load(template_name)
+                if template_data is None:
+                    return False
+                with open(export_path, 'w', encoding='utf-8') as f:
+                    json.dump(template_data, f, ensure_ascii=False, indent=4)
+                return True
+            
             # 构建模板文件路径
             template_file_name = f"{template_name}{self.template_extension}"
             template_path = os.path.join(self.templates_folder, template_file_name)
@@ -291,6 +384,14 @@ class TemplateManager:
             # 获取文件名作为模板名称
             template_name = os.path.splitext(os.path.basename(import_path))[0]
             
+            if self.store is not None:
+                if not isinstance(template_data, dict):
+                    return None
+                if self.store.exists(template_name) and not self._confirm_overwrite(template_name):
+                    return None
+                self.store.save(template_name, template_data)
+                return template_name
+            
             # 构建目标文件路径
             template_file_name = f"{template_name}{self.template_extension}"
             template_path = os.path.join(self.templates_folder, template_file_name)
@@ -311,11 +412,69 @@ class TemplateManager:
             # 复制文件到模板文件夹
             import shutil
             shutil.copy2(import_path, template_path)
+            self.index.invalidate(template_name)
             
             return template_name
         except Exception:
             return None
             
+    def search_templates(self, text=None, tag=None):
+        """按名称和标签搜索模板
+        
+        Args:
+            text: 名称中包含的文本，不区分大小写
+            tag: 标签
+            
+        Returns:
+            list: 模板名称列表
+        """
+        try:
+            if self.store is not None:
+                return self.store.search(text, tag)
+            # 文件模板没有标签索引，逐个读取模板中的"tags"
+            names = self.index.list_names()
+            if text:
+                names = [name for name in names if text.lower() in name.lower()]
+            if tag:
+                names = [name for name in names if tag in ((self.index.get(name) or {}).get("tags") or [])]
+            return names
+        except Exception:
+            return []
+            
+    def import_folder(self, folder_path):
+        """把文件夹中的JSON模板批量导入数据库
+        
+        Args:
+            folder_path: 模板文件夹
+            
+        Returns:
+            list: 导入的模板名称列表，未使用数据库时返回空列表
+        """
+        if self.store is None:
+            return []
+        try:
+            return self.store.import_folder(folder_path, self.template_extension)
+        except Exception as e:
+            print(f"导入模板失败: {str(e)}")
+            return []
+            
+    def export_folder(self, folder_path):
+        """把数据库中的模板全部导出为JSON文件
+        
+        Args:
+            folder_path: 目标文件夹
+            
+        Returns:
+            list: 导出的模板名称列表，未使用数据库时返回空列表
+        """
+        if self.store is None:
+            return []
+        try:
+            return self.store.export_folder(folder_path, self.template_extension)
+        except Exception as e:
+            print(f"导出模板失败: {str(e)}")
+            return []
+            
     def get_template_folder(self):
         """获取模板文件夹路径
         
@@ -348,6 +507,8 @@ class TemplateManager:
             
             # 设置新的模板文件夹
             self.templates_folder = folder_path
+            self.index = TemplateIndex(folder_path, self.template_extension)
+            self.compiled = {}
             
             return True
         except Exception:
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+模板数据库模块
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+
+# 数据库结构版本，保存在PRAGMA user_version中
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS templates (
+    name TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS template_tags (
+    name TEXT NOT NULL REFERENCES templates(name) ON UPDATE CASCADE ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (tag, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS template_tags_name ON template_tags(name);
+"""
+
+
+class SqliteTemplateStore:
+    """基于SQLite的模板存储
+
+    所有模板保存在一个数据库文件中，名称是主键，标签单独建表并按标签建立索引。
+    列出、搜索模板只查询索引，不必扫描和解析每个模板文件，启动耗时与模板数量无关；
+    保存、重命名和删除都在事务中完成，中途失败不会留下不完整的模板。
+    """
+
+    def __init__(self, db_path):
+        """打开或创建模板数据库
+
+        Args:
+            db_path: 数据库文件路径，":memory:"表示内存数据库
+        """
+        self.db_path = db_path
+        if db_path != ":memory:":
+            folder = os.path.dirname(os.path.abspath(db_path))
+            if not os.path.exists(folder):
+                os.makedirs(folder)
+        # 界面线程和后台线程可能共用同一个连接，由锁保证串行访问
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.commit()
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM templates").fetchone()[0]
+
+    def exists(self, name):
+        """模板是否存在
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            bool: 是否存在
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM templates WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def list_names(self):
+        """获取按名称排序的模板列表
+
+        Returns:
+            list: 模板名称列表
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name FROM templates ORDER BY name").fetchall()
+        return [row[0] for row in rows]
+
+    def search(self, text=None, tag=None):
+        """按名称和标签搜索模板
+
+        Args:
+            text: 名称中包含的文本，不区分大小写，None表示不限
+            tag: 标签，None表示不限
+
+        Returns:
+            list: 按名称排序的模板名称列表
+        """
+        query = "SELECT t.name FROM templates AS t"
+        conditions = []
+        params = []
+        if tag:
+            query += " JOIN template_tags AS g ON g.name = t.name"
+            conditions.append("g.tag = ?")
+            params.append(tag)
+        if text:
+            conditions.append("t.name LIKE ? ESCAPE '\\'")
+            escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY t.name"
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [row[0] for row in rows]
+
+    def list_tags(self):
+        """获取所有标签
+
+        Returns:
+            list: 排序后的标签列表
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT tag FROM template_tags ORDER BY tag").fetchall()
+        return [row[0] for row in rows]
+
+    def get_tags(self, name):
+        """获取模板的标签
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            list: 排序后的标签列表
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT tag FROM template_tags WHERE name = ? ORDER BY tag", (name,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, name):
+        """读取模板数据
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            dict: 模板数据，模板不存在时返回None
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM templates WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def save(self, name, data, tags=None):
+        """保存模板，已存在时覆盖
+
+        Args:
+            name: 模板名称
+            data: 模板数据字典
+            tags: 标签列表，None表示使用模板数据中的"tags"
+        """
+        with self._lock, self._conn:
+            self._write(name, data, tags)
+
+    def delete(self, name):
+        """删除模板及其标签
+
+        Args:
+            name: 模板名称
+
+        Returns:
+            bool: 模板是否存在并已删除
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM templates WHERE name = ?", (name,))
+        return cursor.rowcount > 0
+
+    def rename(self, old_name, new_name, overwrite=False):
+        """重命名模板，标签随之更新
+
+        Args:
+            old_name: 原模板名称
+            new_name: 新模板名称
+            overwrite: 新名称已存在时是否覆盖
+
+        Returns:
+            bool: 是否重命名成功
+        """
+        if old_name == new_name:
+            return self.exists(old_name)
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM templates WHERE name = ?", (old_name,)).fetchone() is None:
+                return False
+            if self._conn.execute("SELECT 1 FROM templates WHERE name = ?", (new_name,)).fetchone():
+                if not overwrite:
+                    return False
+                self._conn.execute("DELETE FROM templates WHERE name = ?", (new_name,))
+            self._conn.execute(
+                "UPDATE templates SET name = ?, updated = ? WHERE name = ?",
+                (new_name, time.time(), old_name)
+            )
+        return True
+
+    def import_folder(self, folder, extension=".json", overwrite=True):
+        """从模板文件夹批量导入，全部在一个事务中写入
+
+        Args:
+            folder: 模板文件夹
+            extension: 模板文件扩展名
+            overwrite: 同名模板已存在时是否覆盖
+
+        Returns:
+            list: 导入的模板名称列表，无法解析的文件会被跳过
+        """
+        templates = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if (not entry.name.endswith(extension) or entry.name.startswith(".")
+                            or not entry.is_file()):
+                        continue
+                    try:
+                        with open(entry.path, 'r', encoding='utf-8') as f:
+                            data = json.load(f)
+                    except Exception as e:
+                        print(f"跳过无效的模板文件 {entry.path}: {str(e)}")
+                        continue
+                    if isinstance(data, dict):
+                        templates.append((entry.name[:-len(extension)], data))
+        except OSError as e:
+            print(f"无法读取模板文件夹 {folder}: {str(e)}")
+            return []
+
+        imported = []
+        with self._lock, self._conn:
+            for name, data in sorted(templates, key=lambda item: item[0]):
+                if not overwrite and self._conn.execute(
+                        "SELECT 1 FROM templates WHERE name = ?", (name,)).fetchone():
+                    continue
+                self._write(name, data, None)
+                imported.append(name)
+        return imported
+
+    def export_folder(self, folder, extension=".json"):
+        """把所有模板导出为模板文件夹中的JSON文件
+
+        Args:
+            folder: 目标文件夹
+            extension: 模板文件扩展名
+
+        Returns:
+            list: 导出的模板名称列表
+        """
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+        with self._lock:
+            rows = self._conn.execute("SELECT name, data FROM templates ORDER BY name").fetchall()
+        exported = []
+        for name, data in rows:
+            path = os.path.join(folder, f"{name}{extension}")
+            temp_path = path + ".tmp"
+            # 先写临时文件再替换，导出中断不会留下半个模板文件
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(json.loads(data), f, ensure_ascii=False, indent=4)
+            os.replace(temp_path, path)
+            exported.append(name)
+        return exported
+
+    def _write(self, name, data, tags):
+        """在当前事务中写入模板和标签"""
+        if tags is None:
+            tags = data.get("tags") or []
+        self._conn.execute(
+            "INSERT INTO templates (name, data, updated) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET data = excluded.data, updated = excluded.updated",
+            (name, json.dumps(data, ensure_ascii=False), time.time())
+        )
+        self._conn.execute("DELETE FROM template_tags WHERE name = ?", (name,))
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO template_tags (name, tag) VALUES (?, ?)",
+            [(name, str(tag)) for tag in tags if str(tag)]
+        )
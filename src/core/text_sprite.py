@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+文本水印图块模块
+"""
+
+import math
+import threading
+from collections import namedtuple
+
+
+# 旋转时可选的重采样方式
+RESAMPLE_MODES = {
+    "bicubic": "双三次插值",
+    "supersample": "超采样"
+}
+
+DEFAULT_RESAMPLE = "bicubic"
+
+# 超采样时按几倍字号绘制和旋转，再缩小回原尺寸
+SUPERSAMPLE_FACTOR = 4
+
+# 文本四周留出的空白，避免旋转插值时边缘被截断
+PADDING = 2
+
+# 图块缓存最多保留的条目数，按比例设置字号时每个尺寸档位各占一个条目
+SPRITE_CACHE_SIZE = 32
+
+# 按比例设置尺寸时相邻尺寸档位的比例（约6%），肉眼难以分辨
+SIZE_BUCKET_RATIO = 2 ** (1 / 12)
+
+# 决定文本水印图块内容的全部设置，用作缓存的键
+WatermarkSpec = namedtuple(
+    "WatermarkSpec",
+    ["text", "font_name", "font_size", "bold", "italic", "color", "rotation", "resample"]
+)
+
+
+def quantize_size(size):
+    """把字号或图片水印宽度归入按几何级数划分的尺寸档位
+
+    尺寸相近的图片使用同一档尺寸，可以共用同一个缓存的图块。
+
+    Args:
+        size: 字号或宽度(像素)
+
+    Returns:
+        int: 档位尺寸，至少为1
+    """
+    if size <= 1:
+        return 1
+    bucket = round(math.log(size) / math.log(SIZE_BUCKET_RATIO))
+    return max(1, int(round(SIZE_BUCKET_RATIO ** bucket)))
+
+
+def measure_text(text, font):
+    """测量文本从(0, 0)绘制时的边界框
+
+    Args:
+        text: 文本内容
+        font: 字体对象
+
+    Returns:
+        tuple: (left, top, right, bottom)
+    """
+    # Pillow只在渲染时导入，界面只需要本模块的常量时不必加载
+    from PIL import Image, ImageDraw
+    draw = ImageDraw.Draw(Image.new('L', (1, 1)))
+    try:
+        # 尝试使用新的textbbox方法(Pillow 9.0+)
+        return draw.textbbox((0, 0), text, font=font)
+    except AttributeError:
+        try:
+            # 尝试使用textlength方法
+            return (0, 0, int(draw.textlength(text, font=font)), font.size)
+        except AttributeError:
+            # 回退到旧的textsize方法
+            text_width, text_height = draw.textsize(text, font=font)
+            return (0, 0, text_width, text_height)
+
+
+def render_text_sprite(text, font, color, rotation=0, resample=DEFAULT_RESAMPLE):
+    """生成文本水印图块
+
+    文本只绘制为一个透明度通道，旋转也只作用于这个通道，颜色在最后统一填充，
+    因此旋转插值不会在边缘混入背景色。图块按文本的实际范围裁剪，
+    其尺寸即水印在原图上占据的范围，可直接用于计算位置。
+
+    Args:
+        text: 文本内容
+        font: 字体对象
+        color: RGBA颜色
+        rotation: 旋转角度(度)，逆时针
+        resample: 重采样方式，见RESAMPLE_MODES
+
+    Returns:
+        Image: RGBA水印图块
+    """
+    if resample not in RESAMPLE_MODES:
+        raise ValueError(f"未知的重采样方式: {resample}")
+    from PIL import Image, ImageDraw
+    # 兼容Pillow 9.0（没有Image.Resampling）
+    resampling = getattr(Image, "Resampling", Image)
+    alpha = color[3] if len(color) > 3 else 255
+    bbox = measure_text(text, font)
+
+    if rotation % 360 == 0:
+        # 把文本的边界框对齐到图块左上角
+        mask = Image.new('L', (max(1, bbox[2] - bbox[0]), max(1, bbox[3] - bbox[1])), 0)
+        ImageDraw.Draw(mask).text((-bbox[0], -bbox[1]), text, font=font, fill=alpha)
+        return _colorize(mask, color)
+
+    scale = 1
+    if resample == "supersample" and hasattr(font, "font_variant"):
+        scale = SUPERSAMPLE_FACTOR
+        font = font.font_variant(size=font.size * scale)
+        bbox = measure_text(text, font)
+
+    padding = PADDING * scale
+    mask = Image.new('L', (bbox[2] - bbox[0] + padding * 2, bbox[3] - bbox[1] + padding * 2), 0)
+    ImageDraw.Draw(mask).text((padding - bbox[0], padding - bbox[1]), text, font=font, fill=alpha)
+
+    if scale > 1:
+        # 放大后的字形已经足够平滑，旋转用双线性即可，再以盒式滤波缩小
+        mask = mask.rotate(rotation, resample=resampling.BILINEAR, expand=True)
+        mask = mask.reduce(scale)
+    else:
+        mask = mask.rotate(rotation, resample=resampling.BICUBIC, expand=True)
+
+    # 裁剪到旋转后文本的实际范围
+    content = mask.getbbox()
+    mask = mask.crop(content) if content else Image.new('L', (1, 1), 0)
+    return _colorize(mask, color)
+
+
+def _colorize(mask, color):
+    """用透明度通道和颜色组合出RGBA图块"""
+    from PIL import Image
+    sprite = Image.new('RGBA', mask.size, tuple(color[:3]) + (0,))
+    sprite.putalpha(mask)
+    return sprite
+
+
+class SpriteCache:
+    """水印图块缓存
+
+    以WatermarkSpec为键保存渲染结果，同一组设置只渲染一次。
+    超过容量时丢弃最早加入的条目。多个工作线程可以共用同一个缓存。
+    """
+
+    def __init__(self, max_size=SPRITE_CACHE_SIZE):
+        """初始化图块缓存
+
+        Args:
+            max_size: 最多保留的条目数
+        """
+        self.max_size = max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, spec):
+        """获取缓存的图块
+
+        Args:
+            spec: WatermarkSpec
+
+        Returns:
+            水印图块，未缓存时返回None
+        """
+        with self._lock:
+            return self._entries.get(spec)
+
+    def put(self, spec, entry):
+        """保存图块
+
+        Args:
+            spec: WatermarkSpec
+            entry: 水印图块
+        """
+        with self._lock:
+            if spec not in self._entries and len(self._entries) >= self.max_size:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[spec] = entry
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries = {}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
@@ -6,16 +6,42 @@ Photo-Watermark-2 - 图片水印工具
 水印处理模块
 """
 
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 import os
+import threading
+
+from core.encoder_profiles import get_encoder_profile, get_format_from_path, DEFAULT_PRESET
+from core.image_metadata import ImageMetadata
+from core.jpeg_region import JpegRegionEncoder
+from core.strip_processor import StripProcessor
+from core.blend import blend_image, prepare_sprite
+from core.stage_timer import StageTimer
+from core.layout import (
+    DEFAULT_MARGIN, SIZE_REFERENCES, compute_placement, oriented_size, plan_layout, reference_length
+)
+from core.image_sprite import ImageWatermarkSpec, LogoSource, render_image_sprite
+from core.text_sprite import (
+    WatermarkSpec, SpriteCache, RESAMPLE_MODES, DEFAULT_RESAMPLE, render_text_sprite, quantize_size
+)
+
+
+# 已解析的字体对象，按(字体名称, 字号)在所有水印对象之间共享，
+# 避免每次渲染都重新查找和加载字体文件。同一个字体对象不能在多个线程中同时渲染，
+# 使用时需持有_font_lock
+_font_cache = {}
+_font_lock = threading.Lock()
 
 
 class Watermark:
-    """水印处理类，负责添加文本水印到图片上"""
+    """水印处理类，负责添加文本水印或图片水印到图片上"""
     
     def __init__(self):
         """初始化水印处理器"""
+        self.watermark_type = "text"  # 水印类型: "text"或"image"
         self.text = ""
+        self.image_path = None  # 图片水印的路径
+        self.image_scale = 1.0  # 图片水印相对源图的缩放比例，按比例设置尺寸时不使用
+        self.logo_source = None  # 已加载的图片水印源图
         # 使用支持中文的字体作为默认字体
         self.font_name = "SimHei"  # 黑体，Windows系统默认支持中文
         self.font_size = 24
@@ -23,8 +49,20 @@ class Watermark:
         self.font_italic = False
         self.color = (255, 255, 255, 128)  # 默认白色半透明
         self.opacity = 50  # 0-100%
-        self.position = "center"  # 预设位置或坐标(x, y)
+        self.position = "center"  # 预设位置、相对坐标或绝对坐标(x, y)
+        self.margin = DEFAULT_MARGIN  # 预设位置与图片边缘的距离
+        self.size_reference = None  # 按比例设置字号时的参照长度，None表示使用像素字号
+        self.font_scale = 0.05  # 字号占参照长度的比例
+        self.margin_scale = None  # 边距占参照长度的比例，None表示使用像素边距
         self.rotation = 0  # 旋转角度
+        self.resample = DEFAULT_RESAMPLE  # 旋转时的重采样方式
+        self.sprite_cache = SpriteCache()  # 按设置缓存渲染好的水印图块
+        self.encoder_preset = DEFAULT_PRESET  # 输出编码预设
+        self.jpeg_region_mode = True  # JPEG到JPEG时只重新编码水印区域
+        self.jpeg_region_encoder = JpegRegionEncoder()
+        self.strip_mode = True  # 未压缩的BMP/TIFF只改写与水印相交的条带
+        self.strip_processor = StripProcessor()
+        self.stage_timer = StageTimer(enabled=False)  # 阶段计时，默认关闭
         # 支持中文的备选字体列表
         self.chinese_fonts = ["SimHei", "Microsoft YaHei", "Arial Unicode MS", "WenQuanYi Micro Hei"]
         
@@ -36,6 +74,29 @@ class Watermark:
         """
         self.text = text
         
+    def set_image(self, image_path, scale=1.0):
+        """设置图片水印，例如带透明通道的PNG标志
+        
+        源图只加载一次并生成金字塔，之后按每张图片需要的尺寸缩放。
+        
+        Args:
+            image_path: 图片路径，None表示改回文本水印
+            scale: 相对源图的缩放比例，按比例设置尺寸时不使用
+        """
+        if image_path is None:
+            self.watermark_type = "text"
+            self.image_path = None
+            self.logo_source = None
+            return
+        if scale <= 0:
+            raise ValueError("图片水印缩放比例必须大于0")
+        # 同一个源图未被修改时不重复加载
+        if self.logo_source is None or self.image_path != image_path or self.logo_source.is_stale():
+            self.logo_source = LogoSource(image_path)
+        self.image_path = image_path
+        self.image_scale = scale
+        self.watermark_type = "image"
+        
     def set_font(self, font_name, font_size, bold=False, italic=False):
         """设置水印字体
         
@@ -68,11 +129,37 @@ class Watermark:
         Args:
             position: 预设位置字符串('top_left', 'top_center', 'top_right', 
                       'middle_left', 'center', 'middle_right', 
-                      'bottom_left', 'bottom_center', 'bottom_right')
-                      或坐标元组(x, y)
+                      'bottom_left', 'bottom_center', 'bottom_right')、
+                      相对坐标元组(0-1的浮点数)或绝对坐标元组(x, y)
         """
         self.position = position
         
+    def set_margin(self, margin):
+        """设置预设位置和相对坐标与图片边缘的距离
+        
+        Args:
+            margin: 边距(像素)
+        """
+        self.margin = margin
+        
+    def set_relative_size(self, reference, font_scale=0.05, margin_scale=None):
+        """按图片尺寸的比例设置字号和边距
+        
+        字号会归入几何级数划分的尺寸档位，尺寸相近的图片共用同一个缓存的图块。
+        
+        Args:
+            reference: 参照长度('width', 'short_side')，None表示恢复像素字号和边距
+            font_scale: 字号占参照长度的比例
+            margin_scale: 边距占参照长度的比例，None表示仍使用像素边距
+        """
+        if reference is not None and reference not in SIZE_REFERENCES:
+            raise ValueError(f"未知的尺寸参照: {reference}")
+        if font_scale <= 0:
+            raise ValueError("字号比例必须大于0")
+        self.size_reference = reference
+        self.font_scale = font_scale
+        self.margin_scale = margin_scale
+        
     def set_rotation(self, angle):
         """设置水印旋转角度
         
@@ -81,6 +168,99 @@ class Watermark:
         """
         self.rotation = angle
         
+    def set_resample(self, resample):
+        """设置旋转时的重采样方式
+        
+        Args:
+            resample: 重采样方式('bicubic', 'supersample')
+        """
+        if resample not in RESAMPLE_MODES:
+            raise ValueError(f"未知的重采样方式: {resample}")
+        self.resample = resample
+        
+    def get_spec(self, size=None):
+        """获取决定水印图块内容的全部设置
+        
+        Args:
+            size: 文本水印的字号或图片水印的宽度(像素)，None表示按像素设置计算
+            
+        Returns:
+            WatermarkSpec或ImageWatermarkSpec: 可作为缓存键的设置
+        """
+        if self.watermark_type == "image":
+            return ImageWatermarkSpec(
+                self.image_path, self.logo_source.mtime, size or self._get_image_width(),
+                self.opacity, self.rotation, self.resample
+            )
+        return WatermarkSpec(
+            self.text, self.font_name, size or self.font_size, self.font_bold, self.font_italic,
+            tuple(self.color), self.rotation, self.resample
+        )
+        
+    def get_layout_size(self, image_size):
+        """获取某个尺寸的图片实际使用的水印尺寸和边距
+        
+        Args:
+            image_size: 原图转正后的尺寸(宽, 高)
+            
+        Returns:
+            tuple: (文本水印的字号或图片水印的宽度, 边距)，单位为像素
+        """
+        if self.size_reference is None:
+            if self.watermark_type == "image":
+                return self._get_image_width(), self.margin
+            return self.font_size, self.margin
+        length = reference_length(image_size, self.size_reference)
+        size = quantize_size(length * self.font_scale)
+        margin = self.margin if self.margin_scale is None else int(round(length * self.margin_scale))
+        return size, margin
+        
+    def _get_image_width(self):
+        """按像素设置时图片水印的宽度"""
+        return max(1, int(round(self.logo_source.size[0] * self.image_scale)))
+        
+    def _check_ready(self):
+        """检查水印内容是否已设置"""
+        if self.watermark_type == "image":
+            if self.logo_source is None:
+                raise ValueError("图片水印不能为空")
+        elif not self.text:
+            raise ValueError("水印文本不能为空")
+        
+    def set_encoder_preset(self, preset):
+        """设置输出编码预设
+        
+        Args:
+            preset: 预设名称('fast', 'balanced', 'smallest')
+        """
+        # 提前校验，避免批量导出时每张图片都失败
+        get_encoder_profile(preset)
+        self.encoder_preset = preset
+        
+    def set_jpeg_region_mode(self, enabled):
+        """设置JPEG到JPEG时是否只重新编码水印所在的区域
+        
+        Args:
+            enabled: 是否启用
+        """
+        self.jpeg_region_mode = enabled
+        
+    def set_strip_mode(self, enabled):
+        """设置未压缩的BMP/TIFF是否按条带处理
+        
+        Args:
+            enabled: 是否启用
+        """
+        self.strip_mode = enabled
+        
+    def set_stage_timer(self, timer):
+        """设置阶段计时器
+        
+        Args:
+            timer: StageTimer对象，None表示关闭计时
+        """
+        self.stage_timer = timer or StageTimer(enabled=False)
+        
     def add_watermark(self, image_path, output_path=None):
         """添加水印到图片
         
@@ -91,196 +271,240 @@ class Watermark:
         Returns:
             处理后的Image对象或None(如果指定了output_path)
         """
-        if not self.text:
-            raise ValueError("水印文本不能为空")
+        self._check_ready()
+            
+        with self.stage_timer.stage("total"):
+            return self._add_watermark(image_path, output_path)
             
+    def _add_watermark(self, image_path, output_path):
+        """添加水印到图片，各阶段分别计时"""
+        timer = self.stage_timer
+        
         # 打开图片
         try:
-            with Image.open(image_path) as img:
-                # 确保图片有Alpha通道
-                if img.mode != 'RGBA':
-                    img = img.convert('RGBA')
-                
-                # 创建一个可以在其上绘制的新图像
-                watermark_img = Image.new('RGBA', img.size, (255, 255, 255, 0))
-                draw = ImageDraw.Draw(watermark_img)
-                
-                # 加载字体
-                font = None
-                
-                # 1. 首先尝试用户指定的字体
-                try:
-                    font = ImageFont.truetype(self.font_name, self.font_size)
-                    # 测试字体是否支持中文
-                    try:
-                        # 创建一个临时的draw对象来测试字体
-                        test_img = Image.new('RGBA', (100, 100), (255, 255, 255, 0))
-                        test_draw = ImageDraw.Draw(test_img)
-                        test_draw.text((0, 0), "测试", font=font)
-                    except Exception:
-                        print(f"警告: 指定的字体 '{self.font_name}' 可能不支持中文")
-                except IOError:
-                    # 字体加载失败，尝试备选中文字体
-                    for fallback_font in self.chinese_fonts:
-                        try:
-                            font = ImageFont.truetype(fallback_font, self.font_size)
-                            break
-                        except IOError:
-                            continue
-                    
-                    # 如果所有备选字体都失败，尝试直接指定一些常见的中文字体文件路径
-                    # Windows系统常见中文字体路径
-                    windows_font_paths = [
-                        "C:/Windows/Fonts/simhei.ttf",  # 黑体
-                        "C:/Windows/Fonts/msyh.ttc",    # 微软雅黑
-                        "C:/Windows/Fonts/simsun.ttc",  # 宋体
-                        "C:/Windows/Fonts/simkai.ttf"   # 楷体
-                    ]
-                    
-                    if font is None:
-                        for font_path in windows_font_paths:
-                            if os.path.exists(font_path):
-                                try:
-                                    font = ImageFont.truetype(font_path, self.font_size)
-                                    break
-                                except IOError:
-                                    continue
-                    
-                    # 如果所有尝试都失败，使用系统默认字体并提示
-                    if font is None:
-                        font = ImageFont.load_default()
-                        print(f"警告: 无法加载指定字体 '{self.font_name}' 和所有备选中文字体，使用系统默认字体")
+            with timer.stage("open"):
+                img = Image.open(image_path)
+            
+            with img:
+                with timer.stage("metadata"):
+                    # 从同一次打开中读取EXIF、XMP和ICC，避免为元数据再读一次文件
+                    metadata = ImageMetadata.from_image(img)
                 
-                # 获取文本尺寸
-                try:
-                    # 尝试使用新的textbbox方法(Pillow 9.0+)
-                    text_bbox = draw.textbbox((0, 0), self.text, font=font)
-                    text_width = text_bbox[2] - text_bbox[0]
-                    text_height = text_bbox[3] - text_bbox[1]
-                except AttributeError:
-                    try:
-                        # 尝试使用textlength方法
-                        text_width = draw.textlength(self.text, font=font)
-                        text_height = font.size
-                    except AttributeError:
-                        # 回退到旧的textsize方法
-                        text_width, text_height = draw.textsize(self.text, font=font)
+                # 按文件头中的尺寸和方向计算水印位置，此时还没有解码像素
+                sprite, position = self._create_sprite(oriented_size(img.size, metadata.orientation))
                 
-                # 计算水印位置
-                if isinstance(self.position, tuple) and len(self.position) == 2:
-                    # 手动指定的坐标
-                    x, y = self.position
-                else:
-                    # 预设位置
-                    img_width, img_height = img.size
-                    if self.position == "top_left":
-                        x, y = 10, 10
-                    elif self.position == "top_center":
-                        x, y = (img_width - text_width) // 2, 10
-                    elif self.position == "top_right":
-                        x, y = img_width - text_width - 10, 10
-                    elif self.position == "middle_left":
-                        x, y = 10, (img_height - text_height) // 2
-                    elif self.position == "center":
-                        x, y = (img_width - text_width) // 2, (img_height - text_height) // 2
-                    elif self.position == "middle_right":
-                        x, y = img_width - text_width - 10, (img_height - text_height) // 2
-                    elif self.position == "bottom_left":
-                        x, y = 10, img_height - text_height - 10
-                    elif self.position == "bottom_center":
-                        x, y = (img_width - text_width) // 2, img_height - text_height - 10
-                    elif self.position == "bottom_right":
-                        x, y = img_width - text_width - 10, img_height - text_height - 10
-                    else:
-                        # 默认居中
-                        x, y = (img_width - text_width) // 2, (img_height - text_height) // 2
+                # JPEG到JPEG时优先只重新编码水印覆盖的MCU块
+                if (output_path and self.jpeg_region_mode and metadata.orientation == 1
+                        and get_format_from_path(output_path) == "JPEG"
+                        and self.jpeg_region_encoder.can_encode(img)):
+                    with timer.stage("region_encode"):
+                        encoded = self.jpeg_region_encoder.encode(
+                            image_path, output_path, img, sprite, position, metadata
+                        )
+                    if encoded:
+                        return None
                 
-                # 绘制文本
-                draw.text((x, y), self.text, font=font, fill=self.color)
+                # 超大图片只读写与水印相交的条带，不把整张图片载入内存
+                if output_path and self.strip_mode and metadata.orientation == 1:
+                    image_format = get_format_from_path(output_path)
+                    format_options = get_encoder_profile(self.encoder_preset).get_save_options(image_format)
+                    if self.strip_processor.can_process(img, image_format, format_options):
+                        with timer.stage("strip"):
+                            processed = self.strip_processor.process(image_path, output_path, img, sprite, position)
+                        if processed:
+                            return None
                 
-                # 如果需要旋转
-                if self.rotation != 0:
-                    # 优化的旋转方法，只旋转水印文字而不改变原图大小
-                    # 创建一个与原图大小相同的透明水印图像
-                    rotated_watermark = Image.new('RGBA', img.size, (255, 255, 255, 0))
-                    
-                    # 创建一个临时图像来绘制和旋转文本
-                    # 计算需要的临时图像大小，确保足够容纳旋转后的文本
-                    import math
-                    max_dim = max(text_width, text_height) * 2
-                    temp_img = Image.new('RGBA', (max_dim, max_dim), (255, 255, 255, 0))
-                    temp_draw = ImageDraw.Draw(temp_img)
+                with timer.stage("decode"):
+                    img.load()
+                    if metadata.orientation != 1:
+                        # 先按EXIF方向转正，水印才会出现在用户看到的方向上
+                        img = ImageOps.exif_transpose(img)
+                        metadata.reset_orientation()
                     
-                    # 在临时图像中心绘制文本
-                    temp_center = max_dim // 2
-                    temp_draw.text(
-                        (temp_center - text_width // 2, temp_center - text_height // 2),
-                        self.text, font=font, fill=self.color
-                    )
-                    
-                    # 旋转临时图像
-                    rotated_temp = temp_img.rotate(self.rotation, expand=1)
-                    
-                    # 计算在原图上放置旋转后水印的位置
-                    rot_width, rot_height = rotated_temp.size
-                    
-                    # 根据用户选择的位置计算粘贴坐标
-                    if isinstance(self.position, tuple) and len(self.position) == 2:
-                        # 手动指定的坐标
-                        paste_x, paste_y = self.position
-                    else:
-                        # 预设位置
-                        img_width, img_height = img.size
-                        if self.position == "top_left":
-                            paste_x, paste_y = 0, 0
-                        elif self.position == "top_center":
-                            paste_x, paste_y = (img_width - rot_width) // 2, 0
-                        elif self.position == "top_right":
-                            paste_x, paste_y = img_width - rot_width, 0
-                        elif self.position == "middle_left":
-                            paste_x, paste_y = 0, (img_height - rot_height) // 2
-                        elif self.position == "center":
-                            paste_x, paste_y = (img_width - rot_width) // 2, (img_height - rot_height) // 2
-                        elif self.position == "middle_right":
-                            paste_x, paste_y = img_width - rot_width, (img_height - rot_height) // 2
-                        elif self.position == "bottom_left":
-                            paste_x, paste_y = 0, img_height - rot_height
-                        elif self.position == "bottom_center":
-                            paste_x, paste_y = (img_width - rot_width) // 2, img_height - rot_height
-                        elif self.position == "bottom_right":
-                            paste_x, paste_y = img_width - rot_width, img_height - rot_height
-                        else:
-                            # 默认居中
-                            paste_x, paste_y = (img_width - rot_width) // 2, (img_height - rot_height) // 2
-                    
-                    # 将旋转后的水印粘贴到原始大小的水印图像上
-                    rotated_watermark.paste(rotated_temp, (paste_x, paste_y), rotated_temp)
-                    
-                    # 直接在原图上合成水印
-                    result = Image.alpha_composite(img, rotated_watermark)
-                else:
-                    # 不需要旋转，直接合成
-                    result = Image.alpha_composite(img, watermark_img)
+                    # 混合内核直接处理RGB和RGBA，其他模式转换为RGBA
+                    if img.mode not in ('RGB', 'RGBA'):
+                        img = img.convert('RGBA')
+                
+                # 合成水印到原图
+                with timer.stage("composite"):
+                    result = self._composite(img, sprite, position)
                 
                 # 如果指定了输出路径，保存图片
                 if output_path:
-                    # 根据文件扩展名选择保存格式
-                    ext = os.path.splitext(output_path)[1].lower()
-                    if ext in ['.jpg', '.jpeg']:
-                        # JPEG不支持透明通道，转换为RGB
-                        result = result.convert('RGB')
-                        result.save(output_path, 'JPEG', quality=95)
-                    elif ext == '.png':
-                        result.save(output_path, 'PNG')
-                    else:
-                        # 默认保存为PNG
-                        result.save(output_path, 'PNG')
+                    with timer.stage("encode"):
+                        # 根据文件扩展名选择保存格式，按编码预设设置参数，并写回原图元数据
+                        image_format = get_format_from_path(output_path)
+                        save_options = metadata.get_save_options(image_format, result)
+                        get_encoder_profile(self.encoder_preset).save(
+                            result, output_path, image_format, **save_options
+                        )
                     return None
                 else:
                     return result
         except Exception as e:
             raise Exception(f"添加水印时发生错误: {str(e)}")
             
+    def get_sprite(self, size=None):
+        """获取当前设置下的水印图块
+        
+        图块按设置缓存，旋转、渲染和预乘只在设置变化后的第一张图片上进行，
+        之后每张图片只需计算位置。字体加载和渲染两个阶段分别计时。
+        
+        Args:
+            size: 文本水印的字号或图片水印的宽度(像素)，None表示按像素设置计算
+            
+        Returns:
+            RGBA图像或PremultipliedSprite
+        """
+        if self.watermark_type == "image" and self.logo_source.is_stale():
+            # 源图在磁盘上被替换后重新加载，旧的图块因修改时间不同不会再被使用
+            self.logo_source = LogoSource(self.image_path)
+        spec = self.get_spec(size)
+        sprite = self.sprite_cache.get(spec)
+        if sprite is None:
+            if self.watermark_type == "image":
+                with self.stage_timer.stage("render"):
+                    sprite = prepare_sprite(render_image_sprite(
+                        self.logo_source, spec.width, self.opacity, self.rotation, self.resample
+                    ))
+            else:
+                with self.stage_timer.stage("font"):
+                    font = self._load_font(spec.font_size)
+                with self.stage_timer.stage("render"), _font_lock:
+                    sprite = prepare_sprite(
+                        render_text_sprite(self.text, font, self.color, self.rotation, self.resample)
+                    )
+            self.sprite_cache.put(spec, sprite)
+        return sprite
+        
+    def _place(self, image_size):
+        """获取水印图块及其在原图上的粘贴范围
+        
+        Args:
+            image_size: 原图转正后的尺寸(宽, 高)
+            
+        Returns:
+            tuple: (水印图块, (left, top, right, bottom))
+        """
+        size, margin = self.get_layout_size(image_size)
+        sprite = self.get_sprite(size)
+        return sprite, compute_placement(image_size, sprite.size, self.position, margin)
+        
+    def _create_sprite(self, image_size):
+        """获取水印图块及其在原图上的位置
+        
+        Args:
+            image_size: 原图转正后的尺寸(宽, 高)
+            
+        Returns:
+            tuple: (水印图块, (x, y)左上角坐标)，坐标可能超出原图范围
+        """
+        sprite, rect = self._place(image_size)
+        return sprite, rect[:2]
+        
+    def plan_batch(self, image_paths):
+        """只读取文件头，预先计算一批图片的水印位置
+        
+        Args:
+            image_paths: 图片路径列表
+            
+        Returns:
+            list: 每张图片一个字典，包含path、image_size、rect、overflow和error
+        """
+        self._check_ready()
+        return plan_layout(image_paths, lambda image_size: self._place(image_size)[1])
+            
+    def _load_font(self, font_size=None):
+        """加载水印字体，已解析过的字体直接从缓存中获取
+        
+        Args:
+            font_size: 字号(像素)，None表示使用font_size
+            
+        Returns:
+            ImageFont: 字体对象
+        """
+        key = (self.font_name, font_size or self.font_size)
+        with _font_lock:
+            font = _font_cache.get(key)
+            if font is None:
+                font = self._resolve_font(key[1])
+                _font_cache[key] = font
+        return font
+        
+    def _resolve_font(self, font_size):
+        """查找并加载水印字体，依次尝试指定字体、备选中文字体和系统默认字体
+        
+        Args:
+            font_size: 字号(像素)
+            
+        Returns:
+            ImageFont: 字体对象
+        """
+        font = None
+        
+        # 1. 首先尝试用户指定的字体
+        try:
+            font = ImageFont.truetype(self.font_name, font_size)
+            # 测试字体是否支持中文
+            try:
+                # 创建一个临时的draw对象来测试字体
+                test_img = Image.new('RGBA', (100, 100), (255, 255, 255, 0))
+                test_draw = ImageDraw.Draw(test_img)
+                test_draw.text((0, 0), "测试", font=font)
+            except Exception:
+                print(f"警告: 指定的字体 '{self.font_name}' 可能不支持中文")
+        except IOError:
+            # 字体加载失败，尝试备选中文字体
+            for fallback_font in self.chinese_fonts:
+                try:
+                    font = ImageFont.truetype(fallback_font, font_size)
+                    break
+                except IOError:
+                    continue
+            
+            # 如果所有备选字体都失败，尝试直接指定一些常见的中文字体文件路径
+            # Windows系统常见中文字体路径
+            windows_font_paths = [
+                "C:/Windows/Fonts/simhei.ttf",  # 黑体
+                "C:/Windows/Fonts/msyh.ttc",    # 微软雅黑
+                "C:/Windows/Fonts/simsun.ttc",  # 宋体
+                "C:/Windows/Fonts/simkai.ttf"   # 楷体
+            ]
+            
+            if font is None:
+                for font_path in windows_font_paths:
+                    if os.path.exists(font_path):
+                        try:
+                            font = ImageFont.truetype(font_path, font_size)
+                            break
+                        except IOError:
+                            continue
+            
+            # 如果所有尝试都失败，使用系统默认字体并提示
+            if font is None:
+                try:
+                    # Pillow 10.1+的默认字体可以指定字号
+                    font = ImageFont.load_default(size=font_size)
+                except TypeError:
+                    font = ImageFont.load_default()
+                print(f"警告: 无法加载指定字体 '{self.font_name}' 和所有备选中文字体，使用系统默认字体")
+        
+        return font
+        
+    def _composite(self, img, sprite, position):
+        """把水印图块合成到原图上
+        
+        Args:
+            img: RGB或RGBA原图
+            sprite: RGBA水印图块或PremultipliedSprite
+            position: 水印左上角坐标
+            
+        Returns:
+            Image: 合成后的图像
+        """
+        # 只在水印覆盖的区域内混合，超出原图范围的部分会被裁剪掉
+        return blend_image(img, sprite, position)
+        
     def save_template(self, template_name, template_path):
         """保存水印模板
         
@@ -292,7 +516,10 @@ class Watermark:
         
         template_data = {
             "name": template_name,
+            "watermark_type": self.watermark_type,
             "text": self.text,
+            "image_path": self.image_path,
+            "image_scale": self.image_scale,
             "font_name": self.font_name,
             "font_size": self.font_size,
             "font_bold": self.font_bold,
@@ -300,7 +527,12 @@ class Watermark:
             "color": self.color,
             "opacity": self.opacity,
             "position": self.position,
-            "rotation": self.rotation
+            "margin": self.margin,
+            "size_reference": self.size_reference,
+            "font_scale": self.font_scale,
+            "margin_scale": self.margin_scale,
+            "rotation": self.rotation,
+            "resample": self.resample
         }
         
         with open(template_path, 'w', encoding='utf-8') as f:
@@ -317,16 +549,34 @@ class Watermark:
         try:
             with open(template_path, 'r', encoding='utf-8') as f:
                 template_data = json.load(f)
-                
-            self.text = template_data.get("text", "")
-            self.font_name = template_data.get("font_name", "Arial")
-            self.font_size = template_data.get("font_size", 24)
-            self.font_bold = template_data.get("font_bold", False)
-            self.font_italic = template_data.get("font_italic", False)
-            self.color = tuple(template_data.get("color", (255, 255, 255, 128)))
-            self.opacity = template_data.get("opacity", 50)
-            self.position = template_data.get("position", "center")
-            self.rotation = template_data.get("rotation", 0)
-            
+            self.apply_settings(template_data)
         except Exception as e:
-            raise Exception(f"加载模板时发生错误: {str(e)}")
\ No newline at end of file
+            raise Exception(f"加载模板时发生错误: {str(e)}")
+            
+    def apply_settings(self, template_data):
+        """把模板数据中的设置应用到水印
+        
+        Args:
+            template_data: 模板数据字典
+        """
+        self.text = template_data.get("text", "")
+        self.font_name = template_data.get("font_name", "Arial")
+        self.font_size = template_data.get("font_size", 24)
+        self.font_bold = template_data.get("font_bold", False)
+        self.font_italic = template_data.get("font_italic", False)
+        self.opacity = template_data.get("opacity", 50)
+        color = tuple(template_data.get("color", (255, 255, 255, 128)))
+        # 只保存了RGB的模板(如界面保存的模板)由透明度计算alpha，与set_color一致
+        self.color = color if len(color) == 4 else color[:3] + (int(self.opacity * 2.55),)
+        position = template_data.get("position", "center")
+        self.position = tuple(position) if isinstance(position, list) else position
+        self.margin = template_data.get("margin", DEFAULT_MARGIN)
+        self.size_reference = template_data.get("size_reference")
+        self.font_scale = template_data.get("font_scale", 0.05)
+        self.margin_scale = template_data.get("margin_scale")
+        self.rotation = template_data.get("rotation", 0)
+        self.resample = template_data.get("resample", DEFAULT_RESAMPLE)
+        if template_data.get("watermark_type", "text") == "image":
+            self.set_image(template_data.get("image_path"), template_data.get("image_scale", 1.0))
+        else:
+            self.set_image(None)
\ No newline at end of file
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+命令行入口
+"""
+
+import sys
+import os
+import json
+import signal
+import argparse
+
+# 获取当前文件的绝对路径
+current_file = os.path.abspath(__file__)
+# 获取src目录的绝对路径
+src_dir = os.path.dirname(os.path.dirname(current_file))
+# 将src目录添加到Python路径
+sys.path.append(src_dir)
+
+from core.watermark import Watermark
+from core.batch_processor import BatchProcessor
+from core.folder_watcher import FolderWatcher
+from core.file_handler import FileHandler
+from core.stage_timer import StageTimer
+from core.batch_metrics import BatchMetrics
+from core.memory_tracker import MemoryTracker
+from core.template_store import SqliteTemplateStore
+from core.compiled_template import compile_template
+from core.duplicate_inputs import DUPLICATE_MODES
+from core.text_sprite import RESAMPLE_MODES, DEFAULT_RESAMPLE
+from core.layout import ANCHORS, DEFAULT_MARGIN, SIZE_REFERENCES
+from core.encoder_profiles import (
+    FORMAT_EXTENSIONS, DEFAULT_PRESET, get_preset_names, benchmark_presets
+)
+
+
+def parse_position(value):
+    """解析--position参数
+
+    Args:
+        value: 预设位置名称，或"x,y"形式的坐标；含小数点的0-1数值为相对坐标，
+               整数为绝对坐标
+
+    Returns:
+        str或tuple: 传给Watermark.set_position的位置
+    """
+    if value in ANCHORS:
+        return value
+    parts = value.split(",")
+    if len(parts) != 2:
+        raise argparse.ArgumentTypeError(f"无效的位置: {value}")
+    try:
+        if any("." in part for part in parts):
+            return (float(parts[0]), float(parts[1]))
+        return (int(parts[0]), int(parts[1]))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无效的位置: {value}")
+
+
+def build_watermark(args):
+    """根据命令行参数创建水印对象
+
+    Args:
+        args: argparse解析结果
+
+    Returns:
+        Watermark: 配置好的水印对象
+    """
+    watermark = Watermark()
+    template_data = {}
+    if args.template:
+        with open(args.template, 'r', encoding='utf-8') as f:
+            template_data = json.load(f)
+        try:
+            # 从编译后的模板开始，命令行参数未覆盖设置时第一张图片不必再解析字体和渲染
+            compiled = compile_template(dict(template_data, text=args.text or template_data.get("text", "")))
+            watermark = compiled.watermark
+        except ValueError:
+            # 模板不完整时(如图片水印由--logo指定)从空白水印开始，由下面的参数补全
+            pass
+
+    watermark.set_text(args.text or template_data.get("text", ""))
+    watermark.set_font(
+        template_data.get("font_name", watermark.font_name),
+        args.font_size or template_data.get("font_size", watermark.font_size),
+        template_data.get("font_bold", False),
+        template_data.get("font_italic", False)
+    )
+    color = template_data.get("color", (255, 255, 255))
+    opacity = args.opacity if args.opacity is not None else template_data.get("opacity", 50)
+    watermark.set_color(color[0], color[1], color[2], opacity)
+    position = args.position or template_data.get("position", "center")
+    watermark.set_position(tuple(position) if isinstance(position, list) else position)
+    watermark.set_margin(args.margin if args.margin is not None else template_data.get("margin", DEFAULT_MARGIN))
+    watermark.set_relative_size(
+        args.size_reference or template_data.get("size_reference"),
+        args.font_scale or template_data.get("font_scale", 0.05),
+        args.margin_scale if args.margin_scale is not None else template_data.get("margin_scale")
+    )
+    watermark.set_rotation(template_data.get("rotation", 0))
+    watermark.set_resample(args.resample or template_data.get("resample", DEFAULT_RESAMPLE))
+    watermark.set_encoder_preset(args.preset)
+
+    # 命令行的--logo优先，其次是模板中的图片水印
+    image_path = args.logo
+    if not image_path and not args.text and template_data.get("watermark_type") == "image":
+        image_path = template_data.get("image_path")
+    if image_path:
+        watermark.set_image(image_path, args.logo_scale or template_data.get("image_scale", 1.0))
+    else:
+        watermark.set_image(None)
+    if watermark.watermark_type == "text" and not watermark.text:
+        raise ValueError("水印内容不能为空，请使用--text、--logo或--template指定")
+    return watermark
+
+
+def get_output_path(input_path, args):
+    """根据命名规则和输出格式生成输出文件路径
+
+    Args:
+        input_path: 输入文件路径
+        args: argparse解析结果
+
+    Returns:
+        str: 输出文件路径
+    """
+    base_name = os.path.basename(input_path)
+    name_without_ext = os.path.splitext(base_name)[0]
+    if args.naming_rule == "prefix":
+        name_without_ext = f"{args.prefix}{name_without_ext}"
+    elif args.naming_rule == "suffix":
+        name_without_ext = f"{name_without_ext}{args.suffix}"
+
+    # 递归模式下保留相对于输入文件夹的子目录结构
+    relative_dir = os.path.relpath(os.path.dirname(os.path.abspath(input_path)), os.path.abspath(args.input))
+    output_folder = args.output if relative_dir == "." else os.path.join(args.output, relative_dir)
+    return os.path.join(output_folder, name_without_ext + FORMAT_EXTENSIONS[args.format])
+
+
+def run_watch(args):
+    """监视文件夹并为新到达的图片添加水印"""
+    input_folder = os.path.abspath(args.input)
+    output_folder = os.path.abspath(args.output)
+    if os.path.normcase(input_folder) == os.path.normcase(output_folder):
+        print("输出文件夹不能与监视文件夹相同")
+        return 2
+
+    watermark = build_watermark(args)
+    memory_tracker = None
+    if args.memory or args.tracemalloc:
+        memory_tracker = MemoryTracker(trace_python=args.tracemalloc)
+        memory_tracker.start()
+    # 按阶段统计内存和写入指标文件中的阶段耗时需要阶段计时器处于启用状态
+    timer = StageTimer(enabled=bool(args.timings or memory_tracker is not None or args.metrics_file),
+                       memory_tracker=memory_tracker)
+    watermark.set_stage_timer(timer)
+    metrics = None
+    if args.metrics_log or args.metrics_file:
+        metrics = BatchMetrics(
+            jsonl_path=args.metrics_log,
+            prometheus_path=args.metrics_file,
+            write_interval=args.metrics_interval,
+            workers=args.workers or os.cpu_count() or 1,
+            stage_timer=timer
+        )
+    processor = BatchProcessor(watermark, max_workers=args.workers, metrics=metrics,
+                               memory_tracker=memory_tracker, dedupe=args.dedupe)
+    processor.start()
+
+    def on_batch(paths):
+        jobs = [(path, get_output_path(path, args)) for path in paths]
+        # 每个批次单独统计阶段耗时
+        timer.reset()
+        if memory_tracker is not None:
+            memory_tracker.reset()
+        # 处理前只读文件头检查水印是否超出图片范围
+        for entry in watermark.plan_batch(paths):
+            if entry["overflow"]:
+                print(f"[警告] {os.path.basename(entry['path'])}: 水印超出图片范围，超出部分会被裁剪")
+        for result in processor.run_batch(jobs):
+            name = os.path.basename(result["input"])
+            if result["success"] and result.get("duplicate_of"):
+                print(f"[完成] {name} (与 {os.path.basename(result['duplicate_of'])} 相同，已复用其输出)")
+            elif result["success"]:
+                print(f"[完成] {name} ({result['elapsed'] * 1000:.0f} ms)")
+            else:
+                print(f"[失败] {name}: {result['error']}")
+        if args.timings:
+            print(timer.format_summary())
+        if memory_tracker is not None:
+            print(memory_tracker.format_report())
+        if metrics is not None:
+            # 每个批次结束后更新一次指标文件
+            metrics.write_prometheus()
+        sys.stdout.flush()
+
+    watcher = FolderWatcher(
+        input_folder,
+        on_batch,
+        recursive=args.recursive,
+        poll_interval=args.poll_interval,
+        settle_time=args.settle,
+        debounce=args.debounce,
+        max_batch_size=args.batch_size,
+        exclude_folders=[output_folder],
+        use_inotify=not args.poll
+    )
+
+    def handle_signal(signum, frame):
+        watcher.stop()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_signal)
+
+    print(f"正在监视 {input_folder}，输出到 {output_folder}（按Ctrl+C停止）")
+    try:
+        watcher.run(process_existing=args.process_existing)
+    finally:
+        processor.shutdown()
+        if memory_tracker is not None:
+            memory_tracker.stop()
+        if metrics is not None:
+            metrics.close()
+    return 0
+
+
+def run_bench_encoders(args):
+    """测量各编码预设的编码耗时和文件大小"""
+    file_handler = FileHandler()
+    image_paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            image_paths.extend(file_handler.iter_files_in_folder(path, recursive=args.recursive))
+        else:
+            image_paths.append(path)
+    image_paths.sort()
+
+    if args.sample and len(image_paths) > args.sample:
+        # 均匀抽样，保证结果可重复
+        step = len(image_paths) / args.sample
+        image_paths = [image_paths[int(i * step)] for i in range(args.sample)]
+    if not image_paths:
+        print("没有找到样本图片")
+        return 1
+
+    print(f"样本图片: {len(image_paths)} 张")
+    results = benchmark_presets(image_paths, args.formats, args.presets, args.repeat)
+
+    print(f"{'格式':<6}{'预设':<10}{'平均编码(ms)':>14}{'平均大小(KB)':>14}{'相对大小':>10}")
+    for fmt in args.formats or FORMAT_EXTENSIONS.keys():
+        rows = [row for row in results if row["format"] == fmt and row["images"]]
+        reference = next((row for row in rows if row["preset"] == DEFAULT_PRESET), rows[0] if rows else None)
+        for row in rows:
+            avg_time = row["encode_time"] / row["images"] * 1000
+            avg_size = row["bytes"] / row["images"] / 1024
+            ratio = row["bytes"] / reference["bytes"] if reference["bytes"] else 0
+            print(f"{fmt:<6}{row['preset']:<10}{avg_time:>14.1f}{avg_size:>14.1f}{ratio:>10.2f}")
+    return 0
+
+
+def run_templates(args):
+    """管理模板数据库：从JSON模板文件夹导入、导出为JSON文件或列出模板"""
+    with SqliteTemplateStore(args.db) as store:
+        if args.action in ("import", "export") and not args.folder:
+            print("请指定模板文件夹")
+            return 1
+        if args.action == "import":
+            names = store.import_folder(args.folder, overwrite=not args.keep_existing)
+            print(f"已导入 {len(names)} 个模板，数据库中共 {len(store)} 个模板")
+        elif args.action == "export":
+            names = store.export_folder(args.folder)
+            print(f"已导出 {len(names)} 个模板到 {args.folder}")
+        else:
+            for name in store.search(args.search, args.tag):
+                tags = store.get_tags(name)
+                print(f"{name}  [{', '.join(tags)}]" if tags else name)
+    return 0
+
+
+def add_watermark_arguments(parser):
+    """添加水印相关的公共参数"""
+    parser.add_argument("--template", help="水印模板JSON文件")
+    parser.add_argument("--text", help="水印文本，优先于模板中的设置")
+    parser.add_argument("--font-size", type=int, help="字体大小")
+    parser.add_argument("--logo", help="图片水印路径，如带透明通道的PNG标志，指定后使用图片水印代替文本")
+    parser.add_argument("--logo-scale", type=float, help="图片水印相对原始尺寸的缩放比例，默认1.0")
+    parser.add_argument("--opacity", type=int, help="透明度(0-100)")
+    parser.add_argument("--position", type=parse_position,
+                        help="水印位置：预设位置如center、bottom_right，相对坐标如0.25,0.75，或绝对坐标如100,50")
+    parser.add_argument("--margin", type=int, help=f"预设位置与图片边缘的距离(像素)，默认{DEFAULT_MARGIN}")
+    parser.add_argument("--size-reference", choices=list(SIZE_REFERENCES),
+                        help="按图片宽度(width)或短边(short_side)的比例设置字号或图片水印宽度，不指定时使用像素尺寸")
+    parser.add_argument("--font-scale", type=float, help="字号或图片水印宽度占参照长度的比例，如0.05")
+    parser.add_argument("--margin-scale", type=float, help="边距占参照长度的比例，如0.02")
+    parser.add_argument("--resample", choices=list(RESAMPLE_MODES),
+                        help="旋转水印时的重采样方式：bicubic较快，supersample边缘更平滑")
+    parser.add_argument("--format", choices=list(FORMAT_EXTENSIONS), default="PNG", help="输出格式")
+    parser.add_argument("--preset", choices=get_preset_names(), default=DEFAULT_PRESET, help="编码预设")
+    parser.add_argument("--naming-rule", choices=["original", "prefix", "suffix"], default="original",
+                        help="命名规则")
+    parser.add_argument("--prefix", default="wm_", help="自定义前缀")
+    parser.add_argument("--suffix", default="_watermarked", help="自定义后缀")
+    parser.add_argument("--workers", type=int, default=None, help="工作线程数")
+    parser.add_argument("--dedupe", choices=list(DUPLICATE_MODES),
+                        help="内容相同的输入图片(重复上传、副本、硬链接)只处理一次，其余输出用硬链接(link)或复制(copy)生成")
+    parser.add_argument("--timings", action="store_true", help="每个批次结束后输出各阶段耗时(p50/p95/最大)")
+    parser.add_argument("--memory", action="store_true", help="每个批次结束后输出峰值内存和内存占用最多的图片")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="调试用：启用tracemalloc，报告中附带Python内存分配最多的代码位置")
+    parser.add_argument("--metrics-log", help="把每张图片的处理结果追加到JSON Lines文件")
+    parser.add_argument("--metrics-file", help="定期写入Prometheus文本格式的指标文件")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="指标文件的更新间隔(秒)")
+
+
+def create_parser():
+    """创建命令行解析器"""
+    parser = argparse.ArgumentParser(prog="photo-watermark-cli", description="Photo-Watermark-2 命令行工具")
+    subparsers = parser.add_subparsers(dest="command")
+
+    watch_parser = subparsers.add_parser("watch", help="监视文件夹并自动添加水印")
+    watch_parser.add_argument("input", help="监视的文件夹")
+    watch_parser.add_argument("output", help="输出文件夹")
+    add_watermark_arguments(watch_parser)
+    watch_parser.add_argument("--recursive", action="store_true", help="同时监视子文件夹")
+    watch_parser.add_argument("--poll", action="store_true", help="强制使用轮询而不是inotify")
+    watch_parser.add_argument("--poll-interval", type=float, default=1.0, help="轮询间隔(秒)")
+    watch_parser.add_argument("--settle", type=float, default=2.0, help="文件保持不变多久视为写入完成(秒)")
+    watch_parser.add_argument("--debounce", type=float, default=0.5, help="批次合并等待时间(秒)")
+    watch_parser.add_argument("--batch-size", type=int, default=32, help="单个批次的最大文件数")
+    watch_parser.add_argument("--process-existing", action="store_true", help="启动时处理已存在的图片")
+    watch_parser.set_defaults(func=run_watch)
+
+    bench_parser = subparsers.add_parser("bench-encoders", help="比较各编码预设的耗时和文件大小")
+    bench_parser.add_argument("paths", nargs="+", help="样本图片或文件夹")
+    bench_parser.add_argument("--recursive", action="store_true", help="递归搜索子文件夹")
+    bench_parser.add_argument("--sample", type=int, default=20, help="最多抽取的样本图片数，0表示全部")
+    bench_parser.add_argument("--formats", nargs="+", choices=list(FORMAT_EXTENSIONS), help="输出格式")
+    bench_parser.add_argument("--presets", nargs="+", choices=get_preset_names(), help="编码预设")
+    bench_parser.add_argument("--repeat", type=int, default=1, help="每个组合重复编码次数，取最短耗时")
+    bench_parser.set_defaults(func=run_bench_encoders)
+
+    templates_parser = subparsers.add_parser("templates", help="管理SQLite模板数据库")
+    templates_parser.add_argument("db", help="模板数据库文件")
+    templates_parser.add_argument("action", choices=["import", "export", "list"],
+                                  help="import从JSON模板文件夹导入，export导出为JSON文件，list列出模板")
+    templates_parser.add_argument("folder", nargs="?", help="JSON模板文件夹")
+    templates_parser.add_argument("--keep-existing", action="store_true", help="导入时不覆盖数据库中的同名模板")
+    templates_parser.add_argument("--search", help="列出名称包含该文本的模板")
+    templates_parser.add_argument("--tag", help="列出带有该标签的模板")
+    templates_parser.set_defaults(func=run_templates)
+
+    return parser
+
+
+def main(argv=None):
+    """主函数"""
+    parser = create_parser()
+    args = parser.parse_args(argv)
+    if not getattr(args, "func", None):
+        parser.print_help()
+        return 1
+    try:
+        return args.func(args)
+    except Exception as e:
+        print(f"错误: {str(e)}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,27 +16,54 @@ src_dir = os.path.dirname(os.path.dirname(current_file))
 # 将src目录添加到Python路径
 sys.path.append(src_dir)
 
-from PyQt5.QtWidgets import QApplication
-from ui.main_window import MainWindow
+from core.startup_profiler import StartupProfiler
 
 
 def main():
-    """主函数"""
+    """主函数
+    
+    命令行参数--profile-startup会在窗口显示并完成延迟初始化后输出各模块的导入耗时和各初始化阶段的耗时。
+    """
+    profile = "--profile-startup" in sys.argv
+    if profile:
+        sys.argv.remove("--profile-startup")
+    profiler = StartupProfiler(enabled=profile)
+    profiler.install()
+    
+    # 界面模块在这里才导入，以便分析导入耗时
+    with profiler.phase("导入界面模块"):
+        from PyQt5.QtWidgets import QApplication
+        from ui.main_window import MainWindow
+    
     # 设置中文字体支持
     os.environ['QT_FONT_DPI'] = '96'
     
     # 创建应用程序实例
-    app = QApplication(sys.argv)
-    app.setApplicationName("Photo-Watermark-2")
-    app.setApplicationVersion("1.0.0")
+    with profiler.phase("创建QApplication"):
+        app = QApplication(sys.argv)
+        app.setApplicationName("Photo-Watermark-2")
+        app.setApplicationVersion("1.0.0")
     
     # 创建主窗口
-    window = MainWindow()
-    window.show()
+    with profiler.phase("创建主窗口"):
+        window = MainWindow()
+    with profiler.phase("显示主窗口"):
+        window.show()
+        # 先处理显示和绘制事件，窗口出现后再进行模板加载等延迟初始化
+        app.processEvents()
+    profiler.mark("首个窗口")
+    
+    window.run_deferred_init(profiler)
+    if profile:
+        # 等待后台预热完成，报告中包含全部延迟初始化的耗时
+        window.wait_deferred_init()
+        profiler.mark("延迟初始化完成")
+        profiler.uninstall()
+        print(profiler.format_report())
     
     # 运行应用程序
     sys.exit(app.exec_())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
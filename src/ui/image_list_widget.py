@@ -53,15 +53,6 @@ class ImageListWidget(QListWidget):
         if not os.path.exists(file_path):
             return False
             
-        # 创建列表项
-        item = QListWidgetItem()
-        
-        # 设置项目数据
-        item.setData(Qt.UserRole, file_path)
-        
-        # 获取文件名
-        file_name = os.path.basename(file_path)
-        
         # 创建缩略图
         try:
             image_processor = ImageProcessor()
@@ -76,16 +67,7 @@ class ImageListWidget(QListWidget):
                 qimage = QImage.fromData(img_byte_arr.read())
                 thumbnail = QPixmap.fromImage(qimage)
                 
-                # 创建自定义列表项
-                custom_widget = self._create_custom_item_widget(file_name, thumbnail)
-                
-                # 设置项目大小
-                item.setSizeHint(custom_widget.sizeHint())
-                
-                # 添加到列表
-                self.addItem(item)
-                self.setItemWidget(item, custom_widget)
-                
+                self.add_image_item(file_path, thumbnail)
                 return True
             else:
                 return False
@@ -93,6 +75,39 @@ class ImageListWidget(QListWidget):
             print(f"创建缩略图失败: {str(e)}")
             return False
             
+    def add_image_item(self, file_path, thumbnail, info=None):
+        """使用已生成的缩略图添加列表项
+        
+        Args:
+            file_path: 图片文件路径
+            thumbnail: 缩略图QPixmap或QImage对象
+            info: 可选的文件头信息字典，包含width、height和format时显示在提示中
+        """
+        if isinstance(thumbnail, QImage):
+            thumbnail = QPixmap.fromImage(thumbnail)
+            
+        # 创建列表项
+        item = QListWidgetItem()
+        
+        # 设置项目数据
+        item.setData(Qt.UserRole, file_path)
+        
+        # 创建自定义列表项
+        custom_widget = self._create_custom_item_widget(os.path.basename(file_path), thumbnail)
+        
+        # 有文件头信息时在提示中显示尺寸和格式
+        if info and info.get("width") and info.get("height"):
+            tooltip = f"{file_path}\n{info['width']} × {info['height']} {info.get('format') or ''}".rstrip()
+            item.setToolTip(tooltip)
+            custom_widget.setToolTip(tooltip)
+        
+        # 设置项目大小
+        item.setSizeHint(custom_widget.sizeHint())
+        
+        # 添加到列表
+        self.addItem(item)
+        self.setItemWidget(item, custom_widget)
+        
     def _create_custom_item_widget(self, file_name, thumbnail):
         """创建自定义列表项小部件
         
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+后台导入线程
+"""
+
+import time
+from PyQt5.QtCore import QThread, QBuffer, QByteArray, QIODevice, pyqtSignal
+from PyQt5.QtGui import QImage
+
+from core.image_processor import ImageProcessor
+from core.session_store import file_stamp
+
+
+class ImageImportWorker(QThread):
+    """后台导入线程，逐块产出图片路径及其缩略图
+
+    路径来源可以是文件列表，也可以是FileHandler.iter_files_in_folder返回的生成器，
+    因此大文件夹在列举完成之前就能开始显示。提供缩略图缓存时，修改时间和大小
+    未变化的图片直接使用缓存的缩略图和文件头信息，不再解码原图。
+    """
+
+    # 一块导入结果，元素为(图片路径, 缩略图QImage, 文件头信息字典)元组
+    chunk_ready = pyqtSignal(list)
+    # 导入结束，参数为导入的图片总数
+    import_finished = pyqtSignal(int)
+
+    def __init__(self, path_source, thumbnail_size=(80, 80), chunk_size=32, chunk_interval=0.1,
+                 thumbnail_cache=None, parent=None):
+        """初始化导入线程
+
+        Args:
+            path_source: 图片路径的可迭代对象
+            thumbnail_size: 缩略图最大尺寸
+            chunk_size: 每块最多包含的图片数
+            chunk_interval: 两次提交之间的最长间隔(秒)
+            thumbnail_cache: 可选的ThumbnailCache对象
+            parent: 父对象
+        """
+        super().__init__(parent)
+        self.path_source = path_source
+        self.thumbnail_size = thumbnail_size
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self.thumbnail_cache = thumbnail_cache
+        self.image_processor = ImageProcessor()
+        self._cancelled = False
+        # 等待写入缓存的新缩略图和命中缓存的路径，每提交一块写入一次
+        self._pending_puts = []
+        self._pending_hits = []
+
+    def cancel(self):
+        """请求取消导入"""
+        self._cancelled = True
+
+    def is_cancelled(self):
+        """是否已请求取消"""
+        return self._cancelled
+
+    def run(self):
+        """线程主函数"""
+        chunk = []
+        total = 0
+        # 初始值保证第一张图片生成缩略图后立即提交，界面可以尽快显示预览
+        last_emit = 0.0
+        for file_path in self.path_source:
+            if self._cancelled:
+                break
+            if not self.image_processor.is_supported_format(file_path):
+                continue
+
+            result = self._load_thumbnail(file_path)
+            if result is None:
+                continue
+            chunk.append((file_path,) + result)
+            total += 1
+
+            now = time.monotonic()
+            if len(chunk) >= self.chunk_size or now - last_emit >= self.chunk_interval:
+                self.chunk_ready.emit(chunk)
+                self._flush_cache()
+                chunk = []
+                last_emit = now
+
+        if chunk and not self._cancelled:
+            self.chunk_ready.emit(chunk)
+        self._flush_cache()
+        self.import_finished.emit(total)
+
+    def _load_thumbnail(self, file_path):
+        """获取缩略图和文件头信息，优先使用缓存
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            tuple: (缩略图QImage, 文件头信息字典)，文件不存在或生成失败返回None
+        """
+        stamp = file_stamp(file_path)
+        if stamp is None:
+            return None
+        max_size = max(self.thumbnail_size)
+
+        if self.thumbnail_cache is not None:
+            cached = self.thumbnail_cache.get(file_path, stamp, max_size)
+            if cached is not None:
+                thumbnail = QImage.fromData(cached[1])
+                if not thumbnail.isNull():
+                    self._pending_hits.append(file_path)
+                    return thumbnail, cached[0]
+
+        thumbnail = self._create_thumbnail(file_path)
+        if thumbnail is None:
+            return None
+        info = self.image_processor.probe_image(file_path) or {}
+        info.pop('path', None)
+        info['mtime_ns'], info['size'] = stamp
+        if self.thumbnail_cache is not None:
+            data = _encode_png(thumbnail)
+            if data:
+                self._pending_puts.append((file_path, stamp, max_size, info, data))
+        return thumbnail, info
+
+    def _flush_cache(self):
+        """把新生成的缩略图写入缓存"""
+        if self.thumbnail_cache is None:
+            return
+        try:
+            self.thumbnail_cache.put_many(self._pending_puts)
+            self.thumbnail_cache.touch(self._pending_hits)
+        except Exception as e:
+            print(f"写入缩略图缓存失败: {str(e)}")
+        self._pending_puts = []
+        self._pending_hits = []
+
+    def _create_thumbnail(self, file_path):
+        """生成缩略图QImage
+
+        QPixmap只能在主线程中创建，这里返回线程安全的QImage。
+
+        Args:
+            file_path: 图片文件路径
+
+        Returns:
+            QImage: 缩略图，生成失败返回None
+        """
+        pil_thumbnail = self.image_processor.create_thumbnail(file_path, *self.thumbnail_size)
+        if pil_thumbnail is None:
+            print(f"创建缩略图失败: {file_path}")
+            return None
+        try:
+            pil_thumbnail = pil_thumbnail.convert('RGBA')
+            width, height = pil_thumbnail.size
+            qimage = QImage(
+                pil_thumbnail.tobytes('raw', 'RGBA'), width, height, 4 * width, QImage.Format_RGBA8888
+            )
+            # 复制一份，使QImage拥有自己的像素缓冲区
+            return qimage.copy()
+        except Exception as e:
+            print(f"创建缩略图失败: {str(e)}")
+            return None
+
+
+def _encode_png(image):
+    """把QImage编码为PNG字节串，失败时返回None"""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, "PNG"):
+        return None
+    return bytes(data)
@@ -8,6 +8,8 @@ Photo-Watermark-2 - 图片水印工具
 
 import sys
 import os
+import time
+import threading
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QSplitter, QLabel,
     QPushButton, QLineEdit, QComboBox, QSlider, QGroupBox, QGridLayout,
@@ -17,10 +19,14 @@ from PyQt5.QtWidgets import (
 from PyQt5.QtGui import QPixmap, QImage, QPainter, QColor, QFont, QPen
 from PyQt5.QtCore import Qt, QSize, QPoint, QRect
 
+# 以下模块在导入时不加载Pillow，水印渲染、会话和缩略图缓存相关的模块在首次使用时才导入
 from core.image_processor import ImageProcessor
-from core.watermark import Watermark
 from core.file_handler import FileHandler
-from core.template_manager import TemplateManager
+from core.encoder_profiles import FORMAT_EXTENSIONS, PRESET_LABELS, DEFAULT_PRESET, get_preset_names
+from core.stage_timer import StageTimer
+from core.text_sprite import RESAMPLE_MODES, DEFAULT_RESAMPLE
+from core.layout import DEFAULT_MARGIN, SIZE_REFERENCES
+from utils.config_manager import ConfigManager
 from ui.preview_widget import PreviewWidget
 from ui.image_list_widget import ImageListWidget
 
@@ -34,9 +40,27 @@ class MainWindow(QMainWindow):
         
         # 初始化核心组件
         self.image_processor = ImageProcessor()
-        self.watermark = Watermark()
+        # 水印对象会导入整个渲染模块，在首次使用或窗口显示后才创建，见watermark属性
+        self._watermark = None
         self.file_handler = FileHandler(self)
-        self.template_manager = TemplateManager(self)
+        self.config_manager = ConfigManager()
+        # 模板管理器会创建模板文件夹、打开模板数据库，在窗口显示后由run_deferred_init()创建
+        self.template_manager = None
+        self.warm_up_thread = None
+        
+        # 后台导入状态
+        self.import_worker = None
+        self.import_progress = None
+        self.import_source_folder = None
+        self.import_count = 0
+        
+        # 会话恢复状态：会话文件和缩略图缓存在窗口显示后打开；恢复期间记录尚未加载的会话图片和上次选中的图片
+        self.session_store = None
+        self.thumbnail_cache = None
+        self.image_info = {}
+        self.restore_pending_paths = []
+        self.restore_current_path = None
+        self.restore_worker = None
         
         # 设置窗口属性
         self.setWindowTitle("Photo-Watermark-2")
@@ -50,6 +74,79 @@ class MainWindow(QMainWindow):
         
         # 加载上次的设置
         self.load_settings()
+
+        
+    @property
+    def watermark(self):
+        """水印对象，第一次访问时才导入水印渲染模块并创建"""
+        if self._watermark is None:
+            from core.watermark import Watermark
+            self._watermark = Watermark()
+        return self._watermark
+        
+    def run_deferred_init(self, profiler=None):
+        """窗口首次显示后进行的初始化
+        
+        创建模板管理器并加载模板列表；字体查找和NumPy导入在后台线程中预热，
+        第一次预览和导出时不必再等待，已删除的最近文件也在后台线程中清理。
+        
+        Args:
+            profiler: 可选的StartupProfiler对象，用于记录各阶段耗时
+        """
+        if self.template_manager is not None:
+            return
+        if profiler is None:
+            from core.startup_profiler import StartupProfiler
+            profiler = StartupProfiler(enabled=False)
+        
+        # 访问watermark属性即导入渲染模块并创建水印对象；在主线程中创建，
+        # 后台预热线程和之后的预览都使用同一个对象
+        with profiler.phase("创建水印"):
+            self.watermark
+        
+        with profiler.phase("加载模板"):
+            from core.template_manager import TemplateManager
+            self.template_manager = TemplateManager(self)
+            # 配置了模板数据库时改用SQLite保存模板，首次使用时导入已有的JSON模板
+            template_db = self.config_manager.load_setting("template_db")
+            if template_db:
+                self.template_manager.use_database(template_db)
+            self.update_template_list()
+        
+        with profiler.phase("打开会话和缩略图缓存"):
+            from core.session_store import SessionStore, ThumbnailCache
+            self.session_store = SessionStore()
+            try:
+                self.thumbnail_cache = ThumbnailCache()
+            except Exception as e:
+                print(f"无法打开缩略图缓存: {str(e)}")
+        
+        if self.config_manager.load_setting("restore_session"):
+            with profiler.phase("恢复会话"):
+                self.restore_session()
+        
+        self.warm_up_thread = threading.Thread(
+            target=self._warm_up, args=(profiler,), name="warm-up", daemon=True
+        )
+        self.warm_up_thread.start()
+        
+    def wait_deferred_init(self):
+        """等待后台预热完成"""
+        if self.warm_up_thread is not None:
+            self.warm_up_thread.join()
+        
+    def _warm_up(self, profiler):
+        """后台预热：解析默认字体，导入混合内核使用的NumPy，清理已删除的最近文件"""
+        try:
+            with profiler.phase("预热字体(后台)"):
+                self.watermark._load_font()
+            with profiler.phase("导入NumPy(后台)"):
+                from core.blend import is_numpy_available
+                is_numpy_available()
+            with profiler.phase("清理最近文件(后台)"):
+                self.config_manager.prune_recent_files()
+        except Exception as e:
+            print(f"后台预热失败: {str(e)}")
         
     def setup_ui(self):
         """设置用户界面"""
@@ -127,6 +224,20 @@ class MainWindow(QMainWindow):
         self.watermark_text_edit.setPlaceholderText("输入水印文本")
         text_layout.addWidget(self.watermark_text_edit)
         
+        # 图片水印，选择后代替文本水印
+        logo_layout = QHBoxLayout()
+        self.logo_path = None
+        self.logo_label = QLabel("未选择图片水印")
+        self.logo_button = QPushButton("选择图片水印")
+        self.clear_logo_button = QPushButton("清除")
+        
+        logo_layout.addWidget(self.logo_label)
+        logo_layout.addWidget(self.logo_button)
+        logo_layout.addWidget(self.clear_logo_button)
+        logo_layout.addStretch()
+        
+        text_layout.addLayout(logo_layout)
+        
         # 字体设置
         font_layout = QHBoxLayout()
         
@@ -146,6 +257,41 @@ class MainWindow(QMainWindow):
         
         text_layout.addLayout(font_layout)
         
+        # 按图片尺寸的比例设置字号，混合尺寸的批次中水印大小保持一致
+        scale_layout = QHBoxLayout()
+        self.size_reference_combobox = QComboBox()
+        self.size_reference_combobox.addItem("固定字号", None)
+        for reference, label in SIZE_REFERENCES.items():
+            self.size_reference_combobox.addItem(f"按{label}比例", reference)
+        self.font_scale_spinbox = QDoubleSpinBox()
+        self.font_scale_spinbox.setRange(0.5, 50.0)
+        self.font_scale_spinbox.setSingleStep(0.5)
+        self.font_scale_spinbox.setValue(5.0)
+        self.font_scale_spinbox.setSuffix("%")
+        self.font_scale_spinbox.setEnabled(False)
+        
+        # 预设位置与图片边缘的距离；按比例设置字号时边距也可以按比例设置，为0时使用像素边距
+        self.margin_label = QLabel("边距")
+        self.margin_spinbox = QSpinBox()
+        self.margin_spinbox.setRange(0, 1000)
+        self.margin_spinbox.setValue(DEFAULT_MARGIN)
+        self.margin_spinbox.setSuffix(" px")
+        self.margin_scale_spinbox = QDoubleSpinBox()
+        self.margin_scale_spinbox.setRange(0.0, 25.0)
+        self.margin_scale_spinbox.setSingleStep(0.5)
+        self.margin_scale_spinbox.setSuffix("%")
+        self.margin_scale_spinbox.setSpecialValueText("像素边距")
+        self.margin_scale_spinbox.setEnabled(False)
+        
+        scale_layout.addWidget(self.size_reference_combobox)
+        scale_layout.addWidget(self.font_scale_spinbox)
+        scale_layout.addWidget(self.margin_label)
+        scale_layout.addWidget(self.margin_spinbox)
+        scale_layout.addWidget(self.margin_scale_spinbox)
+        scale_layout.addStretch()
+        
+        text_layout.addLayout(scale_layout)
+        
         # 样式设置
         style_layout = QHBoxLayout()
         
@@ -226,6 +372,13 @@ class MainWindow(QMainWindow):
         rotation_layout.addWidget(self.rotation_slider)
         rotation_layout.addWidget(self.rotation_label)
         
+        # 旋转时的重采样方式
+        self.resample_combobox = QComboBox()
+        for resample, label in RESAMPLE_MODES.items():
+            self.resample_combobox.addItem(label, resample)
+        self.resample_combobox.setCurrentIndex(self.resample_combobox.findData(DEFAULT_RESAMPLE))
+        rotation_layout.addWidget(self.resample_combobox)
+        
         position_layout.addLayout(preset_position_layout)
         position_layout.addLayout(rotation_layout)
         
@@ -255,10 +408,19 @@ class MainWindow(QMainWindow):
         
         format_label = QLabel("输出格式:")
         self.format_combobox = QComboBox()
-        self.format_combobox.addItems(["PNG", "JPEG"])
+        self.format_combobox.addItems(list(FORMAT_EXTENSIONS.keys()))
+        
+        # 编码预设设置
+        preset_label = QLabel("编码预设:")
+        self.preset_combobox = QComboBox()
+        for preset in get_preset_names():
+            self.preset_combobox.addItem(PRESET_LABELS.get(preset, preset), preset)
+        self.preset_combobox.setCurrentIndex(self.preset_combobox.findData(DEFAULT_PRESET))
         
         format_layout.addWidget(format_label)
         format_layout.addWidget(self.format_combobox)
+        format_layout.addWidget(preset_label)
+        format_layout.addWidget(self.preset_combobox)
         format_layout.addStretch()
         
         # 命名规则设置
@@ -332,12 +494,19 @@ class MainWindow(QMainWindow):
         # 水印设置信号
         self.watermark_text_edit.textChanged.connect(self.on_watermark_text_changed)
         self.font_button.clicked.connect(self.on_font_button_clicked)
+        self.logo_button.clicked.connect(self.on_logo_button_clicked)
+        self.clear_logo_button.clicked.connect(self.on_clear_logo_button_clicked)
         self.font_size_spinbox.valueChanged.connect(self.on_font_size_changed)
+        self.size_reference_combobox.currentIndexChanged.connect(self.on_size_reference_changed)
+        self.font_scale_spinbox.valueChanged.connect(self.on_font_size_changed)
+        self.margin_spinbox.valueChanged.connect(self.on_font_size_changed)
+        self.margin_scale_spinbox.valueChanged.connect(self.on_font_size_changed)
         self.bold_checkbox.stateChanged.connect(self.on_font_style_changed)
         self.italic_checkbox.stateChanged.connect(self.on_font_style_changed)
         self.color_button.clicked.connect(self.on_color_button_clicked)
         self.opacity_slider.valueChanged.connect(self.on_opacity_changed)
         self.rotation_slider.valueChanged.connect(self.on_rotation_changed)
+        self.resample_combobox.currentIndexChanged.connect(self.on_resample_changed)
         
         # 位置按钮信号
         for position, button in self.position_buttons.items():
@@ -368,25 +537,177 @@ class MainWindow(QMainWindow):
         """导入文件夹按钮点击事件"""
         folder_path = self.file_handler.select_folder()
         if folder_path:
-            file_paths = self.file_handler.get_files_in_folder(folder_path)
-            if file_paths:
-                self.load_images(file_paths)
-            else:
-                QMessageBox.information(self, "提示", "所选文件夹中没有支持的图片文件")
+            # 在后台线程中边列举边导入，大文件夹不会阻塞界面
+            self.load_images(self.file_handler.iter_files_in_folder(folder_path), folder_path)
                 
-    def load_images(self, file_paths):
-        """加载图片到图片列表"""
-        for file_path in file_paths:
-            self.image_processor.load_image(file_path)
-            self.image_list_widget.add_image(file_path)
+    def load_images(self, file_paths, source_folder=None):
+        """加载图片到图片列表
+        
+        图片在后台线程中逐块生成缩略图，每块到达后立即加入列表，
+        第一张图片到达后即可预览。
+        
+        Args:
+            file_paths: 图片路径的可迭代对象
+            source_folder: 来源文件夹，用于没有找到图片时提示
+        """
+        # 同一时间只运行一个导入任务
+        self.cancel_import()
+        
+        self.import_source_folder = source_folder
+        self.import_count = 0
+        from ui.import_worker import ImageImportWorker
+        self.import_worker = ImageImportWorker(
+            file_paths, thumbnail_size=(80, 80), thumbnail_cache=self.thumbnail_cache, parent=self
+        )
+        self.import_worker.chunk_ready.connect(self.on_import_chunk_ready)
+        self.import_worker.import_finished.connect(self.on_import_finished)
+        self.import_worker.finished.connect(self.import_worker.deleteLater)
+        
+        # 总数事先未知，使用忙碌状态的非模态进度对话框
+        self.import_progress = QProgressDialog("正在导入图片...", "取消", 0, 0, self)
+        self.import_progress.setWindowTitle("导入进度")
+        self.import_progress.setWindowModality(Qt.NonModal)
+        self.import_progress.setMinimumDuration(500)
+        self.import_progress.canceled.connect(self.cancel_import)
+        
+        self.import_worker.start()
+        
+    def on_import_chunk_ready(self, chunk):
+        """导入线程产出一块图片
+        
+        Args:
+            chunk: (图片路径, 缩略图QImage, 文件头信息字典)元组列表
+        """
+        if self.import_worker is None or self.import_worker.is_cancelled():
+            return
             
-        # 如果是第一次加载图片，选中第一张
-        if self.image_list_widget.count() > 0 and not self.image_list_widget.currentItem():
+        added_paths = set(self.image_processor.add_image_paths([entry[0] for entry in chunk]))
+        self.image_list_widget.setUpdatesEnabled(False)
+        for file_path, thumbnail, info in chunk:
+            self.image_info[file_path] = info
+            if file_path in added_paths:
+                self.image_list_widget.add_image_item(file_path, thumbnail, info)
+        self.image_list_widget.setUpdatesEnabled(True)
+        
+        self.import_count += len(added_paths)
+        if self.import_progress is not None:
+            self.import_progress.setLabelText(f"正在导入图片... 已导入 {self.import_count} 张")
+        
+        if self.restore_current_path is not None and self.import_worker is self.restore_worker:
+            # 恢复会话时等上次选中的图片到达后再选中，避免先预览第一张
+            if self.restore_current_path in added_paths:
+                self._select_image_path(self.restore_current_path)
+                self.restore_current_path = None
+        elif self.image_list_widget.count() > 0 and not self.image_list_widget.currentItem():
+            # 第一块到达时选中第一张，触发预览
             self.image_list_widget.setCurrentRow(0)
+            
+    def on_import_finished(self, total):
+        """导入线程结束
+        
+        Args:
+            total: 导入线程处理的图片数
+        """
+        worker = self.sender()
+        if worker is not self.import_worker:
+            return
+            
+        self._close_import_progress()
+        self.import_worker = None
+        
+        # 会话恢复完成；上次选中的图片已不存在时选中第一张
+        if worker is self.restore_worker:
+            self.restore_worker = None
+            self.restore_pending_paths = []
+            self.restore_current_path = None
+            if self.image_list_widget.count() > 0 and not self.image_list_widget.currentItem():
+                self.image_list_widget.setCurrentRow(0)
+        
+        if total == 0 and self.import_source_folder and not worker.is_cancelled():
+            QMessageBox.information(self, "提示", "所选文件夹中没有支持的图片文件")
+            
+    def cancel_import(self):
+        """取消正在进行的导入"""
+        worker = self.import_worker
+        if worker is None:
+            return
+            
+        self.import_worker = None
+        worker.cancel()
+        worker.wait()
+        self._close_import_progress()
+        
+    def _close_import_progress(self):
+        """关闭导入进度对话框"""
+        if self.import_progress is not None:
+            # 先断开信号，避免close()触发canceled导致重复取消
+            self.import_progress.canceled.disconnect(self.cancel_import)
+            self.import_progress.close()
+            self.import_progress = None
+            
+    def _select_image_path(self, file_path):
+        """在图片列表中选中指定的图片"""
+        item = self.image_list_widget.find_item_by_path(file_path)
+        if item is not None:
+            self.image_list_widget.setCurrentItem(item)
+            
+    def restore_session(self):
+        """恢复上次的会话
         
-        # 更新预览
-        self.update_preview()
+        水印设置立即应用；图片列表交给后台导入线程逐块恢复，修改时间和大小未变化的
+        图片直接使用缓存的缩略图，已删除的图片被跳过，启动不必等待检查所有文件。
         
+        Returns:
+            bool: 是否找到可恢复的会话
+        """
+        session = self.session_store.load()
+        if session is None:
+            return False
+        
+        if session.get("watermark"):
+            try:
+                self._apply_template_settings(session["watermark"])
+            except Exception as e:
+                print(f"恢复水印设置失败: {str(e)}")
+        
+        images = session.get("images") or []
+        if not images:
+            return True
+        # 检查完成之前先使用会话中的文件头信息
+        for image in images:
+            self.image_info[image["path"]] = image
+        self.restore_pending_paths = [image["path"] for image in images]
+        self.restore_current_path = session.get("current")
+        self.load_images(list(self.restore_pending_paths))
+        self.restore_worker = self.import_worker
+        if self.import_progress is not None:
+            self.import_progress.setLabelText("正在恢复上次的图片...")
+        return True
+        
+    def save_session(self):
+        """保存当前会话，窗口关闭时调用"""
+        # 延迟初始化之前关闭时还没有读取上次的会话，不能用空列表覆盖它
+        if self.session_store is None:
+            return
+        loaded_images = self.image_processor.get_loaded_images()
+        # 恢复中途关闭时保留尚未加载的会话图片
+        loaded_set = set(loaded_images)
+        paths = loaded_images + [path for path in self.restore_pending_paths if path not in loaded_set]
+        
+        images = [dict(self.image_info.get(path) or {}, path=path) for path in paths]
+        current_path = None
+        if self.restore_current_path is not None:
+            current_path = self.restore_current_path
+        elif 0 <= self.image_processor.current_image_index < len(loaded_images):
+            current_path = loaded_images[self.image_processor.current_image_index]
+        
+        try:
+            self.session_store.save(images, current_path, self._collect_template_data())
+            if self.thumbnail_cache is not None:
+                self.thumbnail_cache.prune()
+        except Exception as e:
+            print(f"保存会话失败: {str(e)}")
+            
     def on_image_selected(self):
         """图片列表选择事件"""
         current_item = self.image_list_widget.currentItem()
@@ -407,9 +728,10 @@ class MainWindow(QMainWindow):
             # 获取水印设置
             watermark_text = self.watermark_text_edit.text()
             
-            if watermark_text:
+            if watermark_text or self.logo_path:
                 # 应用水印设置
                 self.watermark.set_text(watermark_text)
+                self.watermark.set_image(self.logo_path)
                 
                 # 设置字体
                 font_name = self.font_name_label.text()
@@ -417,6 +739,7 @@ class MainWindow(QMainWindow):
                 font_bold = self.bold_checkbox.isChecked()
                 font_italic = self.italic_checkbox.isChecked()
                 self.watermark.set_font(font_name, font_size, font_bold, font_italic)
+                self._apply_size_reference()
                 
                 # 设置颜色和透明度
                 opacity = self.opacity_slider.value()
@@ -433,6 +756,7 @@ class MainWindow(QMainWindow):
                 # 设置旋转角度
                 rotation = self.rotation_slider.value()
                 self.watermark.set_rotation(rotation)
+                self.watermark.set_resample(self.resample_combobox.currentData())
                 
                 # 添加水印到预览图片
                 preview_image = self.watermark.add_watermark(
@@ -462,10 +786,45 @@ class MainWindow(QMainWindow):
             self.italic_checkbox.setChecked(font.italic())
             self.update_preview()
             
+    def on_logo_button_clicked(self):
+        """选择图片水印按钮点击事件"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择图片水印", "", "图片文件 (*.png *.webp *.tif *.tiff *.bmp *.jpg *.jpeg)"
+        )
+        if not file_path:
+            return
+        try:
+            self.watermark.set_image(file_path)
+        except Exception as e:
+            QMessageBox.warning(self, "加载失败", f"无法加载图片水印: {str(e)}")
+            return
+        self.logo_path = file_path
+        self.logo_label.setText(os.path.basename(file_path))
+        self.update_preview()
+        
+    def on_clear_logo_button_clicked(self):
+        """清除图片水印按钮点击事件"""
+        self.logo_path = None
+        self.logo_label.setText("未选择图片水印")
+        self.watermark.set_image(None)
+        self.update_preview()
+        
     def on_font_size_changed(self, size):
         """字体大小变化事件"""
         self.update_preview()
         
+    def on_size_reference_changed(self, index):
+        """字号参照变化事件"""
+        self._update_size_controls()
+        self.update_preview()
+        
+    def _update_size_controls(self):
+        """按字号参照启用字号或比例控件"""
+        relative = self.size_reference_combobox.currentData() is not None
+        self.font_scale_spinbox.setEnabled(relative)
+        self.margin_scale_spinbox.setEnabled(relative)
+        self.font_size_spinbox.setEnabled(not relative)
+        
     def on_font_style_changed(self):
         """字体样式变化事件"""
         self.update_preview()
@@ -505,6 +864,10 @@ class MainWindow(QMainWindow):
         self.rotation_label.setText(f"{value}°")
         self.update_preview()
         
+    def on_resample_changed(self, index):
+        """重采样方式变化事件"""
+        self.update_preview()
+        
     def on_position_button_clicked(self, position, checked):
         """位置按钮点击事件"""
         if checked:
@@ -561,46 +924,68 @@ class MainWindow(QMainWindow):
         progress.setWindowModality(Qt.WindowModal)
         progress.setValue(0)
         
-        # 导出图片
+        # 导出图片并统计批量指标；各阶段耗时和峰值内存只在配置开启时统计，
+        # 写Prometheus指标文件时也需要各阶段耗时
+        from core.batch_metrics import BatchMetrics
         success_count = 0
+        profiling = self.config_manager.load_setting("export_profiling")
+        metrics_file = self.config_manager.load_setting("metrics_file") or None
+        memory_tracker = None
+        if profiling:
+            from core.memory_tracker import MemoryTracker
+            memory_tracker = MemoryTracker()
+            memory_tracker.start()
+        stage_timer = StageTimer(enabled=bool(profiling or metrics_file), memory_tracker=memory_tracker)
+        self.watermark.set_stage_timer(stage_timer)
+        metrics = BatchMetrics(
+            jsonl_path=self.config_manager.load_setting("metrics_log") or None,
+            prometheus_path=metrics_file,
+            stage_timer=stage_timer
+        )
+        metrics.set_planned(len(loaded_images))
+        
+        # 内容相同的图片（重复导入的副本、硬链接）只添加一次水印，其余输出由第一张的结果生成
+        jobs = [(image_path, self._get_export_output_path(image_path, output_folder)) for image_path in loaded_images]
+        dedupe_mode = self.config_manager.load_setting("dedupe_mode")
+        primary_jobs = {}
+        if dedupe_mode:
+            from core.duplicate_inputs import group_duplicate_jobs, write_duplicate_output
+            for job, duplicates in group_duplicate_jobs(jobs):
+                for duplicate in duplicates:
+                    primary_jobs[duplicate] = job
+        exported = {}
+        
         for i, image_path in enumerate(loaded_images):
             # 检查是否取消
             if progress.wasCanceled():
                 break
                 
+            image_start = time.perf_counter()
+            memory_scope = memory_tracker.begin("image", image_path) if memory_tracker else None
+            output_path = jobs[i][1]
             try:
-                # 获取输出文件名
-                naming_rule = "original"
-                if self.naming_combobox.currentIndex() == 1:
-                    naming_rule = "prefix"
-                elif self.naming_combobox.currentIndex() == 2:
-                    naming_rule = "suffix"
-                
-                # 获取文件扩展名
-                ext = self.file_handler.get_file_extension(image_path)
-                if self.format_combobox.currentText() == "PNG":
-                    ext = ".png"
-                else:
-                    ext = ".jpg"
-                
-                # 根据命名规则生成输出文件路径
-                output_path = self.file_handler.get_output_file_path(
-                    image_path, 
-                    output_folder, 
-                    naming_rule, 
-                    self.prefix_edit.text(), 
-                    self.suffix_edit.text()
-                )
-                
                 # 检查是否安全保存
                 if not self.file_handler.is_safe_to_save(image_path, output_path):
                     continue
+                
+                # 与已导出的图片内容相同时直接复用其输出，不再解码和编码
+                primary = primary_jobs.get(jobs[i])
+                if primary in exported:
+                    write_duplicate_output(exported[primary], output_path, dedupe_mode)
+                    success_count += 1
+                    metrics.record({
+                        "input": image_path, "output": output_path, "success": True, "error": None,
+                        "elapsed": time.perf_counter() - image_start, "duplicate_of": primary[0]
+                    })
+                    progress.setValue(i + 1)
+                    continue
                     
                 # 应用水印设置
                 watermark_text = self.watermark_text_edit.text()
-                if watermark_text:
-                    # 设置水印文本
+                if watermark_text or self.logo_path:
+                    # 设置水印文本和图片水印
                     self.watermark.set_text(watermark_text)
+                    self.watermark.set_image(self.logo_path)
                     
                     # 设置字体
                     font_name = self.font_name_label.text()
@@ -608,6 +993,7 @@ class MainWindow(QMainWindow):
                     font_bold = self.bold_checkbox.isChecked()
                     font_italic = self.italic_checkbox.isChecked()
                     self.watermark.set_font(font_name, font_size, font_bold, font_italic)
+                    self._apply_size_reference()
                     
                     # 设置颜色和透明度
                     # 从样式表中提取RGB值（简化处理）
@@ -630,41 +1016,93 @@ class MainWindow(QMainWindow):
                     # 设置旋转角度
                     rotation = self.rotation_slider.value()
                     self.watermark.set_rotation(rotation)
+                    self.watermark.set_resample(self.resample_combobox.currentData())
+                    
+                    # 设置编码预设
+                    self.watermark.set_encoder_preset(self.preset_combobox.currentData())
                     
                     # 添加水印并保存
                     self.watermark.add_watermark(image_path, output_path)
                     success_count += 1
+                    exported[jobs[i]] = output_path
+                    metrics.record({
+                        "input": image_path, "output": output_path, "success": True,
+                        "error": None, "elapsed": time.perf_counter() - image_start
+                    })
                 
             except Exception as e:
+                metrics.record({
+                    "input": image_path, "output": output_path, "success": False,
+                    "error": str(e), "elapsed": time.perf_counter() - image_start
+                })
                 QMessageBox.warning(self, "导出失败", f"导出 {os.path.basename(image_path)} 时出错: {str(e)}")
+            finally:
+                if memory_scope is not None:
+                    memory_tracker.end(memory_scope)
                 
             # 更新进度
             progress.setValue(i + 1)
             
+        self.watermark.set_stage_timer(None)
+        if memory_tracker:
+            memory_tracker.stop()
+        metrics.close()
+        
         # 显示导出结果
         if success_count > 0:
-            QMessageBox.information(self, "导出完成", f"成功导出 {success_count} 张图片到 {output_folder}")
+            stats = metrics.snapshot()
+            message = (
+                f"成功导出 {success_count} 张图片到 {output_folder}\n"
+                f"失败 {stats['failed']} 张，{stats['images_per_second']:.2f} 张/秒，"
+                f"单张耗时 p50 {stats['latency'][0.5] * 1000:.0f} ms / p95 {stats['latency'][0.95] * 1000:.0f} ms"
+            )
+            timing_summary = stage_timer.format_summary() if profiling else ""
+            if timing_summary:
+                print(timing_summary)
+                message += f"\n\n各阶段耗时:\n{timing_summary}"
+            memory_report = memory_tracker.format_report(count=3) if memory_tracker else ""
+            if memory_report:
+                print(memory_report)
+                message += f"\n\n{memory_report}"
+            QMessageBox.information(self, "导出完成", message)
         elif progress.wasCanceled():
             QMessageBox.information(self, "导出取消", "导出操作已取消")
         else:
             QMessageBox.warning(self, "导出失败", "没有成功导出任何图片")
             
+    def _get_export_output_path(self, image_path, output_folder):
+        """按命名规则和输出格式生成导出文件路径
+        
+        Args:
+            image_path: 图片路径
+            output_folder: 输出文件夹
+            
+        Returns:
+            str: 输出文件路径
+        """
+        # 获取输出文件名
+        naming_rule = "original"
+        if self.naming_combobox.currentIndex() == 1:
+            naming_rule = "prefix"
+        elif self.naming_combobox.currentIndex() == 2:
+            naming_rule = "suffix"
+        
+        # 根据输出格式确定文件扩展名
+        ext = FORMAT_EXTENSIONS.get(self.format_combobox.currentText(), ".png")
+        
+        # 根据命名规则生成输出文件路径，并替换为输出格式的扩展名
+        output_path = self.file_handler.get_output_file_path(
+            image_path, 
+            output_folder, 
+            naming_rule, 
+            self.prefix_edit.text(), 
+            self.suffix_edit.text()
+        )
+        return os.path.splitext(output_path)[0] + ext
+        
     def on_save_template_button_clicked(self):
         """保存模板按钮点击事件"""
-        # 获取当前水印设置
-        template_data = {
-            "text": self.watermark_text_edit.text(),
-            "font_name": self.font_name_label.text(),
-            "font_size": self.font_size_spinbox.value(),
-            "font_bold": self.bold_checkbox.isChecked(),
-            "font_italic": self.italic_checkbox.isChecked(),
-            # 从样式表中提取颜色值（简化处理）
-            "color": self._get_color_from_preview(),
-            "opacity": self.opacity_slider.value(),
-            # 获取选中的位置
-            "position": self._get_selected_position(),
-            "rotation": self.rotation_slider.value()
-        }
+        template_data = self._collect_template_data()
         
         # 获取模板名称
         from PyQt5.QtWidgets import QInputDialog
@@ -679,6 +1117,29 @@ class MainWindow(QMainWindow):
             else:
                 QMessageBox.warning(self, "保存失败", "无法保存模板")
                 
+    def _collect_template_data(self):
+        """获取当前水印设置，格式与模板数据相同"""
+        return {
+            "watermark_type": "image" if self.logo_path else "text",
+            "text": self.watermark_text_edit.text(),
+            "image_path": self.logo_path,
+            "font_name": self.font_name_label.text(),
+            "font_size": self.font_size_spinbox.value(),
+            "font_bold": self.bold_checkbox.isChecked(),
+            "font_italic": self.italic_checkbox.isChecked(),
+            "size_reference": self.size_reference_combobox.currentData(),
+            "font_scale": self.font_scale_spinbox.value() / 100,
+            "margin": self.margin_spinbox.value(),
+            "margin_scale": self._get_margin_scale(),
+            # 从样式表中提取颜色值（简化处理）
+            "color": self._get_color_from_preview(),
+            "opacity": self.opacity_slider.value(),
+            # 获取选中的位置
+            "position": self._get_selected_position(),
+            "rotation": self.rotation_slider.value(),
+            "resample": self.resample_combobox.currentData()
+        }
+        
     def on_load_template_button_clicked(self):
         """加载模板按钮点击事件"""
         # 让用户选择模板
@@ -708,7 +1169,13 @@ class MainWindow(QMainWindow):
     def on_template_item_clicked(self, item):
         """模板列表项点击事件"""
         template_name = item.text()
-        # 加载模板
+        # 优先使用编译后的模板，字体已解析、水印图块已渲染
+        compiled = self.template_manager.compile_template(template_name)
+        if compiled is not None:
+            self._apply_template_settings(compiled.data, compiled)
+            return
+        
+        # 模板数据不完整时按原样加载
         template_data = self.template_manager.load_template(template_name)
         
         if template_data:
@@ -742,6 +1209,21 @@ class MainWindow(QMainWindow):
                     pass
         return (255, 255, 255)  # 默认白色
         
+    def _apply_size_reference(self):
+        """把字号参照、比例和边距应用到水印"""
+        self.watermark.set_margin(self.margin_spinbox.value())
+        self.watermark.set_relative_size(
+            self.size_reference_combobox.currentData(),
+            self.font_scale_spinbox.value() / 100,
+            self._get_margin_scale()
+        )
+        
+    def _get_margin_scale(self):
+        """获取边距比例，没有按比例设置字号或比例为0时返回None，表示使用像素边距"""
+        if self.size_reference_combobox.currentData() is None or self.margin_scale_spinbox.value() == 0:
+            return None
+        return self.margin_scale_spinbox.value() / 100
+        
     def _get_selected_position(self):
         """获取选中的位置"""
         for position, button in self.position_buttons.items():
@@ -749,12 +1231,53 @@ class MainWindow(QMainWindow):
                 return position
         return "center"  # 默认居中
         
-    def _apply_template_settings(self, template_data):
-        """应用模板设置"""
+    def _apply_template_settings(self, template_data, compiled=None):
+        """应用模板设置
+        
+        设置控件时暂时屏蔽它们的信号，避免每个控件的变化都触发一次预览，
+        全部设置完成后只更新一次预览。
+        
+        Args:
+            template_data: 模板数据字典
+            compiled: 可选的CompiledTemplate对象，其预先渲染的水印图块会放入水印缓存
+        """
+        if compiled is not None:
+            # 先应用编译结果，下面设置水印时会复用已加载的图片水印源图
+            compiled.apply_to(self.watermark)
+        
+        widgets = [
+            self.watermark_text_edit, self.font_size_spinbox, self.size_reference_combobox,
+            self.font_scale_spinbox, self.margin_spinbox, self.margin_scale_spinbox, self.bold_checkbox, self.italic_checkbox,
+            self.opacity_slider, self.rotation_slider, self.resample_combobox
+        ] + list(self.position_buttons.values())
+        for widget in widgets:
+            widget.blockSignals(True)
+        try:
+            self._set_template_widgets(template_data)
+        finally:
+            for widget in widgets:
+                widget.blockSignals(False)
+        
+        # 更新预览
+        self.update_preview()
+        
+    def _set_template_widgets(self, template_data):
+        """把模板设置写入控件和水印对象"""
         # 设置水印文本
         self.watermark_text_edit.setText(template_data.get("text", ""))
         self.watermark.set_text(template_data.get("text", ""))
         
+        # 设置图片水印，文件已不存在时改用文本水印
+        logo_path = template_data.get("image_path") if template_data.get("watermark_type") == "image" else None
+        try:
+            self.watermark.set_image(logo_path)
+        except Exception as e:
+            QMessageBox.warning(self, "加载失败", f"无法加载图片水印: {str(e)}")
+            logo_path = None
+            self.watermark.set_image(None)
+        self.logo_path = logo_path
+        self.logo_label.setText(os.path.basename(logo_path) if logo_path else "未选择图片水印")
+        
         # 设置字体
         font_name = template_data.get("font_name", "Arial")
         font_size = template_data.get("font_size", 24)
@@ -767,6 +1290,15 @@ class MainWindow(QMainWindow):
         self.italic_checkbox.setChecked(font_italic)
         self.watermark.set_font(font_name, font_size, font_bold, font_italic)
         
+        # 设置字号参照和比例
+        index = self.size_reference_combobox.findData(template_data.get("size_reference"))
+        self.size_reference_combobox.setCurrentIndex(max(0, index))
+        self.font_scale_spinbox.setValue(template_data.get("font_scale", 0.05) * 100)
+        self.margin_spinbox.setValue(template_data.get("margin", DEFAULT_MARGIN))
+        self.margin_scale_spinbox.setValue((template_data.get("margin_scale") or 0) * 100)
+        self._update_size_controls()
+        self._apply_size_reference()
+        
         # 设置颜色和透明度
         color = template_data.get("color", (255, 255, 255))
         opacity = template_data.get("opacity", 50)
@@ -793,8 +1325,12 @@ class MainWindow(QMainWindow):
         self.rotation_label.setText(f"{rotation}°")
         self.watermark.set_rotation(rotation)
         
-        # 更新预览
-        self.update_preview()
+        # 设置重采样方式
+        resample = template_data.get("resample", DEFAULT_RESAMPLE)
+        index = self.resample_combobox.findData(resample)
+        if index >= 0:
+            self.resample_combobox.setCurrentIndex(index)
+            self.watermark.set_resample(resample)
         
     def load_settings(self):
         """加载上次的设置"""
@@ -810,6 +1346,14 @@ class MainWindow(QMainWindow):
         
     def closeEvent(self, event):
         """窗口关闭事件"""
-        # 保存设置
+        # 停止后台导入
+        self.cancel_import()
+        
+        # 保存会话，下次启动时恢复图片列表和水印设置
+        if self.config_manager.load_setting("restore_session"):
+            self.save_session()
+        
+        # 保存设置，并立即写入尚未写入的设置
         self.save_settings()
+        self.config_manager.flush()
         event.accept()
\ No newline at end of file
@@ -12,9 +12,25 @@ import time
 import datetime
 import shutil
 import hashlib
+import mmap
 import re
-from PyQt5.QtGui import QImage, QPixmap
-from PyQt5.QtCore import Qt
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 读取文件计算哈希时每次读取的字节数，大块读取减少系统调用次数
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# 超过该大小的文件通过mmap计算哈希，不必把数据复制到Python缓冲区
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+# 文件指纹的摘要字节数，16字节(32个十六进制字符)足以区分上亿个文件
+FINGERPRINT_DIGEST_SIZE = 16
+
+# 采样模式读取的块大小和文件中间的采样块数
+FINGERPRINT_SAMPLE_SIZE = 64 * 1024
+FINGERPRINT_SAMPLES = 16
+
+FINGERPRINT_MODES = ("full", "sampled")
 
 
 def get_application_path():
@@ -138,12 +154,42 @@ def sanitize_filename(filename):
     return sanitized
     
 
+def _update_hash_from_file(hash_obj, f, size):
+    """把已打开文件的全部内容送入哈希对象
+
+    大文件通过mmap分段送入，其余文件读入复用的缓冲区；两种方式中哈希计算都会释放GIL，
+    多个线程可以同时计算。
+
+    Args:
+        hash_obj: hashlib哈希对象
+        f: 以二进制方式打开的文件
+        size: 文件大小
+    """
+    if size >= MMAP_THRESHOLD:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, HASH_CHUNK_SIZE * 8):
+                    hash_obj.update(view[offset:offset + HASH_CHUNK_SIZE * 8])
+            finally:
+                view.release()
+        return
+
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    while True:
+        count = f.readinto(buffer)
+        if not count:
+            break
+        hash_obj.update(view[:count])
+
+
 def calculate_file_hash(file_path, hash_type="md5"):
     """计算文件哈希值
     
     Args:
         file_path: 文件路径
-        hash_type: 哈希算法类型（md5、sha1、sha256等）
+        hash_type: 哈希算法类型（md5、sha1、sha256、blake2b等）
     
     Returns:
         文件哈希值字符串
@@ -157,9 +203,7 @@ def calculate_file_hash(file_path, hash_type="md5"):
     # 读取文件并计算哈希值
     try:
         with open(file_path, "rb") as f:
-            # 分块读取文件
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_obj.update(chunk)
+            _update_hash_from_file(hash_obj, f, os.fstat(f.fileno()).st_size)
     except Exception as e:
         print(f"计算文件哈希值失败: {str(e)}")
         return None
@@ -168,6 +212,73 @@ def calculate_file_hash(file_path, hash_type="md5"):
     return hash_obj.hexdigest()
     
 
+def fingerprint_file(file_path, mode="full", sample_size=FINGERPRINT_SAMPLE_SIZE, samples=FINGERPRINT_SAMPLES):
+    """计算文件内容指纹
+    
+    使用BLAKE2b计算，比calculate_file_hash默认的MD5快。full模式读取整个文件；
+    sampled模式只读取文件大小、开头、结尾和中间均匀分布的若干块，读取量与文件大小无关，
+    适合增量导出、去重等判断文件是否变化的场合，但无法发现未采样区域内的修改。
+    两种模式的指纹互不相同，不能混用比较。
+    
+    Args:
+        file_path: 文件路径
+        mode: "full"或"sampled"
+        sample_size: sampled模式每块读取的字节数
+        samples: sampled模式在开头和结尾之外采样的块数
+    
+    Returns:
+        32个字符的十六进制指纹，文件不存在或读取失败时返回None
+    """
+    if mode not in FINGERPRINT_MODES:
+        raise ValueError(f"未知的指纹模式: {mode}")
+        
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # 小文件采样和完整读取的开销相近，直接读取整个文件
+            if mode == "sampled" and size > (samples + 2) * sample_size:
+                hash_obj = hashlib.blake2b(digest_size=FINGERPRINT_DIGEST_SIZE, person=b"pw2-sampled")
+                hash_obj.update(size.to_bytes(8, "little"))
+                # 开头、中间均匀分布的块和结尾，偏移量只取决于文件大小
+                stride = (size - sample_size) / (samples + 1)
+                for index in range(samples + 2):
+                    f.seek(int(index * stride))
+                    hash_obj.update(f.read(sample_size))
+            else:
+                hash_obj = hashlib.blake2b(digest_size=FINGERPRINT_DIGEST_SIZE, person=b"pw2-" + mode.encode())
+                hash_obj.update(size.to_bytes(8, "little"))
+                _update_hash_from_file(hash_obj, f, size)
+    except OSError as e:
+        print(f"计算文件指纹失败: {str(e)}")
+        return None
+        
+    return hash_obj.hexdigest()
+    
+
+def fingerprint_files(file_paths, mode="full", max_workers=None):
+    """并行计算多个文件的内容指纹
+    
+    Args:
+        file_paths: 文件路径列表
+        mode: "full"或"sampled"，参见fingerprint_file
+        max_workers: 线程数，None表示使用默认值
+    
+    Returns:
+        dict: 文件路径到指纹的字典，顺序与file_paths一致，读取失败的文件对应None
+    """
+    if mode not in FINGERPRINT_MODES:
+        raise ValueError(f"未知的指纹模式: {mode}")
+    file_paths = list(file_paths)
+    if len(file_paths) <= 1:
+        return {file_path: fingerprint_file(file_path, mode) for file_path in file_paths}
+        
+    # 哈希计算释放GIL，采样模式主要是IO等待，线程数可以多于CPU核心数
+    max_workers = max_workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        fingerprints = executor.map(lambda file_path: fingerprint_file(file_path, mode), file_paths, chunksize=16)
+        return dict(zip(file_paths, fingerprints))
+    
+
 def is_image_file(file_path):
     """检查文件是否为支持的图片格式
     
@@ -252,6 +363,10 @@ def resize_image_keep_aspect_ratio(image, max_width, max_height):
     Returns:
         调整大小后的图片对象
     """
+    # Qt模块只在需要时导入，命令行工具使用本模块时不必加载
+    from PyQt5.QtGui import QImage, QPixmap
+    from PyQt5.QtCore import Qt
+    
     # 检查输入类型
     if isinstance(image, QPixmap):
         # 对于QPixmap
@@ -313,15 +428,17 @@ def get_image_dimensions(file_path):
         return None
         
     try:
-        # 尝试加载图片
-        image = QImage(file_path)
-        if image.isNull():
-            # 如果QImage加载失败，尝试QPixmap
-            pixmap = QPixmap(file_path)
-            if pixmap.isNull():
-                return None
-            return (pixmap.width(), pixmap.height())
-        return (image.width(), image.height())
+        # QImageReader只读取文件头，不解码像素
+        from PyQt5.QtGui import QImageReader
+        reader = QImageReader(file_path)
+        size = reader.size()
+        if size.isValid():
+            return (size.width(), size.height())
+            
+        # 部分格式的文件头中没有尺寸，回退到Pillow的延迟解码
+        from PIL import Image
+        with Image.open(file_path) as image:
+            return image.size
     except Exception as e:
         print(f"获取图片尺寸失败: {str(e)}")
         return None
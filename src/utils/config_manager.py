@@ -6,24 +6,54 @@ Photo-Watermark-2 - 图片水印工具
 配置管理模块
 """
 
-import json
+import ast
+import copy
+import atexit
+import functools
 import os
-import sys
+import threading
+import weakref
 from PyQt5.QtCore import QSettings
 
 
+# 修改设置后等待多久写入QSettings(秒)，期间的多次修改合并为一次写入
+DEFAULT_FLUSH_DELAY = 2.0
+
+# 缓存中表示QSettings里没有该设置
+_MISSING = object()
+
+
+def _flush_at_exit(manager_ref):
+    """程序退出时写入配置管理器的待保存设置，对象已被回收时不做任何事
+
+    Args:
+        manager_ref: ConfigManager对象的弱引用
+    """
+    manager = manager_ref()
+    if manager is not None:
+        manager.flush()
+
+
 class ConfigManager:
-    """配置管理器类，用于保存和加载用户配置"""
+    """配置管理器类，用于保存和加载用户配置
+    
+    设置在第一次读取时从QSettings加载并转换为默认配置中对应的类型，之后从内存缓存读取。
+    修改只写入缓存并标记为待写入，由定时器在flush_delay秒后统一写入并同步一次，
+    程序退出或调用flush()时立即写入。
+    """
     
-    def __init__(self, app_name="PhotoWatermark", company_name="PhotoWatermarkDev"):
+    def __init__(self, app_name="PhotoWatermark", company_name="PhotoWatermarkDev",
+                 flush_delay=DEFAULT_FLUSH_DELAY):
         """初始化配置管理器
         
         Args:
             app_name: 应用程序名称，用于QSettings存储
             company_name: 公司名称，用于QSettings存储
+            flush_delay: 修改设置后延迟写入的秒数，0表示每次修改立即写入
         """
         # 使用QSettings进行配置存储
         self.settings = QSettings(company_name, app_name)
+        self.flush_delay = flush_delay
         
         # 默认配置
         self.default_config = {
@@ -36,9 +66,31 @@ class ConfigManager:
             "recent_files": [],
             "window_size": (1024, 768),
             "window_position": (0, 0),
-            "window_maximized": False
+            "window_maximized": False,
+            # 批量导出指标：每张图片的JSON Lines日志和Prometheus文本格式指标文件，留空表示不写
+            "metrics_log": "",
+            "metrics_file": "",
+            # 导出完成时显示各阶段耗时和峰值内存，开启后导出期间会运行内存采样线程
+            "export_profiling": False,
+            # 模板数据库文件，留空表示每个模板保存为模板文件夹中的一个JSON文件
+            "template_db": "",
+            # 退出时保存图片列表和水印设置，下次启动时恢复
+            "restore_session": True,
+            # 导出时内容相同的图片只处理一次，其余输出的生成方式：copy复制，link硬链接，留空表示不检测。
+            # 检测需要在界面线程中计算大小相同的文件的指纹，默认与命令行一样关闭
+            "dedupe_mode": ""
         }
         
+        # 已转换类型的设置和等待写入的设置
+        self._cache = {}
+        self._dirty = {}
+        self._flush_timer = None
+        # 定时器线程和界面线程都会访问QSettings，由锁保证串行
+        self._lock = threading.RLock()
+        # 退出钩子只持有弱引用，不会让已不再使用的配置管理器一直存活到程序退出
+        self._exit_hook = functools.partial(_flush_at_exit, weakref.ref(self))
+        atexit.register(self._exit_hook)
+        
         # 确保配置文件目录存在
         self._ensure_config_dir_exists()
         
@@ -48,13 +100,16 @@ class ConfigManager:
         pass
         
     def save_setting(self, key, value):
-        """保存单个设置
+        """保存单个设置，实际写入由定时器合并进行
         
         Args:
             key: 设置键
             value: 设置值
         """
-        self.settings.setValue(key, value)
+        with self._lock:
+            self._cache[key] = copy.deepcopy(value)
+            self._dirty[key] = copy.deepcopy(value)
+        self._schedule_flush()
         
     def load_setting(self, key, default_value=None):
         """加载单个设置
@@ -69,27 +124,78 @@ class ConfigManager:
         if default_value is None:
             default_value = self.default_config.get(key, None)
             
-        value = self.settings.value(key, default_value)
-        
-        # 类型转换，因为QSettings会将一些类型转换为字符串
-        if key == "window_size" and isinstance(value, str):
-            try:
-                # 从字符串转换回元组
-                import ast
-                value = ast.literal_eval(value)
-            except:
-                value = default_value
-        elif key == "window_position" and isinstance(value, str):
-            try:
-                import ast
-                value = ast.literal_eval(value)
-            except:
-                value = default_value
-        elif key == "window_maximized" and isinstance(value, str):
-            value = value.lower() == "true"
+        with self._lock:
+            # 设置值本身可能是None，只有不在缓存中时才读取QSettings；
+            # QSettings中没有的设置在缓存中记为_MISSING，同样不再重复读取
+            if key not in self._cache:
+                raw = self.settings.value(key, None)
+                self._cache[key] = _MISSING if raw is None else self._convert(key, raw)
+            value = self._cache[key]
+        
+        if value is _MISSING:
+            return default_value
+        # 返回副本，调用方修改列表不会影响缓存
+        return copy.deepcopy(value)
+        
+    def _convert(self, key, value):
+        """把QSettings返回的值转换为默认配置中对应的类型
+        
+        QSettings在部分平台上把元组、布尔值和数字存为字符串，只有一项的列表会变成字符串
         
+        Args:
+            key: 设置键
+            value: QSettings返回的值
+            
+        Returns:
+            转换后的值，无法转换时返回默认值
+        """
+        default = self.default_config.get(key)
+        try:
+            if isinstance(default, bool):
+                return value.lower() == "true" if isinstance(value, str) else bool(value)
+            if isinstance(default, int):
+                return int(value)
+            if isinstance(default, tuple):
+                if isinstance(value, str):
+                    value = ast.literal_eval(value)
+                return tuple(value)
+            if isinstance(default, list):
+                if isinstance(value, str):
+                    return [value]
+                return list(value)
+        except (ValueError, TypeError, SyntaxError):
+            return default
         return value
         
+    def _schedule_flush(self):
+        """安排一次延迟写入，已有等待中的写入时不重复安排"""
+        if self.flush_delay <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        
+    def flush(self):
+        """立即把所有待写入的设置写入QSettings并同步到磁盘"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+            for key, value in dirty.items():
+                self.settings.setValue(key, value)
+            self.settings.sync()
+            
+    def close(self):
+        """写入待保存的设置并注销退出钩子，不再使用配置管理器时调用"""
+        self.flush()
+        atexit.unregister(self._exit_hook)
+        
     def save_all_settings(self, settings_dict):
         """保存所有设置
         
@@ -121,8 +227,7 @@ class ConfigManager:
             window: QMainWindow对象
         """
         # 保存窗口位置和大小
-        self.save_setting("window_size", window.size().width())
-        self.save_setting("window_size", window.size().height())
+        self.save_setting("window_size", (window.size().width(), window.size().height()))
         self.save_setting("window_position", (window.pos().x(), window.pos().y()))
         self.save_setting("window_maximized", window.isMaximized())
         
@@ -139,9 +244,6 @@ class ConfigManager:
         
         if isinstance(size, tuple) and len(size) == 2:
             window.resize(size[0], size[1])
-        elif isinstance(size, int):
-            # 旧版本的兼容性处理
-            pass
             
         if isinstance(position, tuple) and len(position) == 2:
             window.move(position[0], position[1])
@@ -174,21 +276,33 @@ class ConfigManager:
     def get_recent_files(self):
         """获取最近使用的文件列表
         
+        只读取缓存，不检查文件是否存在，可以在启动时调用而不访问磁盘；
+        已删除的文件由主窗口初始化后在后台线程中调用prune_recent_files()清理。
+        
         Returns:
             最近文件列表
         """
-        recent_files = self.load_setting("recent_files", [])
+        return self.load_setting("recent_files", [])
         
-        # 过滤掉不存在的文件
-        existing_files = []
-        for file_path in recent_files:
-            if os.path.exists(file_path):
-                existing_files.append(file_path)
+    def prune_recent_files(self):
+        """从最近文件列表中移除已不存在的文件
         
-        # 如果过滤后的列表与原列表不同，更新设置
+        需要检查每个文件，可能访问较慢的网络磁盘，应在后台线程或空闲时调用。
+        
+        Returns:
+            过滤后的最近文件列表
+        """
+        recent_files = self.load_setting("recent_files", [])
+        existing_files = [file_path for file_path in recent_files if os.path.exists(file_path)]
+        
+        # 只有列表变化时才写入
         if existing_files != recent_files:
-            self.save_setting("recent_files", existing_files)
-            
+            with self._lock:
+                # 检查期间可能又添加了文件，只移除检查过且不存在的文件
+                missing = set(recent_files) - set(existing_files)
+                current = self.load_setting("recent_files", [])
+                self.save_setting("recent_files", [path for path in current if path not in missing])
+            return self.load_setting("recent_files", [])
         return existing_files
         
 
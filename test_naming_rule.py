@@ -1,5 +1,9 @@
 import os
-from src.core.file_handler import FileHandler
+import sys
+
+# core模块之间按src目录导入，与程序入口一样把src目录加入Python路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.file_handler import FileHandler
 
 # 测试get_output_file_path方法的功能
 def test_naming_rules():
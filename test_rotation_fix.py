@@ -6,9 +6,13 @@
 """
 
 import os
+import sys
 import tempfile
 from PIL import Image
-from src.core.watermark import Watermark
+
+# core模块之间按src目录导入，与程序入口一样把src目录加入Python路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.watermark import Watermark
 
 
 def create_test_image(width=800, height=600, color=(200, 200, 200)):
@@ -8,8 +8,8 @@ import json
 import sys
 
 # 导入应用程序的模块
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.core.template_manager import TemplateManager
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.template_manager import TemplateManager
 
 class CommandLineTemplateTester:
     def __init__(self):
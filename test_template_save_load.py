@@ -9,8 +9,8 @@ from PyQt5.QtCore import Qt
 import sys
 
 # 导入应用程序的模块
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from src.core.template_manager import TemplateManager
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.template_manager import TemplateManager
 
 class TestTemplateApp(QWidget):
     def __init__(self):
@@ -1,8 +1,12 @@
 from PIL import Image, ImageDraw
-from src.core.watermark import Watermark
 import os
+import sys
 import tempfile
 
+# core模块之间按src目录导入，与程序入口一样把src目录加入Python路径
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from core.watermark import Watermark
+
 # 创建一个简单的测试图片
 def create_test_image():
     # 创建一个临时文件
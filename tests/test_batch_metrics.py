@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+批量处理指标模块测试
+"""
+
+import unittest
+import os
+import json
+import tempfile
+from PIL import Image
+
+from core.batch_metrics import BatchMetrics
+from core.batch_processor import BatchProcessor
+from core.stage_timer import StageTimer
+from core.watermark import Watermark
+
+
+class TestBatchMetrics(unittest.TestCase):
+    """批量处理指标模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.jsonl_path = os.path.join(self.temp_dir.name, "metrics", "images.jsonl")
+        self.prom_path = os.path.join(self.temp_dir.name, "metrics", "watermark.prom")
+        self.input_path = os.path.join(self.temp_dir.name, "input.png")
+        Image.new('RGB', (64, 64), color='white').save(self.input_path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _read_prometheus(self):
+        """读取指标文件中的样本"""
+        samples = {}
+        with open(self.prom_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_record_and_write(self):
+        """测试记录结果并写出JSON Lines和Prometheus文件"""
+        metrics = BatchMetrics(self.jsonl_path, self.prom_path, write_interval=0)
+        metrics.set_planned(4)
+        metrics.record({"input": self.input_path, "output": self.input_path, "success": True,
+                        "error": None, "elapsed": 0.2})
+        metrics.record({"input": self.input_path, "output": None, "success": False,
+                        "error": "boom", "elapsed": 0.1})
+        metrics.close()
+
+        with open(self.jsonl_path, "r", encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(entries[0]["success"])
+        self.assertEqual(entries[0]["bytes_in"], os.path.getsize(self.input_path))
+        self.assertEqual(entries[1]["error"], "boom")
+        self.assertEqual(entries[1]["bytes_out"], 0)
+
+        samples = self._read_prometheus()
+        self.assertEqual(samples['photo_watermark_images_total{status="success"}'], 1)
+        self.assertEqual(samples['photo_watermark_images_total{status="failed"}'], 1)
+        self.assertEqual(samples["photo_watermark_image_latency_seconds_count"], 2)
+        self.assertAlmostEqual(samples['photo_watermark_image_latency_seconds{quantile="0.95"}'], 0.2)
+        self.assertAlmostEqual(samples["photo_watermark_batch_progress_ratio"], 0.5)
+        self.assertFalse(os.path.exists(self.prom_path + ".tmp"))
+
+    def test_snapshot_without_files(self):
+        """测试不写文件时只在内存中统计"""
+        metrics = BatchMetrics(workers=2)
+        for elapsed in (0.1, 0.2, 0.3):
+            metrics.record({"input": None, "output": None, "success": True, "elapsed": elapsed})
+        stats = metrics.snapshot()
+
+        self.assertEqual(stats["processed"], 3)
+        self.assertAlmostEqual(stats["latency"][0.5], 0.2)
+        self.assertIsNone(stats["progress"])
+        self.assertLessEqual(stats["worker_utilization"], 1.0)
+        metrics.close()
+
+    def test_batch_processor(self):
+        """测试批量处理器记录每个文件的结果和阶段耗时"""
+        timer = StageTimer()
+        watermark = Watermark()
+        watermark.set_text("TEST")
+        watermark.set_stage_timer(timer)
+        metrics = BatchMetrics(self.jsonl_path, self.prom_path, workers=2, stage_timer=timer)
+        processor = BatchProcessor(watermark, max_workers=2, metrics=metrics)
+        jobs = [(self.input_path, os.path.join(self.temp_dir.name, f"out{i}.png")) for i in range(3)]
+        try:
+            processor.run_batch(jobs)
+        finally:
+            processor.shutdown()
+        metrics.close()
+
+        samples = self._read_prometheus()
+        self.assertEqual(samples['photo_watermark_images_total{status="success"}'], 3)
+        self.assertGreater(samples["photo_watermark_output_bytes_total"], 0)
+        self.assertEqual(samples['photo_watermark_stage_seconds_count{stage="encode"}'], 3)
+
+    def test_stage_counters_monotonic(self):
+        """测试计时器按批次重置后阶段耗时计数器不减少"""
+        timer = StageTimer()
+        metrics = BatchMetrics(prometheus_path=self.prom_path, stage_timer=timer)
+        timer.record("encode", 0.5)
+        timer.record("encode", 0.25)
+        metrics.write_prometheus()
+        first = self._read_prometheus()
+
+        # 监视模式每个批次开始时重置计时器
+        timer.reset()
+        timer.record("encode", 0.125)
+        metrics.close()
+        second = self._read_prometheus()
+
+        self.assertEqual(first['photo_watermark_stage_seconds_count{stage="encode"}'], 2)
+        self.assertEqual(second['photo_watermark_stage_seconds_count{stage="encode"}'], 3)
+        self.assertAlmostEqual(second['photo_watermark_stage_seconds_sum{stage="encode"}'], 0.875)
+        # 百分位数只反映当前批次
+        self.assertAlmostEqual(second['photo_watermark_stage_seconds{stage="encode",quantile="0.5"}'], 0.125)
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
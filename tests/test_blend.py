@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+水印混合模块测试
+"""
+
+import unittest
+from PIL import Image
+
+import core.blend as blend
+from core.blend import blend_array, blend_image, prepare_sprite, is_numpy_available
+
+
+def _reference(img, sprite, position):
+    """使用Image.alpha_composite计算的参考结果"""
+    result = img.convert("RGBA")
+    layer = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    layer.paste(sprite, position)
+    return Image.alpha_composite(result, layer).convert(img.mode)
+
+
+@unittest.skipUnless(is_numpy_available(), "需要NumPy")
+class TestBlend(unittest.TestCase):
+    """水印混合模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        import numpy
+        self.np = numpy
+        rng = numpy.random.default_rng(0)
+        self.rgb = Image.fromarray(rng.integers(0, 256, (90, 120, 3), dtype=numpy.uint8))
+        self.rgba = Image.fromarray(rng.integers(0, 256, (90, 120, 4), dtype=numpy.uint8))
+        self.sprite = Image.fromarray(rng.integers(0, 256, (40, 50, 4), dtype=numpy.uint8))
+
+    def test_rgb_matches_alpha_composite(self):
+        """测试RGB目标与alpha_composite结果完全一致，包括被裁剪的位置"""
+        for position in [(10, 20), (-15, -5), (100, 70)]:
+            result = blend_image(self.rgb.copy(), self.sprite, position)
+            self.assertEqual(result.mode, "RGB")
+            self.assertEqual(result.tobytes(), _reference(self.rgb, self.sprite, position).tobytes())
+
+    def test_rgba_array(self):
+        """测试RGBA数组的定点混合误差不超过1"""
+        position = (30, 40)
+        dest = self.np.array(self.rgba)
+        self.assertTrue(blend_array(dest, prepare_sprite(self.sprite), position))
+
+        expected = self.np.asarray(_reference(self.rgba, self.sprite, position)).astype(int)
+        self.assertLessEqual(self.np.abs(dest.astype(int) - expected).max(), 1)
+
+    def test_outside(self):
+        """测试水印在图片之外时不做修改"""
+        dest = self.np.array(self.rgb)
+        self.assertFalse(blend_array(dest, prepare_sprite(self.sprite), (500, 500)))
+        self.assertEqual(dest.tobytes(), self.rgb.tobytes())
+
+    def test_without_numpy(self):
+        """测试没有NumPy时回退到区域内的alpha_composite"""
+        numpy_module = blend._numpy
+        blend._numpy = False
+        try:
+            self.assertFalse(is_numpy_available())
+            result = blend_image(self.rgb.copy(), self.sprite, (10, 20))
+        finally:
+            blend._numpy = numpy_module
+        self.assertEqual(result.tobytes(), _reference(self.rgb, self.sprite, (10, 20)).tobytes())
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+通用工具函数模块测试
+"""
+
+import unittest
+import os
+import hashlib
+import tempfile
+
+from utils import common_utils
+from utils.common_utils import calculate_file_hash, fingerprint_file, fingerprint_files
+
+
+class TestCommonUtils(unittest.TestCase):
+    """通用工具函数模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data = os.urandom(3 * 1024 * 1024 + 123)
+        self.path = self._write("data.bin", self.data)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _write(self, name, data):
+        """写入测试文件并返回路径"""
+        path = os.path.join(self.temp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def test_calculate_file_hash(self):
+        """测试文件哈希与一次性计算的结果一致"""
+        self.assertEqual(calculate_file_hash(self.path), hashlib.md5(self.data).hexdigest())
+        self.assertEqual(calculate_file_hash(self.path, "blake2b"), hashlib.blake2b(self.data).hexdigest())
+        self.assertIsNone(calculate_file_hash(os.path.join(self.temp_dir.name, "missing")))
+
+    def test_mmap_matches_buffered(self):
+        """测试mmap读取与缓冲读取的结果一致"""
+        expected = fingerprint_file(self.path)
+        threshold = common_utils.MMAP_THRESHOLD
+        common_utils.MMAP_THRESHOLD = 1024
+        try:
+            self.assertEqual(fingerprint_file(self.path), expected)
+            self.assertEqual(calculate_file_hash(self.path), hashlib.md5(self.data).hexdigest())
+        finally:
+            common_utils.MMAP_THRESHOLD = threshold
+
+    def test_fingerprint_modes(self):
+        """测试完整模式和采样模式能发现的修改"""
+        full = fingerprint_file(self.path)
+        sampled = fingerprint_file(self.path, "sampled")
+        self.assertEqual(len(full), 32)
+        self.assertNotEqual(full, sampled)
+
+        # 修改开头：两种模式都能发现
+        head_changed = self._write("head.bin", b"x" + self.data[1:])
+        self.assertNotEqual(fingerprint_file(head_changed), full)
+        self.assertNotEqual(fingerprint_file(head_changed, "sampled"), sampled)
+
+        # 修改未采样的区域：只有完整模式能发现
+        offset = common_utils.FINGERPRINT_SAMPLE_SIZE + 10
+        middle = bytearray(self.data)
+        middle[offset] ^= 0xFF
+        middle_changed = self._write("middle.bin", bytes(middle))
+        self.assertNotEqual(fingerprint_file(middle_changed), full)
+        self.assertEqual(fingerprint_file(middle_changed, "sampled"), sampled)
+
+        # 追加数据改变文件大小：两种模式都能发现
+        appended = self._write("appended.bin", self.data + b"\0")
+        self.assertNotEqual(fingerprint_file(appended, "sampled"), sampled)
+
+        with self.assertRaises(ValueError):
+            fingerprint_file(self.path, "fast")
+
+    def test_fingerprint_files(self):
+        """测试并行计算与逐个计算的结果一致"""
+        paths = [self._write(f"{index}.bin", bytes([index]) * 1000) for index in range(20)]
+        paths.append(os.path.join(self.temp_dir.name, "missing"))
+
+        for mode in ("full", "sampled"):
+            fingerprints = fingerprint_files(paths, mode, max_workers=4)
+            self.assertEqual(list(fingerprints), paths)
+            self.assertEqual(fingerprints, {path: fingerprint_file(path, mode) for path in paths})
+        self.assertIsNone(fingerprints[paths[-1]])
+        self.assertEqual(len(set(fingerprints.values())), 21)
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
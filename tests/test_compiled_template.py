@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+编译模板模块测试
+"""
+
+import unittest
+import os
+import json
+import tempfile
+from PIL import Image
+
+from core.compiled_template import compile_template, validate_template
+from core.stage_timer import StageTimer
+from core.template_manager import TemplateManager
+from core.template_index import TemplateIndex
+from core.watermark import Watermark
+
+
+class TestCompiledTemplate(unittest.TestCase):
+    """编译模板模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.image_path = os.path.join(self.temp_dir.name, "input.png")
+        Image.new('RGB', (200, 100), color='white').save(self.image_path)
+        self.template = {
+            "text": "TEST",
+            "font_size": 20,
+            "color": [0, 0, 0],
+            "opacity": 80,
+            "position": "bottom_right",
+            "rotation": 30
+        }
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_validate(self):
+        """测试模板校验和默认值"""
+        data = validate_template({"text": "A"})
+        self.assertEqual(data["watermark_type"], "text")
+        self.assertEqual(data["position"], "center")
+
+        for invalid in ({"text": ""}, {"text": "A", "font_size": 0}, {"text": "A", "color": [300, 0, 0]},
+                        {"text": "A", "position": "nowhere"}, {"text": "A", "resample": "nearest"},
+                        {"watermark_type": "image"}):
+            with self.assertRaises(ValueError):
+                validate_template(invalid)
+
+    def test_apply_without_rendering(self):
+        """测试应用编译后的模板后第一张图片不再解析字体和渲染"""
+        compiled = compile_template(self.template, "test")
+        self.assertIsNotNone(compiled.font)
+        self.assertIsNotNone(compiled.sprite)
+
+        timer = StageTimer()
+        watermark = Watermark()
+        watermark.set_stage_timer(timer)
+        compiled.apply_to(watermark)
+        watermark.add_watermark(self.image_path)
+
+        self.assertEqual(watermark.color, (0, 0, 0, 204))
+        self.assertNotIn("render", timer.summary())
+        self.assertNotIn("font", timer.summary())
+
+    def test_relative_size_resolves_font_only(self):
+        """测试按比例设置尺寸的模板只预先解析字体"""
+        compiled = compile_template(dict(self.template, size_reference="width", font_scale=0.1))
+        self.assertIsNotNone(compiled.font)
+        self.assertIsNone(compiled.sprite)
+
+    def test_template_manager_cache(self):
+        """测试模板数据未变化时复用编译结果"""
+        folder = self.temp_dir.name
+        path = os.path.join(folder, "test.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.template, f)
+
+        manager = TemplateManager()
+        manager.templates_folder = folder
+        manager.index = TemplateIndex(folder)
+        compiled = manager.compile_template("test")
+
+        self.assertIs(manager.compile_template("test"), compiled)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.template, text="OTHER"), f)
+        self.assertEqual(manager.compile_template("test").data["text"], "OTHER")
+        self.assertIsNone(manager.compile_template("missing"))
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
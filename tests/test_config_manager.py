@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+配置管理模块测试
+"""
+
+import unittest
+import gc
+import os
+import tempfile
+import weakref
+from PyQt5.QtCore import QSettings
+
+from utils.config_manager import ConfigManager
+
+
+class TestConfigManager(unittest.TestCase):
+    """配置管理模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # 把QSettings的用户配置写到临时目录，不影响真实配置
+        QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope, self.temp_dir.name)
+        self.config = ConfigManager("Test", "Test", flush_delay=60)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.config.flush()
+        self.temp_dir.cleanup()
+
+    def _stored(self, key):
+        """读取已经写入QSettings的值"""
+        return QSettings("Test", "Test").value(key)
+
+    def test_writes_are_coalesced(self):
+        """测试修改先写入缓存，flush时统一写入"""
+        self.config.save_setting("prefix", "a_")
+        self.config.save_setting("prefix", "b_")
+        self.config.save_setting("suffix", "_c")
+
+        self.assertEqual(self.config.load_setting("prefix"), "b_")
+        self.assertIsNone(self._stored("prefix"))
+
+        self.config.flush()
+        self.assertEqual(self._stored("prefix"), "b_")
+        self.assertEqual(self._stored("suffix"), "_c")
+
+    def test_typed_values(self):
+        """测试重新加载后按默认配置的类型转换"""
+        self.config.save_setting("window_size", (800, 600))
+        self.config.save_setting("window_maximized", True)
+        self.config.save_setting("recent_files", ["only.jpg"])
+        self.config.flush()
+
+        loaded = ConfigManager("Test", "Test")
+        self.assertEqual(loaded.load_setting("window_size"), (800, 600))
+        self.assertIs(loaded.load_setting("window_maximized"), True)
+        self.assertEqual(loaded.load_setting("recent_files"), ["only.jpg"])
+        self.assertEqual(loaded.load_setting("export_format"), "PNG")
+
+    def test_cached_values_are_copies(self):
+        """测试修改返回的列表不影响缓存"""
+        self.config.save_setting("recent_files", ["a.jpg"])
+        self.config.load_setting("recent_files").append("b.jpg")
+        self.assertEqual(self.config.load_setting("recent_files"), ["a.jpg"])
+
+    def test_recent_files(self):
+        """测试获取最近文件不检查磁盘，清理时移除已删除的文件"""
+        existing = os.path.join(self.temp_dir.name, "existing.jpg")
+        open(existing, 'w').close()
+        missing = os.path.join(self.temp_dir.name, "missing.jpg")
+        self.config.add_recent_file(missing)
+        self.config.add_recent_file(existing)
+
+        self.assertEqual(self.config.get_recent_files(), [existing, missing])
+        self.assertEqual(self.config.prune_recent_files(), [existing])
+        self.assertEqual(self.config.get_recent_files(), [existing])
+
+        # 清理结果写入QSettings，重新加载后已删除的文件不会再出现
+        self.config.flush()
+        self.assertEqual(ConfigManager("Test", "Test").get_recent_files(), [existing])
+
+    def test_none_value_is_cached(self):
+        """测试值为None的设置也从缓存读取"""
+        self.config.save_setting("custom", None)
+        QSettings("Test", "Test").setValue("custom", "stored")
+        self.assertIsNone(self.config.load_setting("custom"))
+
+    def test_exit_hook_does_not_keep_instance(self):
+        """测试退出钩子不会让配置管理器一直存活"""
+        config = ConfigManager("Test", "Test")
+        config.save_setting("prefix", "x_")
+        config.close()
+        self.assertEqual(self._stored("prefix"), "x_")
+
+        reference = weakref.ref(ConfigManager("Test", "Test"))
+        gc.collect()
+        self.assertIsNone(reference())
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
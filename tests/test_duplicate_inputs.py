@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+重复输入检测模块测试
+"""
+
+import unittest
+import os
+import shutil
+import tempfile
+from PIL import Image
+
+from core.batch_processor import BatchProcessor
+from core.duplicate_inputs import group_duplicate_jobs, write_duplicate_output
+from core.stage_timer import StageTimer
+from core.watermark import Watermark
+
+
+class TestDuplicateInputs(unittest.TestCase):
+    """重复输入检测模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_folder = os.path.join(self.temp_dir.name, "input")
+        self.output_folder = os.path.join(self.temp_dir.name, "output")
+        os.makedirs(os.path.join(self.input_folder, "copies"))
+
+        self.original = self._path("a.png")
+        Image.new('RGB', (64, 48), color='white').save(self.original)
+        self.copy = self._path("copies", "a.png")
+        shutil.copy2(self.original, self.copy)
+        self.hardlink = self._path("a_link.png")
+        os.link(self.original, self.hardlink)
+        # 大小相同但内容不同的图片
+        self.other = self._path("b.png")
+        Image.new('RGB', (64, 48), color='black').save(self.other)
+        self.different = self._path("c.png")
+        Image.new('RGB', (32, 32), color='red').save(self.different)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _path(self, *parts):
+        """获取输入文件夹中的路径"""
+        return os.path.join(self.input_folder, *parts)
+
+    def _jobs(self, *paths, extension=".png"):
+        """为输入路径生成输出路径"""
+        return [
+            (path, os.path.join(self.output_folder, os.path.splitext(os.path.relpath(path, self.input_folder))[0] + extension))
+            for path in paths
+        ]
+
+    def test_group_by_inode_and_content(self):
+        """测试按inode和内容分组"""
+        jobs = self._jobs(self.original, self.other, self.copy, self.hardlink, self.different)
+        groups = group_duplicate_jobs(jobs)
+
+        self.assertEqual([job for job, _ in groups], [jobs[0], jobs[1], jobs[4]])
+        self.assertEqual(groups[0][1], [jobs[3], jobs[2]])
+        self.assertEqual(groups[1][1], [])
+
+    def test_output_format_separates_groups(self):
+        """测试输出格式不同的任务不分为一组"""
+        jobs = self._jobs(self.original, extension=".png") + self._jobs(self.copy, extension=".jpg")
+        self.assertEqual(group_duplicate_jobs(jobs), [(jobs[0], []), (jobs[1], [])])
+
+    def test_missing_input(self):
+        """测试无法读取的输入单独成组"""
+        jobs = self._jobs(self._path("missing.png"), self.original)
+        self.assertEqual(group_duplicate_jobs(jobs), [(jobs[0], []), (jobs[1], [])])
+
+    def test_write_duplicate_output(self):
+        """测试硬链接和复制输出"""
+        target = os.path.join(self.output_folder, "sub", "linked.png")
+        self.assertEqual(write_duplicate_output(self.original, target, "link"), "link")
+        self.assertTrue(os.path.samefile(self.original, target))
+        # 目标已存在时覆盖
+        self.assertEqual(write_duplicate_output(self.other, target, "link"), "link")
+        self.assertTrue(os.path.samefile(self.other, target))
+
+        copied = os.path.join(self.output_folder, "copied.png")
+        self.assertEqual(write_duplicate_output(self.original, copied, "copy"), "copy")
+        self.assertFalse(os.path.samefile(self.original, copied))
+        self.assertIsNone(write_duplicate_output(self.original, self.original))
+        with self.assertRaises(ValueError):
+            write_duplicate_output(self.original, copied, "move")
+
+    def test_batch_processor_renders_once(self):
+        """测试批量处理时重复输入只渲染一次"""
+        watermark = Watermark()
+        watermark.set_text("TEST")
+        timer = StageTimer()
+        watermark.set_stage_timer(timer)
+        jobs = self._jobs(self.original, self.copy, self.hardlink, self.other)
+
+        processor = BatchProcessor(watermark, max_workers=2, dedupe="link")
+        try:
+            results = processor.run_batch(jobs)
+        finally:
+            processor.shutdown()
+
+        self.assertEqual([result["output"] for result in results], [output for _, output in jobs])
+        self.assertTrue(all(result["success"] for result in results))
+        self.assertEqual([result.get("duplicate_of") for result in results],
+                         [None, self.original, self.original, None])
+        self.assertEqual(timer.summary()["decode"]["count"], 2)
+        self.assertTrue(os.path.samefile(jobs[0][1], jobs[1][1]))
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
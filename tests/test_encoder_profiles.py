@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+编码配置模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image
+
+from core.encoder_profiles import (
+    get_encoder_profile, get_preset_names, get_format_from_path, benchmark_presets
+)
+
+
+class TestEncoderProfiles(unittest.TestCase):
+    """编码配置模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_image_path = os.path.join(self.temp_dir.name, "test_image.png")
+        Image.effect_mandelbrot((256, 192), (-2, -1.2, 1, 1.2), 64).convert('RGB').save(self.test_image_path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_get_format_from_path(self):
+        """测试根据扩展名确定格式"""
+        self.assertEqual(get_format_from_path("a.JPEG"), "JPEG")
+        self.assertEqual(get_format_from_path("a.webp"), "WEBP")
+        self.assertEqual(get_format_from_path("a.TIFF"), "TIFF")
+        self.assertEqual(get_format_from_path("a.gif"), "PNG")
+
+    def test_unknown_preset(self):
+        """测试未知预设"""
+        with self.assertRaises(ValueError):
+            get_encoder_profile("unknown")
+
+    def test_save_all_presets(self):
+        """测试所有预设都能保存所有格式"""
+        source = Image.new('RGBA', (64, 64), (255, 0, 0, 128))
+        for preset in get_preset_names():
+            profile = get_encoder_profile(preset)
+            for ext in (".png", ".jpg", ".webp"):
+                output_path = os.path.join(self.temp_dir.name, f"{preset}{ext}")
+                profile.save(source, output_path)
+                with Image.open(output_path) as img:
+                    self.assertEqual(img.format, get_format_from_path(output_path))
+                    self.assertEqual(img.size, (64, 64))
+
+    def test_quality_override(self):
+        """测试覆盖JPEG质量"""
+        profile = get_encoder_profile("balanced")
+        self.assertEqual(profile.get_save_options("JPEG")["quality"], 95)
+        self.assertEqual(profile.get_save_options("JPEG", quality=70)["quality"], 70)
+        # PNG没有质量参数
+        self.assertNotIn("quality", profile.get_save_options("PNG", quality=70))
+
+    def test_smallest_is_smaller(self):
+        """测试smallest预设生成的JPEG不大于fast预设"""
+        with Image.open(self.test_image_path) as img:
+            fast_path = os.path.join(self.temp_dir.name, "fast.jpg")
+            small_path = os.path.join(self.temp_dir.name, "small.jpg")
+            get_encoder_profile("fast").save(img, fast_path)
+            get_encoder_profile("smallest").save(img, small_path)
+        self.assertLessEqual(os.path.getsize(small_path), os.path.getsize(fast_path))
+
+    def test_benchmark_presets(self):
+        """测试编码预设基准测试"""
+        results = benchmark_presets([self.test_image_path], formats=["JPEG", "PNG"], presets=["fast", "smallest"])
+
+        self.assertEqual(len(results), 4)
+        for row in results:
+            self.assertEqual(row["images"], 1)
+            self.assertGreater(row["bytes"], 0)
+            self.assertGreaterEqual(row["encode_time"], 0)
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -105,7 +105,38 @@ class TestFileHandler(unittest.TestCase):
         # 检查是否获取了所有的测试图片，包括子目录中的
         for image_path in self.test_image_paths + self.subdir_image_paths:
             self.assertIn(image_path, files_recursive)
-            
+
+    def test_get_files_in_folder_no_duplicates(self):
+        """测试大写扩展名的文件只返回一次"""
+        upper_path = os.path.join(self.temp_dir.name, "UPPER.JPG")
+        Image.new('RGB', (10, 10)).save(upper_path, 'JPEG')
+
+        files = self.file_handler.get_files_in_folder(self.temp_dir.name)
+
+        self.assertEqual(files.count(upper_path), 1)
+        self.assertEqual(len(files), len(set(files)))
+
+    def test_iter_files_in_folder(self):
+        """测试逐个产出文件夹中的文件"""
+        iterator = self.file_handler.iter_files_in_folder(self.temp_dir.name, recursive=True)
+
+        # 生成器在列举完成之前就可以产出第一个文件
+        first = next(iterator)
+        self.assertIn(first, self.test_image_paths + self.subdir_image_paths)
+
+        remaining = list(iterator)
+        self.assertCountEqual([first] + remaining, self.test_image_paths + self.subdir_image_paths)
+
+    def test_iter_files_in_folder_parallel(self):
+        """测试并行递归遍历与单线程结果一致"""
+        serial = self.file_handler.get_files_in_folder(self.temp_dir.name, recursive=True)
+        parallel = self.file_handler.get_files_in_folder(self.temp_dir.name, recursive=True, max_workers=4)
+
+        self.assertCountEqual(serial, parallel)
+
+        # 不存在的文件夹返回空列表
+        self.assertEqual(self.file_handler.get_files_in_folder(os.path.join(self.temp_dir.name, "missing")), [])
+
     def test_select_output_folder(self):
         """测试选择输出文件夹
         注意：这个测试需要模拟QFileDialog的行为，实际测试中可能需要使用测试框架如pytest-qt
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+文件夹监视模块测试
+"""
+
+import unittest
+import os
+import time
+import shutil
+import tempfile
+import threading
+from PIL import Image
+
+from core.folder_watcher import FolderWatcher
+
+
+class TestFolderWatcher(unittest.TestCase):
+    """文件夹监视模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.batches = []
+        self.received = threading.Event()
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _on_batch(self, paths):
+        """记录收到的批次"""
+        self.batches.append(list(paths))
+        self.received.set()
+
+    def _start_watcher(self, use_inotify, **kwargs):
+        """在后台线程中启动监视器"""
+        watcher = FolderWatcher(
+            self.temp_dir.name, self._on_batch,
+            poll_interval=0.05, settle_time=0.1, debounce=0.05,
+            use_inotify=use_inotify, **kwargs
+        )
+        thread = threading.Thread(target=watcher.run, daemon=True)
+        thread.start()
+        # 等待初始扫描完成
+        time.sleep(0.2)
+        return watcher, thread
+
+    def _create_image(self, name):
+        """创建测试图片"""
+        path = os.path.join(self.temp_dir.name, name)
+        Image.new('RGB', (20, 20), color='white').save(path)
+        return path
+
+    def _check_new_file_detected(self, use_inotify):
+        """检查新文件会被发现并只提交一次"""
+        watcher, thread = self._start_watcher(use_inotify)
+        try:
+            image_path = self._create_image("new.JPG")
+            # 非图片文件应该被忽略
+            with open(os.path.join(self.temp_dir.name, "notes.txt"), 'w') as f:
+                f.write("ignored")
+
+            self.assertTrue(self.received.wait(5))
+            time.sleep(0.3)
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        all_paths = [path for batch in self.batches for path in batch]
+        self.assertEqual(all_paths, [image_path])
+
+    def test_polling_detects_new_file(self):
+        """测试轮询模式发现新文件"""
+        self._check_new_file_detected(use_inotify=False)
+
+    def test_inotify_detects_new_file(self):
+        """测试inotify模式发现新文件"""
+        self._check_new_file_detected(use_inotify=True)
+
+    def _check_deleted_files_forgotten(self, use_inotify):
+        """检查删除的文件和目录不再保留在已处理记录中"""
+        sub_dir = os.path.join(self.temp_dir.name, "sub")
+        os.makedirs(sub_dir)
+        watcher, thread = self._start_watcher(use_inotify, recursive=True)
+        try:
+            image_path = self._create_image("deleted.png")
+            nested_path = self._create_image(os.path.join("sub", "nested.png"))
+            deadline = time.time() + 5
+            while len(watcher._processed) < 2 and time.time() < deadline:
+                time.sleep(0.05)
+            self.assertEqual(sorted(watcher._processed), sorted([image_path, nested_path]))
+
+            os.remove(image_path)
+            shutil.rmtree(sub_dir)
+            deadline = time.time() + 5
+            while watcher._processed and time.time() < deadline:
+                time.sleep(0.05)
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        self.assertEqual(watcher._processed, {})
+
+    def test_polling_forgets_deleted_files(self):
+        """测试轮询模式移除已删除文件的记录"""
+        self._check_deleted_files_forgotten(use_inotify=False)
+
+    def test_inotify_forgets_deleted_files(self):
+        """测试inotify模式移除已删除文件的记录"""
+        self._check_deleted_files_forgotten(use_inotify=True)
+
+    def test_inotify_falls_back_when_folder_moved(self):
+        """测试监视的文件夹被移走后改为轮询，在原路径重新出现后继续发现新文件"""
+        watched_dir = os.path.join(self.temp_dir.name, "watched")
+        os.makedirs(watched_dir)
+        watcher = FolderWatcher(
+            watched_dir, self._on_batch,
+            poll_interval=0.05, settle_time=0.1, debounce=0.05, use_inotify=True
+        )
+        thread = threading.Thread(target=watcher.run, daemon=True)
+        thread.start()
+        try:
+            deadline = time.time() + 5
+            while watcher.backend_name != "inotify" and time.time() < deadline:
+                time.sleep(0.02)
+            if watcher.backend_name != "inotify":
+                self.skipTest("当前系统不支持inotify")
+
+            os.rename(watched_dir, os.path.join(self.temp_dir.name, "moved"))
+            deadline = time.time() + 5
+            while watcher.backend_name != "polling" and time.time() < deadline:
+                time.sleep(0.02)
+            self.assertEqual(watcher.backend_name, "polling")
+
+            os.makedirs(watched_dir)
+            image_path = self._create_image(os.path.join("watched", "after.png"))
+            self.assertTrue(self.received.wait(5))
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertEqual([path for batch in self.batches for path in batch], [image_path])
+
+    def test_existing_files_skipped_by_default(self):
+        """测试默认不处理已存在的文件"""
+        self._create_image("existing.png")
+        watcher, thread = self._start_watcher(use_inotify=False)
+        time.sleep(0.3)
+        watcher.stop()
+        thread.join(5)
+
+        self.assertEqual(self.batches, [])
+
+    def test_waits_until_file_is_stable(self):
+        """测试文件仍在写入时不会被提交"""
+        watcher, thread = self._start_watcher(use_inotify=False)
+        path = os.path.join(self.temp_dir.name, "slow.png")
+        try:
+            with open(path, 'wb') as f:
+                for _ in range(4):
+                    f.write(b"x" * 1024)
+                    f.flush()
+                    os.utime(path)
+                    time.sleep(0.06)
+                    self.assertEqual(self.batches, [])
+            self.assertTrue(self.received.wait(5))
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        self.assertEqual(self.batches, [[path]])
+
+    def test_excluded_folder_ignored(self):
+        """测试排除的文件夹不会被处理"""
+        output_dir = os.path.join(self.temp_dir.name, "output")
+        os.makedirs(output_dir)
+        watcher, thread = self._start_watcher(
+            use_inotify=False, recursive=True, exclude_folders=[output_dir]
+        )
+        try:
+            Image.new('RGB', (20, 20)).save(os.path.join(output_dir, "result.png"))
+            image_path = self._create_image("input.png")
+            self.assertTrue(self.received.wait(5))
+            time.sleep(0.3)
+        finally:
+            watcher.stop()
+            thread.join(5)
+
+        all_paths = [path for batch in self.batches for path in batch]
+        self.assertEqual(all_paths, [image_path])
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
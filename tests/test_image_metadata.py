@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+图片元数据模块测试
+"""
+
+import unittest
+import io
+import os
+import tempfile
+from PIL import Image
+
+from core.image_metadata import ImageMetadata, make_exif_thumbnail, _append_thumbnail_ifd
+from core.watermark import Watermark
+
+
+class TestImageMetadata(unittest.TestCase):
+    """图片元数据模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.test_image_path = os.path.join(self.temp_dir.name, "camera.jpg")
+
+        # 模拟相机输出：带方向、厂商、缩略图、ICC和XMP
+        source = Image.new('RGB', (300, 200), color='white')
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = "TestCamera"
+        exif_bytes = _append_thumbnail_ifd(exif.tobytes(), make_exif_thumbnail(source))
+        source.save(self.test_image_path, exif=exif_bytes, icc_profile=b"test-icc",
+                    xmp=b"<x:xmpmeta>test</x:xmpmeta>")
+
+        self.watermark = Watermark()
+        self.watermark.set_text("TEST")
+        self.watermark.set_color(0, 0, 0, 100)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _read_thumbnail(self, image):
+        """读取EXIF缩略图"""
+        thumbnail_ifd = image.getexif().get_ifd(-1)
+        tiff = image.info["exif"][6:]
+        offset = thumbnail_ifd[0x0201]
+        return Image.open(io.BytesIO(tiff[offset:offset + thumbnail_ifd[0x0202]]))
+
+    def test_from_image(self):
+        """测试从打开的图片读取元数据"""
+        with Image.open(self.test_image_path) as img:
+            metadata = ImageMetadata.from_image(img)
+
+        self.assertEqual(metadata.orientation, 6)
+        self.assertEqual(metadata.icc_profile, b"test-icc")
+        self.assertTrue(metadata.has_thumbnail)
+        self.assertIn(b"xmpmeta", metadata.xmp)
+
+    def test_export_preserves_metadata(self):
+        """测试导出时保留元数据，并把方向转正"""
+        for ext in (".jpg", ".png", ".webp"):
+            output_path = os.path.join(self.temp_dir.name, f"output{ext}")
+            self.watermark.add_watermark(self.test_image_path, output_path)
+
+            with Image.open(output_path) as img:
+                exif = img.getexif()
+                # 像素已转正，方向标记重置为1
+                self.assertEqual(img.size, (200, 300))
+                self.assertEqual(exif.get(0x0112), 1)
+                self.assertEqual(exif.get(0x010F), "TestCamera")
+                self.assertEqual(img.info.get("icc_profile"), b"test-icc")
+
+    def test_thumbnail_regenerated(self):
+        """测试EXIF缩略图由带水印的图像重新生成"""
+        output_path = os.path.join(self.temp_dir.name, "output.jpg")
+        self.watermark.add_watermark(self.test_image_path, output_path)
+
+        with Image.open(output_path) as img:
+            thumbnail = self._read_thumbnail(img)
+
+        # 与转正后的图像方向一致，并且包含水印（不再是纯白）
+        self.assertLess(thumbnail.width, thumbnail.height)
+        self.assertLess(thumbnail.convert('L').getextrema()[0], 255)
+
+    def test_no_metadata(self):
+        """测试没有元数据的图片"""
+        plain_path = os.path.join(self.temp_dir.name, "plain.png")
+        Image.new('RGB', (50, 50)).save(plain_path)
+
+        with Image.open(plain_path) as img:
+            metadata = ImageMetadata.from_image(img)
+
+        self.assertEqual(metadata.orientation, 1)
+        self.assertEqual(metadata.get_save_options("PNG"), {})
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -258,7 +258,57 @@ class TestImageProcessor(unittest.TestCase):
         self.image_processor.load_image(self.test_image_paths[0])
         self.assertEqual(len(self.image_processor.get_loaded_images()), 1)
         self.assertEqual(self.image_processor.get_loaded_images()[0], self.test_image_paths[0])
-        
+
+    def test_add_image_paths(self):
+        """测试登记图片路径而不解码"""
+        unsupported_path = os.path.join(self.temp_dir.name, "notes.txt")
+        added = self.image_processor.add_image_paths(self.test_image_paths + [unsupported_path])
+
+        # 不支持的格式被跳过，第一张成为当前图片
+        self.assertEqual(added, self.test_image_paths)
+        self.assertEqual(self.image_processor.current_image_index, 0)
+
+        # 重复登记不会产生重复项
+        self.assertEqual(self.image_processor.add_image_paths(self.test_image_paths[:1]), [])
+        self.assertEqual(self.image_processor.get_loaded_images(), self.test_image_paths)
+
+        # 移除后可以重新登记
+        self.image_processor.remove_image(0)
+        self.assertEqual(self.image_processor.add_image_paths(self.test_image_paths[:1]), self.test_image_paths[:1])
+
+    def test_probe_image(self):
+        """测试只读取文件头获取图片信息"""
+        # 创建带EXIF方向和ICC配置的JPEG
+        image_path = os.path.join(self.temp_dir.name, "rotated.jpg")
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (300, 200)).save(image_path, exif=exif.tobytes(), icc_profile=b"fake-icc")
+
+        info = self.image_processor.probe_image(image_path)
+
+        self.assertEqual((info['width'], info['height']), (300, 200))
+        self.assertEqual((info['display_width'], info['display_height']), (200, 300))
+        self.assertEqual(info['format'], 'JPEG')
+        self.assertEqual(info['mode'], 'RGB')
+        self.assertEqual(info['orientation'], 6)
+        self.assertTrue(info['has_icc'])
+
+        # 探测不会把图片登记到已加载列表
+        self.assertEqual(self.image_processor.get_loaded_images(), [])
+
+    def test_probe_images(self):
+        """测试批量并行探测"""
+        invalid_path = os.path.join(self.temp_dir.name, "missing.png")
+        infos = self.image_processor.probe_images(self.test_image_paths + [invalid_path], max_workers=4)
+
+        self.assertEqual(len(infos), len(self.test_image_paths) + 1)
+        for image_path, info in zip(self.test_image_paths, infos):
+            self.assertEqual(info['path'], image_path)
+            self.assertEqual((info['width'], info['height']), (200, 200))
+            self.assertEqual(info['orientation'], 1)
+            self.assertFalse(info['has_icc'])
+        self.assertIsNone(infos[-1])
+
 
 # 导入必要的模块（之前的代码中忘记导入ImageDraw）
 from PIL import ImageDraw
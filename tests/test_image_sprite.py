@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+图片水印图块模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image, ImageDraw
+
+from core.image_sprite import LogoSource, render_image_sprite
+from core.stage_timer import StageTimer
+from core.watermark import Watermark
+
+
+class TestImageSprite(unittest.TestCase):
+    """图片水印图块模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.logo_path = os.path.join(self.temp_dir.name, "logo.png")
+        logo = Image.new('RGBA', (400, 200), (0, 0, 0, 0))
+        ImageDraw.Draw(logo).rectangle((0, 0, 399, 199), fill=(255, 0, 0, 255))
+        logo.save(self.logo_path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_mip_levels(self):
+        """测试金字塔逐级缩小，缩放时选择不小于目标的最小一层"""
+        source = LogoSource(self.logo_path)
+
+        self.assertEqual([level.size for level in source.levels[:3]], [(400, 200), (200, 100), (100, 50)])
+        self.assertEqual(source.get_level(150).size, (200, 100))
+        self.assertEqual(source.get_level(100).size, (100, 50))
+        self.assertEqual(source.get_level(800).size, (400, 200))
+        self.assertEqual(source.scaled(150).size, (150, 75))
+
+    def test_render_opacity_and_rotation(self):
+        """测试透明度和旋转"""
+        source = LogoSource(self.logo_path)
+        sprite = render_image_sprite(source, 100, opacity=50)
+
+        self.assertEqual(sprite.size, (100, 50))
+        self.assertEqual(sprite.getpixel((50, 25)), (255, 0, 0, 127))
+
+        for resample in ("bicubic", "supersample"):
+            rotated = render_image_sprite(source, 100, rotation=90, resample=resample)
+            self.assertAlmostEqual(rotated.width, 50, delta=2)
+            self.assertAlmostEqual(rotated.height, 100, delta=2)
+            # 预乘后旋转，边缘不会混入透明像素的黑色
+            r, g, b, a = rotated.getpixel((rotated.width // 2, 0))
+            if a > 0:
+                self.assertGreater(r, 200)
+
+    def test_watermark_with_logo(self):
+        """测试图片水印使用与文本相同的布局和缓存"""
+        paths = []
+        for i, width in enumerate((400, 410, 1600)):
+            path = os.path.join(self.temp_dir.name, f"input{i}.png")
+            Image.new('RGB', (width, width), color='white').save(path)
+            paths.append(path)
+
+        timer = StageTimer()
+        watermark = Watermark()
+        watermark.set_image(self.logo_path)
+        watermark.set_relative_size("width", 0.25)
+        watermark.set_position("top_left")
+        watermark.set_margin(0)
+        watermark.set_stage_timer(timer)
+        plan = watermark.plan_batch(paths)
+        result = watermark.add_watermark(paths[0])
+
+        self.assertEqual(plan[0]["rect"], (0, 0, 102, 51))
+        self.assertEqual(plan[2]["rect"][2], 406)
+        self.assertEqual(result.getpixel((10, 10))[0], 255)
+        self.assertLess(result.getpixel((10, 10))[1], 255)
+        self.assertEqual(timer.summary()["render"]["count"], 2)
+
+        watermark.set_image(None)
+        with self.assertRaises(ValueError):
+            watermark.add_watermark(paths[0])
+
+    def test_template_round_trip(self):
+        """测试图片水印保存到模板并重新加载"""
+        template_path = os.path.join(self.temp_dir.name, "template.json")
+        watermark = Watermark()
+        watermark.set_image(self.logo_path, scale=0.5)
+        watermark.save_template("logo", template_path)
+
+        loaded = Watermark()
+        loaded.load_template(template_path)
+
+        self.assertEqual(loaded.watermark_type, "image")
+        self.assertEqual(loaded.image_scale, 0.5)
+        self.assertEqual(loaded.get_layout_size((1000, 1000))[0], 200)
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+JPEG区域重编码模块测试
+"""
+
+import unittest
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock
+from PIL import Image, ImageChops, JpegImagePlugin
+
+from core.encoder_profiles import get_encoder_profile
+from core.jpeg_region import JpegRegionEncoder, replace_app1_exif
+from core.watermark import Watermark
+
+
+class TestJpegRegionEncoder(unittest.TestCase):
+    """JPEG区域重编码模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.encoder = JpegRegionEncoder()
+
+        # 4:2:0采样的JPEG，MCU为16x16
+        self.test_image_path = os.path.join(self.temp_dir.name, "photo.jpg")
+        source = Image.effect_mandelbrot((320, 240), (-2, -1.2, 1, 1.2), 64).convert('RGB')
+        source.save(self.test_image_path, quality=85, subsampling=2)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_mcu_size(self):
+        """测试MCU尺寸"""
+        with Image.open(self.test_image_path) as img:
+            self.assertEqual(self.encoder.get_mcu_size(img), (16, 16))
+
+        gray_path = os.path.join(self.temp_dir.name, "gray.jpg")
+        Image.new('L', (32, 32)).save(gray_path)
+        with Image.open(gray_path) as img:
+            self.assertEqual(self.encoder.get_mcu_size(img), (8, 8))
+
+    def test_align_box(self):
+        """测试区域对齐到MCU边界"""
+        self.assertEqual(self.encoder.align_box((20, 5, 40, 30), (16, 16), (320, 240)), (16, 0, 48, 32))
+        # 右下边缘不超出图片
+        self.assertEqual(self.encoder.align_box((300, 230, 400, 300), (16, 16), (310, 235)), (288, 224, 310, 235))
+        # 完全在图片外
+        self.assertIsNone(self.encoder.align_box((400, 400, 500, 500), (16, 16), (320, 240)))
+
+    def test_source_options(self):
+        """测试沿用源图量化表和采样方式"""
+        with Image.open(self.test_image_path) as img:
+            options = self.encoder.get_source_options(img)
+        self.assertEqual(options["subsampling"], 2)
+        self.assertEqual(len(options["qtables"]), 2)
+
+        png_path = os.path.join(self.temp_dir.name, "image.png")
+        Image.new('RGB', (16, 16)).save(png_path)
+        with Image.open(png_path) as img:
+            self.assertEqual(self.encoder.get_source_options(img), {})
+
+    def test_replace_app1_exif(self):
+        """测试替换EXIF段"""
+        exif = Image.Exif()
+        exif[0x010F] = "Old"
+        jpeg_path = os.path.join(self.temp_dir.name, "exif.jpg")
+        Image.new('RGB', (16, 16)).save(jpeg_path, exif=exif.tobytes())
+
+        exif[0x010F] = "New camera"
+        with open(jpeg_path, "rb") as f:
+            data = replace_app1_exif(f.read(), exif.tobytes())
+        with open(jpeg_path, "wb") as f:
+            f.write(data)
+
+        with Image.open(jpeg_path) as img:
+            self.assertEqual(img.getexif()[0x010F], "New camera")
+            img.load()
+
+    def test_fallback_without_jpegtran(self):
+        """测试没有jpegtran时回退到整图编码"""
+        self.encoder.jpegtran_path = None
+        watermark = Watermark()
+        watermark.jpeg_region_encoder = self.encoder
+        watermark.set_text("TEST")
+        output_path = os.path.join(self.temp_dir.name, "output.jpg")
+
+        watermark.add_watermark(self.test_image_path, output_path)
+
+        with Image.open(output_path) as img:
+            self.assertEqual(img.size, (320, 240))
+
+    def test_fallback_follows_preset(self):
+        """测试整图编码时由编码预设决定量化表，不沿用源图量化表"""
+        self.encoder.jpegtran_path = None
+        with Image.open(self.test_image_path) as img:
+            source_tables = img.quantization
+
+        tables = {}
+        for preset in ("fast", "balanced", "smallest"):
+            watermark = Watermark()
+            watermark.jpeg_region_encoder = self.encoder
+            watermark.set_text("TEST")
+            watermark.set_encoder_preset(preset)
+            output_path = os.path.join(self.temp_dir.name, f"{preset}.jpg")
+            watermark.add_watermark(self.test_image_path, output_path)
+
+            # 与直接按预设质量编码得到的量化表相同
+            expected_path = os.path.join(self.temp_dir.name, f"{preset}_expected.jpg")
+            options = get_encoder_profile(preset).get_save_options("JPEG")
+            Image.new('RGB', (16, 16)).save(expected_path, quality=options["quality"])
+            with Image.open(output_path) as img, Image.open(expected_path) as expected:
+                self.assertEqual(img.quantization, expected.quantization)
+                tables[preset] = img.quantization
+        self.assertNotEqual(tables["fast"], source_tables)
+        self.assertNotEqual(tables["fast"], tables["balanced"])
+
+    def test_region_encode_with_mocked_jpegtran(self):
+        """测试区域重编码流程，用Pillow模拟jpegtran的-crop和-drop"""
+        with Image.open(self.test_image_path) as img:
+            source_tables = img.quantization
+        patches = []
+
+        def fake_jpegtran(args):
+            outfile = args[args.index("-outfile") + 1]
+            if "-crop" in args:
+                size, left, top = re.match(r"(\d+x\d+)\+(\d+)\+(\d+)", args[args.index("-crop") + 1]).groups()
+                width, height = map(int, size.split("x"))
+                with Image.open(args[-1]) as source:
+                    source.crop((int(left), int(top), int(left) + width, int(top) + height)).save(outfile, quality=100)
+            elif "-drop" in args:
+                left, top = map(int, args[args.index("-drop") + 1].strip("+").split("+"))
+                patch_path = args[args.index("-drop") + 2]
+                with Image.open(patch_path) as patch, Image.open(args[-1]) as source:
+                    patches.append((patch.quantization, JpegImagePlugin.get_sampling(patch), patch.size))
+                    result = source.convert("RGB")
+                    result.paste(patch, (left, top))
+                    result.save(outfile, qtables=[source_tables[key] for key in sorted(source_tables)])
+            else:
+                shutil.copyfile(args[-1], outfile)
+
+        self.encoder.jpegtran_path = "jpegtran"
+        watermark = Watermark()
+        watermark.jpeg_region_encoder = self.encoder
+        watermark.set_text("TEST")
+        watermark.set_position("top_left")
+        watermark.set_encoder_preset("fast")
+        output_path = os.path.join(self.temp_dir.name, "output.jpg")
+
+        with mock.patch.object(self.encoder, "_run_jpegtran", side_effect=fake_jpegtran), \
+                mock.patch.object(watermark, "_composite", wraps=watermark._composite) as composite:
+            watermark.add_watermark(self.test_image_path, output_path)
+
+        # 只编码了一个MCU对齐的小区域，量化表和采样方式与源图一致
+        self.assertEqual(len(patches), 1)
+        quantization, sampling, size = patches[0]
+        self.assertEqual(quantization, source_tables)
+        self.assertEqual(sampling, 2)
+        self.assertEqual((size[0] % 16, size[1] % 16), (0, 0))
+        self.assertLess(size[0] * size[1], 320 * 240)
+        with Image.open(self.test_image_path) as source, Image.open(output_path) as output:
+            self.assertEqual(output.size, (320, 240))
+            self.assertIsNotNone(ImageChops.difference(source, output).getbbox())
+        # 没有回退到整图合成和重新编码
+        composite.assert_not_called()
+
+    @unittest.skipUnless(JpegRegionEncoder().is_available(), "需要支持-drop的jpegtran")
+    def test_untouched_blocks_bit_exact(self):
+        """测试水印区域外的像素与原图完全一致"""
+        watermark = Watermark()
+        watermark.set_text("TEST")
+        watermark.set_position("top_left")
+        output_path = os.path.join(self.temp_dir.name, "output.jpg")
+
+        watermark.add_watermark(self.test_image_path, output_path)
+
+        with Image.open(self.test_image_path) as source, Image.open(output_path) as output:
+            # 左上角之外（下半部分）的解码结果完全相同
+            box = (0, 128, 320, 240)
+            diff = ImageChops.difference(source.crop(box), output.crop(box))
+            self.assertIsNone(diff.getbbox())
+            # 水印区域发生了变化
+            self.assertIsNotNone(ImageChops.difference(source, output).getbbox())
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
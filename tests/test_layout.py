@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+水印布局模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from unittest import mock
+from PIL import Image, ImageFile
+
+from core.layout import compute_placement, is_overflowing, oriented_size, plan_layout, read_image_size
+from core.watermark import Watermark
+
+
+class TestLayout(unittest.TestCase):
+    """水印布局模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_anchor_positions(self):
+        """测试预设位置"""
+        image_size = (200, 100)
+        sprite_size = (50, 20)
+
+        self.assertEqual(compute_placement(image_size, sprite_size, "top_left"), (10, 10, 60, 30))
+        self.assertEqual(compute_placement(image_size, sprite_size, "center"), (75, 40, 125, 60))
+        self.assertEqual(compute_placement(image_size, sprite_size, "bottom_right"), (140, 70, 190, 90))
+        self.assertEqual(compute_placement(image_size, sprite_size, "middle_left", margin=0), (0, 40, 50, 60))
+        # 未知的预设位置按居中处理
+        self.assertEqual(compute_placement(image_size, sprite_size, "unknown"), (75, 40, 125, 60))
+
+    def test_custom_and_relative_positions(self):
+        """测试绝对坐标和相对坐标"""
+        image_size = (200, 100)
+        sprite_size = (50, 20)
+
+        self.assertEqual(compute_placement(image_size, sprite_size, (5, 7)), (5, 7, 55, 27))
+        self.assertEqual(compute_placement(image_size, sprite_size, [0.5, 0.5]),
+                         compute_placement(image_size, sprite_size, "center"))
+        self.assertEqual(compute_placement(image_size, sprite_size, (1.0, 0.0)),
+                         compute_placement(image_size, sprite_size, "top_right"))
+        # 大于1的浮点数按绝对坐标处理
+        self.assertEqual(compute_placement(image_size, sprite_size, (30.0, 2.0)), (30, 2, 80, 22))
+
+    def test_overflow(self):
+        """测试超出范围的检查"""
+        self.assertFalse(is_overflowing((10, 10, 60, 30), (200, 100)))
+        self.assertTrue(is_overflowing((-1, 10, 60, 30), (200, 100)))
+        self.assertTrue(compute_placement((40, 40), (50, 20), "center")[0] < 0)
+
+    def test_header_size_with_orientation(self):
+        """测试只读文件头获取转正后的尺寸"""
+        path = os.path.join(self.temp_dir.name, "rotated.jpg")
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (120, 80), color='white').save(path, exif=exif)
+
+        self.assertEqual(oriented_size((120, 80), 6), (80, 120))
+        self.assertEqual(read_image_size(path), (80, 120))
+
+    def test_plan_layout(self):
+        """测试为一批图片预先计算位置"""
+        small_path = os.path.join(self.temp_dir.name, "small.png")
+        large_path = os.path.join(self.temp_dir.name, "large.png")
+        Image.new('RGB', (30, 30), color='white').save(small_path)
+        Image.new('RGB', (300, 300), color='white').save(large_path)
+        missing_path = os.path.join(self.temp_dir.name, "missing.png")
+
+        plan = plan_layout([small_path, large_path, missing_path],
+                           lambda size: compute_placement(size, (50, 20), "center"))
+
+        self.assertTrue(plan[0]["overflow"])
+        self.assertFalse(plan[1]["overflow"])
+        self.assertEqual(plan[1]["rect"], (125, 140, 175, 160))
+        self.assertIsNotNone(plan[2]["error"])
+        self.assertIsNone(plan[2]["rect"])
+
+    def test_plan_batch_does_not_decode_png(self):
+        """测试为PNG预先计算位置时只读取文件头，不解码像素"""
+        path = os.path.join(self.temp_dir.name, "plain.png")
+        Image.new('RGB', (400, 300), color='white').save(path)
+        watermark = Watermark()
+        watermark.set_text("TEST")
+
+        with mock.patch.object(ImageFile.ImageFile, "load", autospec=True,
+                               side_effect=ImageFile.ImageFile.load) as load:
+            plan = watermark.plan_batch([path])
+        self.assertEqual(load.call_count, 0)
+        self.assertEqual(plan[0]["image_size"], (400, 300))
+
+    def test_watermark_uses_planned_position(self):
+        """测试添加水印的位置与预先计算的位置一致"""
+        path = os.path.join(self.temp_dir.name, "input.png")
+        Image.new('RGB', (300, 200), color='white').save(path)
+        watermark = Watermark()
+        watermark.set_text("TEST")
+        watermark.set_color(0, 0, 0, 100)
+        watermark.set_position("bottom_right")
+        watermark.set_margin(5)
+
+        rect = watermark.plan_batch([path])[0]["rect"]
+        result = watermark.add_watermark(path)
+        changed = result.convert("L").point(lambda value: 255 if value < 255 else 0).getbbox()
+
+        self.assertEqual(rect[2:], (295, 195))
+        self.assertTrue(rect[0] <= changed[0] and rect[1] <= changed[1])
+        self.assertTrue(changed[2] <= rect[2] and changed[3] <= rect[3])
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+内存跟踪模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image
+
+from core.memory_tracker import MemoryTracker, get_current_rss_mb, get_peak_rss_mb
+from core.batch_processor import BatchProcessor
+from core.stage_timer import StageTimer
+from core.watermark import Watermark
+
+
+@unittest.skipIf(get_current_rss_mb() is None, "无法读取进程内存")
+class TestMemoryTracker(unittest.TestCase):
+    """内存跟踪模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.temp_dir.name, "input.png")
+        Image.new('RGB', (64, 64), color='white').save(self.input_path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def test_scope_records_peak(self):
+        """测试范围内的内存增长被记录为峰值"""
+        tracker = MemoryTracker(interval=0.001)
+        tracker.start()
+        try:
+            with tracker.scope("image", "big.png") as scope:
+                buffer = bytearray(64 * 1024 * 1024)
+                buffer[::4096] = b"\x01" * len(buffer[::4096])
+                del buffer
+            with tracker.scope("image", "small.png"):
+                pass
+        finally:
+            tracker.stop()
+
+        self.assertGreaterEqual(scope.record["delta_mb"], 32)
+        self.assertLessEqual(get_current_rss_mb(), get_peak_rss_mb())
+        largest = tracker.largest_images(1)
+        self.assertEqual(largest[0]["name"], "big.png")
+        self.assertIn("big.png", tracker.format_report())
+
+        tracker.reset()
+        self.assertEqual(tracker.largest_images(), [])
+        self.assertEqual(tracker.format_report(), "")
+
+    def test_tracemalloc_attribution(self):
+        """测试调试模式下记录Python分配量和分配位置"""
+        tracker = MemoryTracker(interval=0.001, trace_python=True)
+        tracker.start()
+        try:
+            with tracker.scope("image", "debug.png") as scope:
+                data = [bytes(1024) for _ in range(16 * 1024)]
+                del data
+        finally:
+            tracker.stop()
+
+        self.assertGreaterEqual(scope.record["python_peak_mb"], 10)
+        self.assertIn("Python分配", tracker.format_report())
+
+    def test_batch_processor_and_stages(self):
+        """测试批量处理器和阶段计时器记录每张图片和每个阶段的内存"""
+        tracker = MemoryTracker()
+        tracker.start()
+        watermark = Watermark()
+        watermark.set_text("TEST")
+        watermark.set_stage_timer(StageTimer(memory_tracker=tracker))
+        processor = BatchProcessor(watermark, max_workers=1, memory_tracker=tracker)
+        try:
+            result = processor.process_file(self.input_path, os.path.join(self.temp_dir.name, "out.png"))
+        finally:
+            processor.shutdown()
+            tracker.stop()
+
+        self.assertTrue(result["success"])
+        self.assertGreater(result["peak_rss_mb"], 0)
+        self.assertEqual(len(tracker.largest_images()), 1)
+        stages = tracker.stage_summary()
+        self.assertIn("encode", stages)
+        self.assertEqual(stages["total"]["count"], 1)
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
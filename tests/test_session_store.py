@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+会话保存模块测试
+"""
+
+import unittest
+import os
+import gzip
+import tempfile
+
+from core.session_store import SessionStore, ThumbnailCache, file_stamp
+
+
+class TestSessionStore(unittest.TestCase):
+    """会话保存模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.session = SessionStore(os.path.join(self.temp_dir.name, "session.json.gz"))
+        self.cache = ThumbnailCache(os.path.join(self.temp_dir.name, "thumbnails.db"), max_entries=2)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_session_round_trip(self):
+        """测试保存和恢复会话"""
+        images = [
+            {"path": "/a.jpg", "mtime_ns": 1, "size": 2, "width": 30, "height": 20, "format": "JPEG"},
+            {"path": "/b.png"}
+        ]
+        self.session.save(images, "/b.png", {"text": "水印"})
+        loaded = self.session.load()
+
+        self.assertEqual(loaded["current"], "/b.png")
+        self.assertEqual(loaded["watermark"], {"text": "水印"})
+        self.assertEqual(loaded["images"][0]["width"], 30)
+        self.assertEqual(loaded["images"][0]["orientation"], None)
+        self.assertEqual(loaded["images"][1]["path"], "/b.png")
+
+    def test_invalid_session(self):
+        """测试没有会话或会话文件损坏时返回None"""
+        self.assertIsNone(self.session.load())
+        with gzip.open(self.session.path, "wt") as f:
+            f.write("{broken")
+        self.assertIsNone(self.session.load())
+        self.session.clear()
+        self.assertFalse(os.path.exists(self.session.path))
+
+    def test_thumbnail_cache_validates_stamp(self):
+        """测试文件修改时间或大小变化后缓存失效"""
+        path = os.path.join(self.temp_dir.name, "image.png")
+        with open(path, "wb") as f:
+            f.write(b"1234")
+        stamp = file_stamp(path)
+        self.cache.put_many([(path, stamp, 80, {"width": 10}, b"png")])
+
+        self.assertEqual(self.cache.get(path, stamp, 80), ({"width": 10}, b"png"))
+        self.assertIsNone(self.cache.get(path, stamp, 120))
+        self.assertIsNone(self.cache.get(path, (stamp[0] + 1, stamp[1]), 80))
+        self.assertIsNone(file_stamp(os.path.join(self.temp_dir.name, "missing.png")))
+
+    def test_prune_keeps_recently_used(self):
+        """测试超出条目数时删除最久未使用的缩略图"""
+        for name in ("a", "b", "c"):
+            self.cache.put_many([(name, (1, 1), 80, {}, b"png")])
+        self.cache.touch(["a"])
+
+        self.assertEqual(self.cache.prune(), 1)
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNotNone(self.cache.get("a", (1, 1), 80))
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
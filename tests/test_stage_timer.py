@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+阶段计时模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image
+
+from core.stage_timer import StageTimer, percentile
+from core.watermark import Watermark
+
+
+class TestStageTimer(unittest.TestCase):
+    """阶段计时模块测试类"""
+
+    def test_percentile(self):
+        """测试最近秩百分位数"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summary(self):
+        """测试汇总耗时分布"""
+        timer = StageTimer()
+        for ms in (10, 20, 30, 40):
+            timer.record("encode", ms / 1000)
+        timer.record("decode", 0.005)
+
+        summary = timer.summary()
+        # 已知阶段按流程顺序排列
+        self.assertEqual(list(summary), ["decode", "encode"])
+        self.assertEqual(summary["encode"]["count"], 4)
+        self.assertAlmostEqual(summary["encode"]["p50_ms"], 20)
+        self.assertAlmostEqual(summary["encode"]["max_ms"], 40)
+        self.assertAlmostEqual(summary["encode"]["total_ms"], 100)
+        self.assertIn("编码", timer.format_summary())
+
+        timer.reset()
+        self.assertEqual(timer.summary(), {})
+        self.assertEqual(timer.format_summary(), "")
+
+    def test_totals_survive_reset(self):
+        """测试累计次数和耗时不随reset()清空"""
+        timer = StageTimer()
+        timer.record("encode", 0.25)
+        timer.reset()
+        timer.record("encode", 0.5)
+        timer.record("decode", 0.125)
+
+        self.assertEqual(timer.summary()["encode"]["count"], 1)
+        self.assertEqual(timer.totals(), {"encode": (2, 0.75), "decode": (1, 0.125)})
+
+    def test_disabled(self):
+        """测试关闭时不记录"""
+        timer = StageTimer(enabled=False)
+        with timer.stage("decode"):
+            pass
+        self.assertEqual(timer.summary(), {})
+
+    def test_watermark_stages(self):
+        """测试添加水印时记录各阶段耗时"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = os.path.join(temp_dir, "input.png")
+            Image.new('RGB', (200, 100), color='white').save(image_path)
+
+            timer = StageTimer()
+            watermark = Watermark()
+            watermark.set_text("TEST")
+            watermark.set_stage_timer(timer)
+            watermark.add_watermark(image_path, os.path.join(temp_dir, "output.png"))
+
+        summary = timer.summary()
+        for stage in ("total", "open", "font", "render", "decode", "composite", "encode"):
+            self.assertEqual(summary[stage]["count"], 1)
+        self.assertGreaterEqual(summary["total"]["total_ms"], summary["encode"]["total_ms"])
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
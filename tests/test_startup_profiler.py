@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+启动耗时分析模块测试
+"""
+
+import unittest
+import os
+import sys
+import builtins
+import tempfile
+import subprocess
+
+from core.startup_profiler import StartupProfiler
+
+
+class TestStartupProfiler(unittest.TestCase):
+    """启动耗时分析模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        # 外层模块导入内层模块，内层模块导入时休眠一段时间
+        with open(os.path.join(self.temp_dir.name, "profiled_outer.py"), 'w', encoding='utf-8') as f:
+            f.write("import profiled_inner\n")
+        with open(os.path.join(self.temp_dir.name, "profiled_inner.py"), 'w', encoding='utf-8') as f:
+            f.write("import time\ntime.sleep(0.05)\n")
+        sys.path.insert(0, self.temp_dir.name)
+
+    def tearDown(self):
+        """测试后的清理"""
+        sys.path.remove(self.temp_dir.name)
+        for name in ("profiled_outer", "profiled_inner"):
+            sys.modules.pop(name, None)
+        self.temp_dir.cleanup()
+
+    def test_import_times(self):
+        """测试记录模块的自身耗时和累计耗时"""
+        original_import = builtins.__import__
+        profiler = StartupProfiler()
+        profiler.install()
+        try:
+            import profiled_outer  # noqa: F401
+        finally:
+            profiler.uninstall()
+
+        self.assertIs(builtins.__import__, original_import)
+        inner_self, inner_total = profiler.modules["profiled_inner"]
+        outer_self, outer_total = profiler.modules["profiled_outer"]
+        self.assertGreaterEqual(inner_self, 0.04)
+        self.assertGreaterEqual(outer_total, inner_total)
+        self.assertLess(outer_self, 0.04)
+        self.assertIn("profiled_inner", profiler.format_report())
+
+    def test_phases_and_marks(self):
+        """测试阶段计时和时间点"""
+        profiler = StartupProfiler()
+        with profiler.phase("创建主窗口"):
+            pass
+        profiler.mark("首个窗口")
+
+        self.assertEqual(profiler.phases[0][0], "创建主窗口")
+        self.assertIsNotNone(profiler.get_mark("首个窗口"))
+        self.assertIn("首个窗口", profiler.format_report())
+
+    def test_main_window_import_is_light(self):
+        """测试导入主窗口模块时不加载Pillow、水印渲染和会话模块"""
+        src_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+        code = (
+            "import sys; sys.path.insert(0, sys.argv[1]); import ui.main_window; "
+            "print(sorted(m for m in ('PIL', 'core.watermark', 'core.session_store', 'sqlite3') if m in sys.modules))"
+        )
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+        output = subprocess.run([sys.executable, "-c", code, src_dir], capture_output=True, text=True,
+                                env=env, check=True).stdout
+        self.assertEqual(output.strip(), "[]")
+
+    def test_disabled(self):
+        """测试关闭时不替换__import__也不记录"""
+        original_import = builtins.__import__
+        profiler = StartupProfiler(enabled=False)
+        profiler.install()
+        with profiler.phase("阶段"):
+            pass
+        profiler.mark("时间点")
+
+        self.assertIs(builtins.__import__, original_import)
+        self.assertEqual(profiler.phases, [])
+        self.assertEqual(profiler.marks, [])
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+分条带处理模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image, TiffImagePlugin
+
+from core.strip_processor import StripProcessor
+from core.watermark import Watermark
+
+
+class TestStripProcessor(unittest.TestCase):
+    """分条带处理模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.processor = StripProcessor()
+        # 宽度301使BMP每行带有填充字节
+        self.source = Image.effect_mandelbrot((301, 207), (-2, -1.2, 1, 1.2), 64).convert('RGB')
+
+        self.watermark = Watermark()
+        self.watermark.set_text("STRIP TEST")
+        self.watermark.set_color(255, 0, 0, 60)
+        self.watermark.set_position((20, 100))
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.temp_dir.cleanup()
+
+    def _save_striped_tiff(self, img, path):
+        """保存每条4行、共52个条带的未压缩TIFF"""
+        write_libtiff = TiffImagePlugin.WRITE_LIBTIFF
+        TiffImagePlugin.WRITE_LIBTIFF = True
+        try:
+            img.save(path, compression="raw", strip_size=4096)
+        finally:
+            TiffImagePlugin.WRITE_LIBTIFF = write_libtiff
+
+    def _assert_same_as_full_image(self, source_path, ext):
+        """分条带处理的结果应与整图处理完全一致"""
+        strip_path = os.path.join(self.temp_dir.name, f"strip{ext}")
+        full_path = os.path.join(self.temp_dir.name, f"full{ext}")
+
+        with Image.open(source_path) as img:
+            self.assertTrue(self.processor.can_process(img, img.format))
+
+        self.watermark.add_watermark(source_path, strip_path)
+        self.watermark.set_strip_mode(False)
+        self.watermark.add_watermark(source_path, full_path)
+
+        with Image.open(strip_path) as strip, Image.open(full_path) as full:
+            self.assertEqual(strip.size, full.size)
+            self.assertEqual(strip.convert('RGBA').tobytes(), full.convert('RGBA').tobytes())
+        with Image.open(source_path) as source, Image.open(strip_path) as strip:
+            self.assertNotEqual(source.convert('RGBA').tobytes(), strip.convert('RGBA').tobytes())
+
+    def test_bottom_up_bmp(self):
+        """测试自下而上存储、带行填充的BMP"""
+        source_path = os.path.join(self.temp_dir.name, "source.bmp")
+        self.source.save(source_path)
+        self._assert_same_as_full_image(source_path, ".bmp")
+
+    def test_striped_tiff(self):
+        """测试多条带TIFF，并限制每次读入的字节数"""
+        source_path = os.path.join(self.temp_dir.name, "source.tif")
+        self._save_striped_tiff(self.source, source_path)
+        with Image.open(source_path) as img:
+            self.assertGreater(len(img.tile), 1)
+
+        self.watermark.strip_processor = StripProcessor(max_band_bytes=2000)
+        self._assert_same_as_full_image(source_path, ".tif")
+
+    def test_rgba_tiff(self):
+        """测试带透明通道的TIFF"""
+        source_path = os.path.join(self.temp_dir.name, "source.tif")
+        rgba = self.source.convert('RGBA')
+        rgba.putalpha(200)
+        rgba.save(source_path, compression="raw")
+        self._assert_same_as_full_image(source_path, ".tif")
+
+    def test_unsupported(self):
+        """测试不能分条带处理的情况"""
+        png_path = os.path.join(self.temp_dir.name, "source.png")
+        lzw_path = os.path.join(self.temp_dir.name, "source.tif")
+        bmp_path = os.path.join(self.temp_dir.name, "source.bmp")
+        self.source.save(png_path)
+        self.source.save(lzw_path, compression="tiff_lzw")
+        self.source.save(bmp_path)
+
+        with Image.open(png_path) as img:
+            self.assertFalse(self.processor.can_process(img, "PNG"))
+        with Image.open(lzw_path) as img:
+            self.assertFalse(self.processor.can_process(img, "TIFF"))
+        with Image.open(bmp_path) as img:
+            # 输出格式不同或要求压缩时需要重新编码
+            self.assertFalse(self.processor.can_process(img, "PNG"))
+        self.source.save(lzw_path, compression="raw")
+        with Image.open(lzw_path) as img:
+            self.assertFalse(self.processor.can_process(img, "TIFF", {"compression": "tiff_adobe_deflate"}))
+
+    def test_watermark_outside_image(self):
+        """测试水印完全在图片之外时输出与原图一致"""
+        source_path = os.path.join(self.temp_dir.name, "source.bmp")
+        output_path = os.path.join(self.temp_dir.name, "output.bmp")
+        self.source.save(source_path)
+        self.watermark.set_position((1000, 1000))
+
+        self.watermark.add_watermark(source_path, output_path)
+
+        with open(source_path, "rb") as f1, open(output_path, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+模板索引模块测试
+"""
+
+import unittest
+import os
+import json
+import tempfile
+
+import core.template_index as template_index
+from core.template_index import TemplateIndex
+
+
+class TestTemplateIndex(unittest.TestCase):
+    """模板索引模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = self.temp_dir.name
+        self.index = TemplateIndex(self.folder)
+        # 测试中用固定的旧时间戳代替真实的修改时间，不需要等待
+        self.racy_seconds = template_index.RACY_SECONDS
+        template_index.RACY_SECONDS = 0
+
+    def tearDown(self):
+        """测试后的清理"""
+        template_index.RACY_SECONDS = self.racy_seconds
+        self.temp_dir.cleanup()
+
+    def _write(self, name, data, mtime_ns):
+        """写入模板文件并设置修改时间"""
+        path = os.path.join(self.folder, f"{name}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        os.utime(self.folder, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_list_names(self):
+        """测试文件夹变化后重新扫描"""
+        self._write("b", {"text": "B"}, 10 ** 18)
+        self._write("a", {"text": "A"}, 10 ** 18)
+        open(os.path.join(self.folder, "notes.txt"), 'w').close()
+        os.utime(self.folder, ns=(10 ** 18, 10 ** 18))
+
+        self.assertEqual(self.index.list_names(), ["a", "b"])
+
+        # 文件夹修改时间不变时使用缓存的列表
+        open(os.path.join(self.folder, "c.json"), 'w').close()
+        os.utime(self.folder, ns=(10 ** 18, 10 ** 18))
+        self.assertEqual(self.index.list_names(), ["a", "b"])
+
+        os.utime(self.folder, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+        self.assertEqual(self.index.list_names(), ["a", "b", "c"])
+
+    def test_get_uses_cache_until_file_changes(self):
+        """测试文件未变化时不重新读取"""
+        path = self._write("a", {"text": "AAA"}, 10 ** 18)
+        self.assertEqual(self.index.get("a")["text"], "AAA")
+
+        # 内容改变但修改时间和大小不变，说明返回的是缓存
+        self._write("a", {"text": "BBB"}, 10 ** 18)
+        self.assertEqual(self.index.get("a")["text"], "AAA")
+
+        os.utime(path, ns=(10 ** 18 + 1, 10 ** 18 + 1))
+        self.assertEqual(self.index.get("a")["text"], "BBB")
+
+        os.remove(path)
+        self.assertIsNone(self.index.get("a"))
+
+    def test_returns_copies(self):
+        """测试修改返回的数据不影响缓存"""
+        self._write("a", {"color": [1, 2, 3]}, 10 ** 18)
+        self.index.get("a")["color"].append(4)
+        self.assertEqual(self.index.get("a")["color"], [1, 2, 3])
+
+    def test_racy_timestamps_are_rechecked(self):
+        """测试刚修改过的文件每次都重新读取"""
+        template_index.RACY_SECONDS = self.racy_seconds
+        path = os.path.join(self.folder, "a.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"text": "AAA"}, f)
+        self.assertEqual(self.index.get("a")["text"], "AAA")
+
+        stat = os.stat(path)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"text": "BBB"}, f)
+        os.utime(path, ns=(stat.st_mtime_ns, stat.st_mtime_ns))
+        self.assertEqual(self.index.get("a")["text"], "BBB")
+
+    def test_put_and_invalidate(self):
+        """测试写入后直接更新缓存"""
+        self._write("a", {"text": "A"}, 10 ** 18)
+        self.index.put("a", {"text": "cached"})
+        self.assertEqual(self.index.get("a")["text"], "cached")
+
+        self.index.invalidate("a")
+        self.assertEqual(self.index.get("a")["text"], "A")
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
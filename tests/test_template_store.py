@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+模板数据库模块测试
+"""
+
+import unittest
+import os
+import json
+import tempfile
+
+from core.template_store import SqliteTemplateStore
+from core.template_manager import TemplateManager
+
+
+class TestTemplateStore(unittest.TestCase):
+    """模板数据库模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.temp_dir.name, "templates.db")
+        self.store = SqliteTemplateStore(self.db_path)
+
+    def tearDown(self):
+        """测试后的清理"""
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_save_load_and_list(self):
+        """测试保存、读取和列出模板"""
+        self.store.save("b", {"text": "B"})
+        self.store.save("a", {"text": "A", "color": [1, 2, 3]})
+        self.store.save("a", {"text": "AA"})
+
+        self.assertEqual(self.store.list_names(), ["a", "b"])
+        self.assertEqual(self.store.load("a"), {"text": "AA"})
+        self.assertIsNone(self.store.load("missing"))
+        self.assertEqual(len(self.store), 2)
+
+        # 重新打开数据库后数据仍然存在
+        self.store.close()
+        self.store = SqliteTemplateStore(self.db_path)
+        self.assertEqual(self.store.list_names(), ["a", "b"])
+
+    def test_search_by_name_and_tag(self):
+        """测试按名称和标签搜索"""
+        self.store.save("Client_A logo", {"tags": ["logo", "client"]})
+        self.store.save("client_b", {}, tags=["client"])
+        self.store.save("100%", {})
+
+        self.assertEqual(self.store.search("client"), ["Client_A logo", "client_b"])
+        self.assertEqual(self.store.search(tag="logo"), ["Client_A logo"])
+        self.assertEqual(self.store.search("_b", tag="client"), ["client_b"])
+        # 通配符按普通字符匹配
+        self.assertEqual(self.store.search("%"), ["100%"])
+        self.assertEqual(self.store.list_tags(), ["client", "logo"])
+
+    def test_rename_and_delete(self):
+        """测试重命名和删除时标签随之更新"""
+        self.store.save("a", {"text": "A"}, tags=["x"])
+        self.store.save("b", {"text": "B"})
+
+        self.assertFalse(self.store.rename("a", "b"))
+        self.assertTrue(self.store.rename("a", "c"))
+        self.assertEqual(self.store.search(tag="x"), ["c"])
+        self.assertTrue(self.store.rename("c", "b", overwrite=True))
+        self.assertEqual(self.store.list_names(), ["b"])
+        self.assertEqual(self.store.load("b"), {"text": "A"})
+
+        self.assertTrue(self.store.delete("b"))
+        self.assertFalse(self.store.delete("b"))
+        self.assertEqual(self.store.list_tags(), [])
+
+    def test_import_and_export_folder(self):
+        """测试从JSON模板文件夹导入并导出"""
+        source = os.path.join(self.temp_dir.name, "source")
+        os.makedirs(source)
+        for name, data in (("a", {"text": "A"}), ("b", {"text": "B", "tags": ["t"]})):
+            with open(os.path.join(source, f"{name}.json"), 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        with open(os.path.join(source, "broken.json"), 'w', encoding='utf-8') as f:
+            f.write("{")
+
+        self.store.save("a", {"text": "old"})
+        self.assertEqual(self.store.import_folder(source, overwrite=False), ["b"])
+        self.assertEqual(self.store.load("a"), {"text": "old"})
+        self.assertEqual(self.store.import_folder(source), ["a", "b"])
+        self.assertEqual(self.store.search(tag="t"), ["b"])
+
+        target = os.path.join(self.temp_dir.name, "target")
+        self.assertEqual(self.store.export_folder(target), ["a", "b"])
+        with open(os.path.join(target, "b.json"), 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {"text": "B", "tags": ["t"]})
+
+    def test_template_manager_backend(self):
+        """测试模板管理器使用数据库后端"""
+        folder = os.path.join(self.temp_dir.name, "templates")
+        os.makedirs(folder)
+        with open(os.path.join(folder, "existing.json"), 'w', encoding='utf-8') as f:
+            json.dump({"text": "E"}, f)
+
+        manager = TemplateManager()
+        manager.templates_folder = folder
+        self.assertTrue(manager.use_database(os.path.join(self.temp_dir.name, "manager.db")))
+        self.assertEqual(manager.get_all_templates(), ["existing"])
+
+        self.assertTrue(manager.save_template("new", {"text": "N", "tags": ["t"]}))
+        self.assertEqual(manager.load_template("new"), {"text": "N", "tags": ["t"]})
+        self.assertEqual(manager.search_templates(tag="t"), ["new"])
+        self.assertTrue(manager.rename_template("new", "renamed"))
+        self.assertEqual(manager.get_all_templates(), ["existing", "renamed"])
+        # 数据库中的模板不会写入模板文件夹
+        self.assertEqual(sorted(os.listdir(folder)), ["existing.json"])
+        manager.store.close()
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Photo-Watermark-2 - 图片水印工具
+文本水印图块模块测试
+"""
+
+import unittest
+import os
+import tempfile
+from PIL import Image, ImageFont
+
+from core.text_sprite import SpriteCache, render_text_sprite, measure_text, quantize_size
+from core.stage_timer import StageTimer
+from core.watermark import Watermark
+
+
+class TestTextSprite(unittest.TestCase):
+    """文本水印图块模块测试类"""
+
+    def setUp(self):
+        """测试前的设置"""
+        self.font = ImageFont.load_default()
+        self.color = (255, 0, 0, 200)
+
+    def test_unrotated_sprite(self):
+        """测试不旋转时图块与文本的边界框一致"""
+        sprite = render_text_sprite("TEST", self.font, self.color)
+        bbox = measure_text("TEST", self.font)
+
+        self.assertEqual(sprite.mode, "RGBA")
+        self.assertEqual(sprite.size, (bbox[2] - bbox[0], bbox[3] - bbox[1]))
+        # 透明度不超过颜色本身的透明度
+        self.assertGreater(sprite.getchannel("A").getextrema()[1], 150)
+        self.assertLessEqual(sprite.getchannel("A").getextrema()[1], 200)
+
+    def test_rotated_sprite_is_tight(self):
+        """测试旋转后的图块裁剪到文本的实际范围，且颜色不混入背景"""
+        for resample in ("bicubic", "supersample"):
+            sprite = render_text_sprite("WATERMARK", self.font, self.color, 45, resample)
+            # 四条边上都有文本像素，说明没有多余的透明边距
+            self.assertEqual(sprite.getchannel("A").getbbox(), (0, 0) + sprite.size)
+            self.assertEqual(sprite.convert("RGB").getcolors(), [(sprite.width * sprite.height, (255, 0, 0))])
+
+        square = render_text_sprite("WATERMARK", self.font, self.color, 90)
+        flat = render_text_sprite("WATERMARK", self.font, self.color, 0)
+        self.assertLessEqual(square.width, flat.height + 1)
+
+    def test_invalid_resample(self):
+        """测试未知的重采样方式"""
+        with self.assertRaises(ValueError):
+            render_text_sprite("TEST", self.font, self.color, 30, "nearest")
+
+    def test_cache_eviction(self):
+        """测试缓存超过容量时丢弃最早的条目"""
+        cache = SpriteCache(max_size=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_watermark_renders_once(self):
+        """测试设置不变时旋转水印只渲染一次"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            image_path = os.path.join(temp_dir, "input.png")
+            Image.new('RGB', (300, 200), color='white').save(image_path)
+
+            timer = StageTimer()
+            watermark = Watermark()
+            watermark.set_text("TEST")
+            watermark.set_color(0, 0, 0, 100)
+            watermark.set_rotation(30)
+            watermark.set_stage_timer(timer)
+            for i in range(3):
+                watermark.add_watermark(image_path, os.path.join(temp_dir, f"output{i}.png"))
+            watermark.set_resample("supersample")
+            watermark.add_watermark(image_path, os.path.join(temp_dir, "output3.png"))
+
+            with Image.open(os.path.join(temp_dir, "output0.png")) as output:
+                self.assertNotEqual(output.convert("RGB").getcolors(), [(300 * 200, (255, 255, 255))])
+
+        summary = timer.summary()
+        self.assertEqual(summary["render"]["count"], 2)
+        self.assertEqual(summary["composite"]["count"], 4)
+        self.assertEqual(len(watermark.sprite_cache), 2)
+        with self.assertRaises(ValueError):
+            watermark.set_resample("nearest")
+
+    def test_quantize_size(self):
+        """测试字号归入尺寸档位"""
+        self.assertEqual(quantize_size(0.3), 1)
+        self.assertEqual(quantize_size(24), quantize_size(24.4))
+        # 相邻档位的差距约为6%
+        for size in (10, 50, 400, 3000):
+            self.assertLessEqual(abs(quantize_size(size) - size) / size, 0.04)
+        sizes = {quantize_size(size) for size in range(100, 201)}
+        self.assertLessEqual(len(sizes), 13)
+
+    def test_relative_size_buckets(self):
+        """测试按比例设置字号时，尺寸相近的图片共用同一个图块"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i, width in enumerate((800, 805, 810, 1600, 3200)):
+                path = os.path.join(temp_dir, f"input{i}.png")
+                Image.new('RGB', (width, width // 2), color='white').save(path)
+                paths.append(path)
+
+            timer = StageTimer()
+            watermark = Watermark()
+            watermark.set_text("TEST")
+            watermark.set_relative_size("width", 0.05, margin_scale=0.01)
+            watermark.set_stage_timer(timer)
+            plan = watermark.plan_batch(paths)
+            for path in paths:
+                watermark.add_watermark(path)
+
+        self.assertEqual(timer.summary()["render"]["count"], 3)
+        self.assertEqual(watermark.get_layout_size((1600, 800)), (quantize_size(80), 16))
+        # 水印宽度随图片宽度成比例变化
+        widths = [entry["rect"][2] - entry["rect"][0] for entry in plan]
+        self.assertAlmostEqual(widths[4] / widths[0], 4, delta=0.5)
+        with self.assertRaises(ValueError):
+            watermark.set_relative_size("height")
+
+
+# 运行测试
+if __name__ == "__main__":
+    unittest.main()